@@ -30,6 +30,7 @@ Calibration
    CalibrationCamera
    CalibrationCameraTop
    CalibrationCameraSideWith2TargetYXZ
+   triangulate_points
 
 Frame
 =====
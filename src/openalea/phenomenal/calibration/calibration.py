@@ -13,8 +13,11 @@ where a target is rotating instead of a plant in the image acuisition system.
 # ==============================================================================
 from __future__ import division, print_function, absolute_import
 
+import abc
 import json
 import math
+import multiprocessing
+import time
 import numpy
 import scipy.optimize
 
@@ -22,15 +25,67 @@ from .frame import (Frame, x_axis, y_axis, z_axis)
 from .transformations import (concatenate_matrices, rotation_matrix)
 # ==============================================================================
 
-__all__ = ["CalibrationCamera",
+__all__ = ["Projection",
+           "CalibrationCamera",
            "CalibrationCameraTop",
            "CalibrationCameraSideWith1Target",
            "CalibrationCameraSideWith2Target",
-           "CalibrationCameraSideWith2TargetYXZ"]
+           "CalibrationCameraSideWith2TargetYXZ",
+           "triangulate_points"]
 
 # ==============================================================================
 
 
+class Projection(object):
+    """ Pinhole projection compiled in a single 3x4 homogeneous matrix.
+
+    Calling the object project an array of 3d points [[x, y, z], ...] on
+    the image with one matrix product and return the pixel coordinates
+    [[x, y], ...].
+    """
+
+    def __init__(self, matrix):
+        self.matrix = numpy.array(matrix, dtype=numpy.float64)
+        self._rotation = self.matrix[:, :3].T.copy()
+        self._translation = self.matrix[:, 3].copy()
+
+    def __call__(self, pts, out=None):
+        """ Project 3d points on the image
+
+        Parameters
+        ----------
+        pts : numpy.ndarray
+            (N, 3) array of 3d points position
+
+        out : numpy.ndarray, optional
+            Preallocated (N, 2) array where the pixel coordinates are written
+
+        Returns
+        -------
+        out : numpy.ndarray
+            (N, 2) array of pixel coordinates
+        """
+        h = numpy.dot(pts, self._rotation)
+        h += self._translation
+
+        if out is None:
+            out = numpy.empty((h.shape[0], 2), dtype=h.dtype)
+
+        return numpy.divide(h[:, :2], h[:, 2:], out=out)
+
+
+def _find_parameters_restart(args):
+    calibration, index, seed, method = args
+
+    start = time.time()
+    parameters = calibration._initial_parameters(
+        numpy.random.RandomState(seed))
+    parameters = calibration._optimize(parameters, method=method)
+    err = calibration.fit_function(parameters)
+
+    return index, seed, parameters, err, time.time() - start
+
+
 class CalibrationCamera(object):
     def __init__(self):
         # Camera Parameters
@@ -47,6 +102,9 @@ class CalibrationCamera(object):
         self._angle_factor = None
         self._cam_origin_axis = None
 
+        # Projection cache : alpha -> (parameters, Projection)
+        self._projections = dict()
+
     def __str__(self):
         out = ''
         out += 'Camera Parameters : \n'
@@ -175,25 +233,54 @@ class CalibrationCamera(object):
             self._cam_rot_x, self._cam_rot_y, self._cam_rot_z,
             self._cam_origin_axis)
 
-    def get_projection(self, alpha):
-
+    def _projection_parameters(self):
+        return (self._cam_width_image, self._cam_height_image,
+                self._cam_focal_length_x, self._cam_focal_length_y,
+                self._cam_pos_x, self._cam_pos_y, self._cam_pos_z,
+                self._cam_rot_x, self._cam_rot_y, self._cam_rot_z,
+                self._angle_factor,
+                numpy.asarray(self._cam_origin_axis).tobytes())
+
+    def get_projection_matrix(self, alpha):
+        """ Return the 3x4 homogeneous matrix P projecting the 3d points
+        at the rotation angle alpha : (u * w, v * w, w) = P (x, y, z, 1)
+        """
         fr_cam = self.get_camera_frame()
 
         angle = math.radians(alpha * self._angle_factor)
+        cos_a, sin_a = math.cos(angle), math.sin(angle)
+
+        rot_alpha = numpy.array([[-cos_a, -sin_a, 0.0],
+                                 [-sin_a, cos_a, 0.0],
+                                 [0.0, 0.0, 1.0]])
 
-        def projection(pts):
+        intrinsic = numpy.array(
+            [[self._cam_focal_length_x, 0.0, self._cam_width_image / 2.0],
+             [0.0, self._cam_focal_length_y, self._cam_height_image / 2.0],
+             [0.0, 0.0, 1.0]])
 
-            x = - pts[:, 0] * math.cos(angle) - pts[:, 1] * math.sin(angle)
-            y = - pts[:, 0] * math.sin(angle) + pts[:, 1] * math.cos(angle)
-            z = pts[:, 2]
+        rot = numpy.dot(fr_cam.rotation_to_local(), rot_alpha)
+        translation = - numpy.dot(fr_cam.rotation_to_local(), fr_cam.origin())
 
-            origin = numpy.column_stack((x, y, z))
+        return numpy.dot(intrinsic, numpy.column_stack((rot, translation)))
 
-            return self.arr_pixel_coordinates(fr_cam.arr_local_point(origin),
-                                              self._cam_width_image,
-                                              self._cam_height_image,
-                                              self._cam_focal_length_x,
-                                              self._cam_focal_length_y)
+    def get_projection(self, alpha):
+        """ Return the Projection of the camera at the rotation angle alpha.
+
+        The projection matrix is built once per angle and cached, until the
+        camera parameters change.
+        """
+        parameters = self._projection_parameters()
+
+        projections = getattr(self, '_projections', None)
+        if projections is None:
+            projections = self._projections = dict()
+
+        if alpha in projections and projections[alpha][0] == parameters:
+            return projections[alpha][1]
+
+        projection = Projection(self.get_projection_matrix(alpha))
+        projections[alpha] = (parameters, projection)
 
         return projection
 
@@ -267,6 +354,119 @@ class CalibrationCamera(object):
                       separators=(',', ': '))
 
 
+class _CalibrationCameraFit(CalibrationCamera, metaclass=abc.ABCMeta):
+    """ Camera whose parameters are optimized from random restarts. The
+    subclasses define fit_function and draw the initial parameters of each
+    restart in _initial_parameters.
+    """
+
+    @abc.abstractmethod
+    def _initial_parameters(self, random_state):
+        """ Return the random initial parameters of a restart of
+        find_parameters, drawn with random_state (numpy.random.RandomState).
+        """
+
+    def _optimize(self, parameters, method="BFGS"):
+        """ Minimize fit_function from the initial parameters with
+        scipy.optimize.minimize and return the optimized parameters.
+        """
+        return scipy.optimize.minimize(
+            self.fit_function, parameters, method=method).x
+
+    def find_parameters(self,
+                        number_of_repetition,
+                        method="BFGS",
+                        seed=None,
+                        target_error=None,
+                        processes=None,
+                        pool=None):
+        """ Optimize the parameters from number_of_repetition + 1 random
+        initial parameters and return the best ones.
+
+        Each restart draws its initial parameters from its own seed, so a
+        restart gives the same result whatever the process running it. The
+        restarts are run one after the other, or in a pool of processes if
+        processes or pool is given.
+
+        Parameters
+        ----------
+        number_of_repetition : int
+            Number of restarts in addition to the first optimization
+
+        method : str, optional
+            Optimization method given to _optimize
+
+        seed : int, optional
+            Seed of the restarts seeds. By default the seeds are drawn from
+            the numpy.random global state.
+
+        target_error : float, optional
+            Stop the search, and cancel the remaining restarts of the pool
+            created by this function, as soon as a restart reach this error
+            (fit_function / number of references). When results come from a
+            pool, the restart stopping the search depends on the processes
+            scheduling.
+
+        processes : int, optional
+            Number of worker processes of the pool created when pool is None
+
+        pool : multiprocessing.pool.Pool, optional
+            Persistent pool of workers reused between calls. It is not closed
+            by this function.
+
+        Returns
+        -------
+        best_parameters : numpy.ndarray
+            The restarts results (index, seed, error, time in seconds) are
+            kept in the attribute _restarts.
+        """
+        if seed is None:
+            seeds = numpy.random.randint(0, 2 ** 31 - 1,
+                                         size=number_of_repetition + 1)
+        else:
+            seeds = numpy.random.RandomState(seed).randint(
+                0, 2 ** 31 - 1, size=number_of_repetition + 1)
+
+        tasks = [(self, i, int(seed), method) for i, seed in enumerate(seeds)]
+
+        own_pool = pool is None and processes is not None
+        if own_pool:
+            pool = multiprocessing.Pool(processes=processes)
+
+        if pool is None:
+            results = map(_find_parameters_restart, tasks)
+        else:
+            results = pool.imap_unordered(_find_parameters_restart, tasks)
+
+        best_parameters = None
+        min_err = float('inf')
+        self._restarts = list()
+        try:
+            for index, seed, parameters, err, elapsed in results:
+                self._restarts.append((index, seed, err / self._ref_number,
+                                       elapsed))
+
+                if self._verbose:
+                    print('Restart {} (seed {}) in {:.2f} s'.format(
+                        index, seed, elapsed))
+                    print('Result : ', parameters)
+                    print('Err : ', err / self._ref_number)
+
+                if err < min_err:
+                    min_err = err
+                    best_parameters = parameters
+
+                if (target_error is not None and
+                        err / self._ref_number <= target_error):
+                    break
+        finally:
+            if own_pool:
+                pool.terminate()
+                pool.join()
+
+        return best_parameters
+
+
 class RegistrationCamera(CalibrationCamera):
     def __init__(self, src_camera):
         CalibrationCamera.__init__(self)
@@ -741,7 +941,7 @@ class RegistrationCameraFocal(CalibrationCamera):
         return err / self._ref_number
 
 
-class CalibrationCameraTop(CalibrationCamera):
+class CalibrationCameraTop(_CalibrationCameraFit):
     def __init__(self):
         CalibrationCamera.__init__(self)
         self._verbose = False
@@ -785,39 +985,21 @@ class CalibrationCameraTop(CalibrationCamera):
 
         return err
 
-    def find_parameters(self, number_of_repetition):
-        best_parameters = None
-        min_err = float('inf')
-        for i in range(number_of_repetition + 1):
-
-            cam_focal_length_x = numpy.random.uniform(0.0, 10000.0)
-            cam_focal_length_y = numpy.random.uniform(0.0, 10000.0)
-            cam_pos_x = numpy.random.uniform(-500.0, 500.0)
-            cam_pos_y = numpy.random.uniform(-500.0, 500.0)
-            cam_pos_z = numpy.random.uniform(0.0, 10000.0)
-            cam_rot_x = 0.0
-            cam_rot_y = 0.0
-            cam_rot_z = 0.0
-
-            parameters = [cam_focal_length_x, cam_focal_length_y,
-                          cam_pos_x, cam_pos_y, cam_pos_z,
-                          cam_rot_x, cam_rot_y, cam_rot_z]
-
-            # Optimization
-            parameters = scipy.optimize.minimize(
-                self.fit_function, parameters, method='BFGS').x
-
-            # Compute error compare with min_err
-            err = self.fit_function(parameters)
-            if err < min_err:
-                min_err = err
-                best_parameters = parameters
+    def _initial_parameters(self, random_state):
+        cam_focal_length_x = random_state.uniform(0.0, 10000.0)
+        cam_focal_length_y = random_state.uniform(0.0, 10000.0)
+        cam_pos_x = random_state.uniform(-500.0, 500.0)
+        cam_pos_y = random_state.uniform(-500.0, 500.0)
+        cam_pos_z = random_state.uniform(0.0, 10000.0)
+        cam_rot_x = 0.0
+        cam_rot_y = 0.0
+        cam_rot_z = 0.0
 
-            if self._verbose:
-                print('Result : ', parameters)
-                print('Err : ', err / self._ref_number)
+        parameters = [cam_focal_length_x, cam_focal_length_y,
+                      cam_pos_x, cam_pos_y, cam_pos_z,
+                      cam_rot_x, cam_rot_y, cam_rot_z]
 
-        return best_parameters
+        return parameters
 
     def project_points_3d(self, points_3d):
 
@@ -865,7 +1047,11 @@ class CalibrationCameraTop(CalibrationCamera):
                   size_image,
                   angle_factor,
                   number_of_repetition=1,
-                  verbose=False):
+                  verbose=False,
+                  seed=None,
+                  target_error=None,
+                  processes=None,
+                  pool=None):
 
         self._verbose = verbose
         self._angle_factor = angle_factor
@@ -877,7 +1063,11 @@ class CalibrationCameraTop(CalibrationCamera):
         self._cam_width_image = size_image[0]
         self._cam_height_image = size_image[1]
 
-        parameters = self.find_parameters(number_of_repetition)
+        parameters = self.find_parameters(number_of_repetition,
+                                          seed=seed,
+                                          target_error=target_error,
+                                          processes=processes,
+                                          pool=pool)
 
         for i in [5, 6, 7]:
             parameters[i] %= math.pi * 2.0
@@ -901,7 +1091,7 @@ class CalibrationCameraTop(CalibrationCamera):
         return err / self._ref_number
 
 
-class CalibrationCameraSideWith1Target(CalibrationCamera):
+class CalibrationCameraSideWith1Target(_CalibrationCameraFit):
     def __init__(self):
         CalibrationCamera.__init__(self)
         self._verbose = False
@@ -974,57 +1164,43 @@ class CalibrationCameraSideWith1Target(CalibrationCamera):
 
         return err
 
-    def find_parameters(self, number_of_repetition):
-
-        best_parameters = None
-        min_err = float('inf')
-        for i in range(number_of_repetition + 1):
-
-            cam_focal_length_x = numpy.random.uniform(1000.0, 10000.0)
-            cam_focal_length_y = numpy.random.uniform(1000.0, 10000.0)
-            cam_pos_x = numpy.random.uniform(1000.0, 10000.0)
-            cam_pos_y = 0.0
-            cam_rot_x = 0.0
-            cam_rot_y = 0.0
-            cam_rot_z = 0.0
-
-            angle_factor = 1.0
-
-            target_pos_x = numpy.random.uniform(-1000.0, 1000.0)
-            target_pos_y = numpy.random.uniform(-1000.0, 1000.0)
-            target_pos_z = numpy.random.uniform(0, 1000.0)
-            target_rot_x = 0.0
-            target_rot_y = 0.0
-            target_rot_z = 0.0
-
-            parameters = [cam_focal_length_x, cam_focal_length_y,
-                          cam_pos_x, cam_pos_y,
-                          cam_rot_x, cam_rot_y, cam_rot_z,
-                          angle_factor,
-                          target_pos_x, target_pos_y, target_pos_z,
-                          target_rot_x, target_rot_y, target_rot_z]
-
-            parameters = scipy.optimize.minimize(
-                self.fit_function, parameters, method='BFGS').x
-
-            err = self.fit_function(parameters)
-            if err < min_err:
-                min_err = err
-                best_parameters = parameters
-
-            if self._verbose:
-                err = self.fit_function(parameters)
-                print('Result : ', parameters)
-                print('Err : ', err / self._ref_number)
-
-        return best_parameters
+    def _initial_parameters(self, random_state):
+        cam_focal_length_x = random_state.uniform(1000.0, 10000.0)
+        cam_focal_length_y = random_state.uniform(1000.0, 10000.0)
+        cam_pos_x = random_state.uniform(1000.0, 10000.0)
+        cam_pos_y = 0.0
+        cam_rot_x = 0.0
+        cam_rot_y = 0.0
+        cam_rot_z = 0.0
+
+        angle_factor = 1.0
+
+        target_pos_x = random_state.uniform(-1000.0, 1000.0)
+        target_pos_y = random_state.uniform(-1000.0, 1000.0)
+        target_pos_z = random_state.uniform(0, 1000.0)
+        target_rot_x = 0.0
+        target_rot_y = 0.0
+        target_rot_z = 0.0
+
+        parameters = [cam_focal_length_x, cam_focal_length_y,
+                      cam_pos_x, cam_pos_y,
+                      cam_rot_x, cam_rot_y, cam_rot_z,
+                      angle_factor,
+                      target_pos_x, target_pos_y, target_pos_z,
+                      target_rot_x, target_rot_y, target_rot_z]
+
+        return parameters
 
     def calibrate(self,
                   ref_target_points_2d,
                   ref_target_points_local_3d,
                   size_image,
                   number_of_repetition=1,
-                  verbose=False):
+                  verbose=False,
+                  seed=None,
+                  target_error=None,
+                  processes=None,
+                  pool=None):
         """ Find physical parameters associated with a camera
         (i.e. distances and angles), using pictures of a rotating
         target.
@@ -1035,6 +1211,8 @@ class CalibrationCameraSideWith1Target(CalibrationCamera):
                         a picture taken with a given angle, list
                         the coordinates of all intersections on
                         the target in the picture
+         - 'seed', 'target_error', 'processes', 'pool': random restarts
+                        options, see _CalibrationCameraFit.find_parameters
         """
         self._verbose = verbose
 
@@ -1045,7 +1223,11 @@ class CalibrationCameraSideWith1Target(CalibrationCamera):
         self._cam_width_image = size_image[0]
         self._cam_height_image = size_image[1]
 
-        parameters = self.find_parameters(number_of_repetition)
+        parameters = self.find_parameters(number_of_repetition,
+                                          seed=seed,
+                                          target_error=target_error,
+                                          processes=processes,
+                                          pool=pool)
 
         for i in [4, 5, 6, 11, 12, 13]:
             parameters[i] %= math.pi* 2.0
@@ -1176,7 +1358,282 @@ class CalibrationCameraSideWith1Target(CalibrationCamera):
         return pts
 
 
-class CalibrationCameraSideWith2Target(CalibrationCamera):
+def _rotation_and_derivative(angle, axis):
+    """ Return the 3x3 rotation matrix of angle around axis and its
+    derivative according to the angle.
+    """
+    rot = rotation_matrix(angle, axis)[:3, :3]
+    generator = numpy.array([[0.0, -axis[2], axis[1]],
+                             [axis[2], 0.0, -axis[0]],
+                             [-axis[1], axis[0], 0.0]])
+
+    return rot, numpy.dot(generator, rot)
+
+
+def _rotate_z(cos_a, sin_a, pts):
+    """ Rotate each point pts[i] around the z axis of the angle with cosinus
+    cos_a[i] and sinus sin_a[i].
+    """
+    return numpy.column_stack((cos_a * pts[:, 0] - sin_a * pts[:, 1],
+                               sin_a * pts[:, 0] + cos_a * pts[:, 1],
+                               pts[:, 2]))
+
+
+def _cross_z(pts):
+    """ Return the cross product z_axis x pts[i] of each point. """
+    return numpy.column_stack((-pts[:, 1], pts[:, 0],
+                               numpy.zeros(len(pts))))
+
+
+class _CalibrationCameraSideWith2Target(_CalibrationCameraFit):
+    """ Vectorized model of the side camera calibration with two targets
+    rotating on the turntable.
+
+    The parameters of the model are stored in a vector of 21 values :
+
+        focal_length_x, focal_length_y,
+        cam_pos_x, cam_pos_y, cam_pos_z,
+        cam_rot_x, cam_rot_y, cam_rot_z,
+        angle_factor,
+        target_1_pos_x, target_1_pos_y, target_1_pos_z,
+        target_1_rot_x, target_1_rot_y, target_1_rot_z,
+        target_2_pos_x, target_2_pos_y, target_2_pos_z,
+        target_2_rot_x, target_2_rot_y, target_2_rot_z
+
+    The subclasses optimize the parameters of index _free_parameters, the
+    other ones are taken from the fixed camera attributes.
+
+    All the chessboard corners of all the angles are projected at once and
+    the jacobian of the reprojection is computed analytically, so the
+    optimizers do not need finite differences.
+    """
+
+    _free_parameters = [0, 1, 2, 3, 5, 7, 8] + list(range(9, 21))
+
+    def _model_parameters(self, x0):
+        parameters = numpy.array([
+            0.0, 0.0,
+            self._cam_pos_x or 0.0,
+            self._cam_pos_y or 0.0,
+            self._cam_pos_z or 0.0,
+            self._cam_rot_x or 0.0,
+            self._cam_rot_y or 0.0,
+            self._cam_rot_z or 0.0] + [0.0] * 13)
+
+        parameters[self._free_parameters] = x0
+
+        return parameters
+
+    def __setattr__(self, name, value):
+        # The stacked references are rebuilt when a target is assigned
+        if name.startswith('_ref_target_'):
+            self.__dict__.pop('_ref_arrays', None)
+
+        super(_CalibrationCameraSideWith2Target, self).__setattr__(
+            name, value)
+
+    def _references(self):
+        """ Return the chessboard corners of the two targets stacked in
+        arrays : target index, angle, local 3d position and 2d position of
+        each corner. The arrays are computed once and dropped when a
+        _ref_target_* attribute is assigned.
+        """
+        references = getattr(self, '_ref_arrays', None)
+        if references is not None:
+            return references
+
+        target, angles, points_local_3d, points_2d = [], [], [], []
+        for i, (ref_points_2d, ref_points_local_3d) in enumerate(
+                [(self._ref_target_1_points_2d,
+                  self._ref_target_1_points_local_3d),
+                 (self._ref_target_2_points_2d,
+                  self._ref_target_2_points_local_3d)]):
+
+            local_3d = numpy.array(ref_points_local_3d, dtype=numpy.float64)
+            for alpha, ref_pts in ref_points_2d.items():
+                ref_pts = numpy.asarray(ref_pts, dtype=numpy.float64)
+                target.append(numpy.full(len(ref_pts), i))
+                angles.append(numpy.full(len(ref_pts), float(alpha)))
+                points_local_3d.append(local_3d)
+                points_2d.append(ref_pts)
+
+        references = (numpy.concatenate(target),
+                      numpy.concatenate(angles),
+                      numpy.concatenate(points_local_3d),
+                      numpy.concatenate(points_2d))
+
+        self._ref_arrays = references
+
+        return references
+
+    def _project_references(self, x0, jacobian=False):
+        """ Project all the chessboard corners with the parameters x0.
+
+        Returns
+        -------
+        pts : numpy.ndarray
+            (N, 2) array of pixel coordinates of the corners
+
+        jac : numpy.ndarray
+            (N, 2, len(x0)) array of the derivatives of the pixel coordinates
+            according to x0, only if jacobian is True
+        """
+        p = self._model_parameters(x0)
+        target, angles, points_local_3d, _ = self._references()
+        n = len(angles)
+
+        # ======================================================================
+        # Targets points in world frame
+
+        pts_world = numpy.empty((n, 3))
+        d_world = numpy.zeros((n, 3, 21))
+        for i in range(2):
+            index = numpy.flatnonzero(target == i)
+            pos_x, pos_y, pos_z, rot_x, rot_y, rot_z = p[9 + 6 * i:
+                                                         15 + 6 * i]
+            q = points_local_3d[index]
+            alpha = numpy.radians(angles[index] * p[8])
+
+            mat_rot_x, d_rot_x = _rotation_and_derivative(rot_x, x_axis)
+            mat_rot_y, d_rot_y = _rotation_and_derivative(rot_y, y_axis)
+
+            cos_t, sin_t = numpy.cos(alpha + rot_z), numpy.sin(alpha + rot_z)
+            rq = _rotate_z(cos_t, sin_t,
+                           numpy.dot(q, numpy.dot(mat_rot_x, mat_rot_y).T))
+
+            cos_a, sin_a = numpy.cos(alpha), numpy.sin(alpha)
+            origin = numpy.column_stack((pos_x * cos_a - pos_y * sin_a,
+                                         pos_x * sin_a + pos_y * cos_a,
+                                         numpy.full(len(index), pos_z)))
+
+            pts_world[index] = rq + origin
+
+            if jacobian:
+                j = 9 + 6 * i
+                d_world[index, :, j] = numpy.column_stack(
+                    (cos_a, sin_a, numpy.zeros(len(index))))
+                d_world[index, :, j + 1] = numpy.column_stack(
+                    (-sin_a, cos_a, numpy.zeros(len(index))))
+                d_world[index, 2, j + 2] = 1.0
+                d_world[index, :, j + 3] = _rotate_z(
+                    cos_t, sin_t, numpy.dot(q, numpy.dot(d_rot_x,
+                                                         mat_rot_y).T))
+                d_world[index, :, j + 4] = _rotate_z(
+                    cos_t, sin_t, numpy.dot(q, numpy.dot(mat_rot_x,
+                                                         d_rot_y).T))
+                d_world[index, :, j + 5] = _cross_z(rq)
+                d_world[index, :, 8] = (
+                    _cross_z(pts_world[index]) *
+                    numpy.radians(angles[index])[:, numpy.newaxis])
+
+        # ======================================================================
+        # Camera frame
+
+        mat_rot_x, d_rot_x = _rotation_and_derivative(p[5], x_axis)
+        mat_rot_y, d_rot_y = _rotation_and_derivative(p[6], y_axis)
+        mat_rot_z, d_rot_z = _rotation_and_derivative(p[7], z_axis)
+        origin_axis = numpy.asarray(self._cam_origin_axis,
+                                    dtype=numpy.float64)[:3, :3]
+
+        mat = numpy.linalg.multi_dot(
+            [origin_axis, mat_rot_x, mat_rot_y, mat_rot_z])
+
+        vec = pts_world - p[2:5]
+        pts_cam = numpy.dot(vec, mat)
+
+        x, y, z = pts_cam[:, 0], pts_cam[:, 1], pts_cam[:, 2]
+        pts = numpy.column_stack((x / z * p[0] + self._cam_width_image / 2.0,
+                                  y / z * p[1] + self._cam_height_image / 2.0))
+
+        if not jacobian:
+            return pts
+
+        d_cam = numpy.einsum('nik,ij->njk', d_world, mat)
+        d_cam[:, :, 2:5] -= mat.T[numpy.newaxis]
+        for k, d_mat in [
+                (5, numpy.linalg.multi_dot(
+                    [origin_axis, d_rot_x, mat_rot_y, mat_rot_z])),
+                (6, numpy.linalg.multi_dot(
+                    [origin_axis, mat_rot_x, d_rot_y, mat_rot_z])),
+                (7, numpy.linalg.multi_dot(
+                    [origin_axis, mat_rot_x, mat_rot_y, d_rot_z]))]:
+            d_cam[:, :, k] = numpy.dot(vec, d_mat)
+
+        jac = numpy.empty((n, 2, 21))
+        jac[:, 0] = (p[0] / z)[:, numpy.newaxis] * (
+            d_cam[:, 0] - (x / z)[:, numpy.newaxis] * d_cam[:, 2])
+        jac[:, 1] = (p[1] / z)[:, numpy.newaxis] * (
+            d_cam[:, 1] - (y / z)[:, numpy.newaxis] * d_cam[:, 2])
+        jac[:, 0, 0] = x / z
+        jac[:, 1, 1] = y / z
+
+        return pts, jac[:, :, self._free_parameters]
+
+    def residuals(self, x0):
+        """ Return the vector of the reprojection differences (u, v) of all
+        the chessboard corners with the parameters x0.
+        """
+        points_2d = self._references()[3]
+        return (self._project_references(x0) - points_2d).ravel()
+
+    def jacobian(self, x0):
+        """ Return the jacobian matrix of residuals according to x0. """
+        _, jac = self._project_references(x0, jacobian=True)
+        return jac.reshape((-1, jac.shape[2]))
+
+    def fit_function(self, x0):
+        """ Return the sum of the reprojection distances of all the
+        chessboard corners with the parameters x0.
+        """
+        points_2d = self._references()[3]
+        err = numpy.linalg.norm(
+            self._project_references(x0) - points_2d, axis=1).sum()
+
+        if self._verbose:
+            print(err)
+
+        return err
+
+    def fit_function_gradient(self, x0):
+        """ Return the gradient of fit_function according to x0. """
+        points_2d = self._references()[3]
+        pts, jac = self._project_references(x0, jacobian=True)
+
+        diff = pts - points_2d
+        norm = numpy.linalg.norm(diff, axis=1)
+        diff /= numpy.maximum(norm, 1e-12)[:, numpy.newaxis]
+
+        return numpy.einsum('ni,nik->k', diff, jac)
+
+    def _optimize(self, parameters, method="BFGS"):
+        """ Optimize the parameters from the initial parameters.
+
+        Parameters
+        ----------
+        parameters : list
+            Initial parameters
+
+        method : str, optional
+            "least_squares" minimize the sum of the squared reprojection
+            differences with scipy.optimize.least_squares, other methods
+            ("BFGS" by default) minimize fit_function with its analytic
+            gradient with scipy.optimize.minimize.
+
+        Returns
+        -------
+        parameters : numpy.ndarray
+        """
+        if method == "least_squares":
+            return scipy.optimize.least_squares(
+                self.residuals, parameters, jac=self.jacobian,
+                x_scale='jac').x
+
+        return scipy.optimize.minimize(
+            self.fit_function, parameters,
+            jac=self.fit_function_gradient, method=method).x
+
+
+class CalibrationCameraSideWith2Target(_CalibrationCameraSideWith2Target):
     def __init__(self):
         CalibrationCamera.__init__(self)
         self._verbose = False
@@ -1235,126 +1692,40 @@ class CalibrationCameraSideWith2Target(CalibrationCamera):
 
         return out
 
-    def fit_function(self, x0):
-        err = 0
-
-        cam_focal_length_x, cam_focal_length_y, \
-            cam_pos_x, cam_pos_y, \
-            cam_rot_x, cam_rot_z, \
-            angle_factor, \
-            target_1_pos_x, target_1_pos_y, target_1_pos_z,\
-            target_1_rot_x, target_1_rot_y, target_1_rot_z,\
-            target_2_pos_x, target_2_pos_y, target_2_pos_z,\
-            target_2_rot_x, target_2_rot_y, target_2_rot_z = x0
-
-        # angle_factor = abs(angle_factor)
-
-        fr_cam = self.camera_frame(
-            cam_pos_x, cam_pos_y, self._cam_pos_z,
-            cam_rot_x, self._cam_rot_y, cam_rot_z,
-            self._cam_origin_axis)
-
-        for alpha, ref_pts in self._ref_target_1_points_2d.items():
-
-            fr_target = self.target_frame(target_1_pos_x,
-                                          target_1_pos_y,
-                                          target_1_pos_z,
-                                          target_1_rot_x,
-                                          target_1_rot_y,
-                                          target_1_rot_z,
-                                          math.radians(alpha * angle_factor))
-
-            target_pts = list(map(lambda pt: fr_target.global_point(pt),
-                             self._ref_target_1_points_local_3d))
-
-            pts = list(map(lambda pt: self.pixel_coordinates(
-                fr_cam.local_point(pt),
-                self._cam_width_image,
-                self._cam_height_image,
-                cam_focal_length_x,
-                cam_focal_length_y), target_pts))
-
-            err += numpy.linalg.norm(numpy.array(pts) - ref_pts, axis=1).sum()
-
-        for alpha, ref_pts in self._ref_target_2_points_2d.items():
-
-            fr_target = self.target_frame(target_2_pos_x,
-                                          target_2_pos_y,
-                                          target_2_pos_z,
-                                          target_2_rot_x,
-                                          target_2_rot_y,
-                                          target_2_rot_z,
-                                          math.radians(alpha * angle_factor))
-
-            target_pts = list(map(lambda pt: fr_target.global_point(pt),
-                             self._ref_target_2_points_local_3d))
-
-            pts = list(map(lambda pt: self.pixel_coordinates(
-                fr_cam.local_point(pt),
-                self._cam_width_image,
-                self._cam_height_image,
-                cam_focal_length_x,
-                cam_focal_length_y), target_pts))
-
-            err += numpy.linalg.norm(numpy.array(pts) - ref_pts, axis=1).sum()
-
-        if self._verbose:
-            print(err)
-
-        return err
-
-    def find_parameters(self, number_of_repetition):
-
-        best_parameters = None
-        min_err = float('inf')
-        for i in range(number_of_repetition + 1):
-
-            cam_focal_length_x = numpy.random.uniform(1000.0, 10000.0)
-            cam_focal_length_y = numpy.random.uniform(1000.0, 10000.0)
-            cam_pos_x = numpy.random.uniform(1000.0, 10000.0)
-            cam_pos_y = 0.0
-            cam_rot_x = 0.0
-            cam_rot_z = 0.0
-
-            angle_factor = 1.0
-
-            target_1_pos_x = numpy.random.uniform(-1000.0, 1000.0)
-            target_1_pos_y = numpy.random.uniform(-1000.0, 1000.0)
-            target_1_pos_z = numpy.random.uniform(0, 1000.0)
-            target_1_rot_x = 0
-            target_1_rot_y = 0
-            target_1_rot_z = 0
-
-            target_2_pos_x = - target_1_pos_x
-            target_2_pos_y = - target_1_pos_y
-            target_2_pos_z = numpy.random.uniform(0, 1000.0)
-            target_2_rot_x = 0
-            target_2_rot_y = 0
-            target_2_rot_z = 0
-
-            parameters = [cam_focal_length_x, cam_focal_length_y,
-                          cam_pos_x, cam_pos_y,
-                          cam_rot_x, cam_rot_z,
-                          angle_factor,
-                          target_1_pos_x, target_1_pos_y, target_1_pos_z,
-                          target_1_rot_x, target_1_rot_y, target_1_rot_z,
-                          target_2_pos_x, target_2_pos_y, target_2_pos_z,
-                          target_2_rot_x, target_2_rot_y, target_2_rot_z]
-
-            parameters = scipy.optimize.minimize(
-                self.fit_function, parameters, method='BFGS').x
-
-            err = self.fit_function(parameters)
-            if err < min_err:
-                min_err = err
-                best_parameters = parameters
-
-            if self._verbose:
-                err = self.fit_function(parameters)
-                print('Result : ', parameters)
-                print('Err : ', err / self._ref_number)
-
-        return best_parameters
+    def _initial_parameters(self, random_state):
+        cam_focal_length_x = random_state.uniform(1000.0, 10000.0)
+        cam_focal_length_y = random_state.uniform(1000.0, 10000.0)
+        cam_pos_x = random_state.uniform(1000.0, 10000.0)
+        cam_pos_y = 0.0
+        cam_rot_x = 0.0
+        cam_rot_z = 0.0
+
+        angle_factor = 1.0
+
+        target_1_pos_x = random_state.uniform(-1000.0, 1000.0)
+        target_1_pos_y = random_state.uniform(-1000.0, 1000.0)
+        target_1_pos_z = random_state.uniform(0, 1000.0)
+        target_1_rot_x = 0
+        target_1_rot_y = 0
+        target_1_rot_z = 0
+
+        target_2_pos_x = - target_1_pos_x
+        target_2_pos_y = - target_1_pos_y
+        target_2_pos_z = random_state.uniform(0, 1000.0)
+        target_2_rot_x = 0
+        target_2_rot_y = 0
+        target_2_rot_z = 0
+
+        parameters = [cam_focal_length_x, cam_focal_length_y,
+                      cam_pos_x, cam_pos_y,
+                      cam_rot_x, cam_rot_z,
+                      angle_factor,
+                      target_1_pos_x, target_1_pos_y, target_1_pos_z,
+                      target_1_rot_x, target_1_rot_y, target_1_rot_z,
+                      target_2_pos_x, target_2_pos_y, target_2_pos_z,
+                      target_2_rot_x, target_2_rot_y, target_2_rot_z]
+
+        return parameters
 
     def calibrate(self,
                   ref_target_1_points_2d,
@@ -1363,7 +1734,12 @@ class CalibrationCameraSideWith2Target(CalibrationCamera):
                   ref_target_2_points_local_3d,
                   size_image,
                   number_of_repetition=3,
-                  verbose=False):
+                  verbose=False,
+                  method="BFGS",
+                  seed=None,
+                  target_error=None,
+                  processes=None,
+                  pool=None):
         """ Find physical parameters associated with a camera
         (i.e. distances and angles), using pictures of a rotating
         target.
@@ -1374,6 +1750,11 @@ class CalibrationCameraSideWith2Target(CalibrationCamera):
                         a picture taken with a given angle, list
                         the coordinates of all intersections on
                         the target in the picture
+         - 'method' (str): "BFGS" to minimize the sum of the reprojection
+                        distances or "least_squares" to minimize the sum
+                        of their squares
+         - 'seed', 'target_error', 'processes', 'pool': random restarts
+                        options, see _CalibrationCameraFit.find_parameters
         """
         self._verbose = verbose
 
@@ -1389,7 +1770,12 @@ class CalibrationCameraSideWith2Target(CalibrationCamera):
         self._cam_width_image = size_image[0]
         self._cam_height_image = size_image[1]
 
-        parameters = self.find_parameters(number_of_repetition)
+        parameters = self.find_parameters(number_of_repetition,
+                                          method=method,
+                                          seed=seed,
+                                          target_error=target_error,
+                                          processes=processes,
+                                          pool=pool)
 
         for i in [4, 5, 10, 11, 12, 16, 17, 18]:
             parameters[i] %= math.pi * 2.0
@@ -1589,7 +1975,7 @@ class CalibrationCameraSideWith2Target(CalibrationCamera):
         return c
 
 
-class CalibrationCameraSideWith2TargetYXZ(CalibrationCamera):
+class CalibrationCameraSideWith2TargetYXZ(_CalibrationCameraSideWith2Target):
     def __init__(self):
         CalibrationCamera.__init__(self)
         self._verbose = False
@@ -1643,123 +2029,41 @@ class CalibrationCameraSideWith2TargetYXZ(CalibrationCamera):
 
         return out
 
-    def fit_function(self, x0):
-        err = 0
-
-        cam_focal_length_x, cam_focal_length_y, \
-        cam_pos_x, cam_pos_y, \
-        cam_rot_x, cam_rot_z, \
-        angle_factor, \
-        target_1_pos_x, target_1_pos_y, target_1_pos_z, \
-        target_1_rot_x, target_1_rot_y, target_1_rot_z, \
-        target_2_pos_x, target_2_pos_y, target_2_pos_z, \
-        target_2_rot_x, target_2_rot_y, target_2_rot_z = x0
-
-        fr_cam = self.camera_frame(
-            cam_pos_x, cam_pos_y, self._cam_pos_z,
-            cam_rot_x, self._cam_rot_y, cam_rot_z,
-            self._cam_origin_axis)
-
-        for alpha, ref_pts in self._ref_target_1_points_2d.items():
-            fr_target = self.target_frame(target_1_pos_x,
-                                          target_1_pos_y,
-                                          target_1_pos_z,
-                                          target_1_rot_x,
-                                          target_1_rot_y,
-                                          target_1_rot_z,
-                                          math.radians(alpha * angle_factor))
-
-            target_pts = list(map(lambda pt: fr_target.global_point(pt),
-                             self._ref_target_1_points_local_3d))
-
-            pts = list(map(lambda pt: self.pixel_coordinates(
-                fr_cam.local_point(pt),
-                self._cam_width_image,
-                self._cam_height_image,
-                cam_focal_length_x,
-                cam_focal_length_y), target_pts))
-
-            err += numpy.linalg.norm(numpy.array(pts) - ref_pts, axis=1).sum()
-
-        for alpha, ref_pts in self._ref_target_2_points_2d.items():
-            fr_target = self.target_frame(target_2_pos_x,
-                                          target_2_pos_y,
-                                          target_2_pos_z,
-                                          target_2_rot_x,
-                                          target_2_rot_y,
-                                          target_2_rot_z,
-                                          math.radians(alpha * angle_factor))
-
-            target_pts = list(map(lambda pt: fr_target.global_point(pt),
-                             self._ref_target_2_points_local_3d))
-
-            pts = list(map(lambda pt: self.pixel_coordinates(
-                fr_cam.local_point(pt),
-                self._cam_width_image,
-                self._cam_height_image,
-                cam_focal_length_x,
-                cam_focal_length_y), target_pts))
-
-            err += numpy.linalg.norm(numpy.array(pts) - ref_pts, axis=1).sum()
-
-        if self._verbose:
-            print(err)
-
-        return err
-
-    def find_parameters(self, number_of_repetition):
-
-        best_parameters = None
-        min_err = float('inf')
-        for i in range(number_of_repetition + 1):
-
-            cam_focal_length_x = numpy.random.uniform(1000.0, 10000.0)
-            cam_focal_length_y = numpy.random.uniform(1000.0, 10000.0)
-            cam_pos_x = 0.0
-            cam_pos_y = - numpy.random.uniform(10000.0, 1000.0)
-
-            cam_rot_x = 0.0
-            cam_rot_z = 0.0
-
-            angle_factor = 1.0
-
-            target_1_pos_x = numpy.random.uniform(-1000.0, 1000.0)
-            target_1_pos_y = numpy.random.uniform(-1000.0, 1000.0)
-            target_1_pos_z = numpy.random.uniform(-1000, 1000.0)
-            target_1_rot_x = 0
-            target_1_rot_y = 0
-            target_1_rot_z = 0
-
-            target_2_pos_x = -target_1_pos_x
-            target_2_pos_y = -target_1_pos_y
-            target_2_pos_z = numpy.random.uniform(-1000, 1000.0)
-            target_2_rot_x = 0
-            target_2_rot_y = 0
-            target_2_rot_z = 0
-
-            parameters = [cam_focal_length_x, cam_focal_length_y,
-                          cam_pos_x, cam_pos_y,
-                          cam_rot_x, cam_rot_z,
-                          angle_factor,
-                          target_1_pos_x, target_1_pos_y, target_1_pos_z,
-                          target_1_rot_x, target_1_rot_y, target_1_rot_z,
-                          target_2_pos_x, target_2_pos_y, target_2_pos_z,
-                          target_2_rot_x, target_2_rot_y, target_2_rot_z]
-
-            parameters = scipy.optimize.minimize(
-                self.fit_function, parameters, method='BFGS').x
-
-            err = self.fit_function(parameters)
-            if err < min_err:
-                min_err = err
-                best_parameters = parameters
-
-            if self._verbose:
-                err = self.fit_function(parameters)
-                print('Result : ', parameters)
-                print('Err : ', err / self._ref_number)
-
-        return best_parameters
+    def _initial_parameters(self, random_state):
+        cam_focal_length_x = random_state.uniform(1000.0, 10000.0)
+        cam_focal_length_y = random_state.uniform(1000.0, 10000.0)
+        cam_pos_x = 0.0
+        cam_pos_y = - random_state.uniform(10000.0, 1000.0)
+
+        cam_rot_x = 0.0
+        cam_rot_z = 0.0
+
+        angle_factor = 1.0
+
+        target_1_pos_x = random_state.uniform(-1000.0, 1000.0)
+        target_1_pos_y = random_state.uniform(-1000.0, 1000.0)
+        target_1_pos_z = random_state.uniform(-1000, 1000.0)
+        target_1_rot_x = 0
+        target_1_rot_y = 0
+        target_1_rot_z = 0
+
+        target_2_pos_x = -target_1_pos_x
+        target_2_pos_y = -target_1_pos_y
+        target_2_pos_z = random_state.uniform(-1000, 1000.0)
+        target_2_rot_x = 0
+        target_2_rot_y = 0
+        target_2_rot_z = 0
+
+        parameters = [cam_focal_length_x, cam_focal_length_y,
+                      cam_pos_x, cam_pos_y,
+                      cam_rot_x, cam_rot_z,
+                      angle_factor,
+                      target_1_pos_x, target_1_pos_y, target_1_pos_z,
+                      target_1_rot_x, target_1_rot_y, target_1_rot_z,
+                      target_2_pos_x, target_2_pos_y, target_2_pos_z,
+                      target_2_rot_x, target_2_rot_y, target_2_rot_z]
+
+        return parameters
 
     def get_target_1_projected(self, alpha, ref_target_1_points_local_3d):
 
@@ -1852,7 +2156,12 @@ class CalibrationCameraSideWith2TargetYXZ(CalibrationCamera):
                   ref_target_2_points_local_3d,
                   size_image,
                   number_of_repetition=3,
-                  verbose=False):
+                  verbose=False,
+                  method="BFGS",
+                  seed=None,
+                  target_error=None,
+                  processes=None,
+                  pool=None):
         """ Find physical parameters associated with a camera
         (i.e. distances and angles), using pictures of a rotating
         target.
@@ -1863,6 +2172,11 @@ class CalibrationCameraSideWith2TargetYXZ(CalibrationCamera):
                         a picture taken with a given angle, list
                         the coordinates of all intersections on
                         the target in the picture
+         - 'method' (str): "BFGS" to minimize the sum of the reprojection
+                        distances or "least_squares" to minimize the sum
+                        of their squares
+         - 'seed', 'target_error', 'processes', 'pool': random restarts
+                        options, see _CalibrationCameraFit.find_parameters
         """
         self._verbose = verbose
 
@@ -1884,7 +2198,12 @@ class CalibrationCameraSideWith2TargetYXZ(CalibrationCamera):
         self._cam_width_image = size_image[0]
         self._cam_height_image = size_image[1]
 
-        parameters = self.find_parameters(number_of_repetition)
+        parameters = self.find_parameters(number_of_repetition,
+                                          method=method,
+                                          seed=seed,
+                                          target_error=target_error,
+                                          processes=processes,
+                                          pool=pool)
 
         for i in [4, 6, 10, 11, 12, 16, 17, 18]:
             parameters[i] %= math.pi * 2.0
@@ -2000,7 +2319,10 @@ class CalibrationCameraSideWith2TargetYXZ(CalibrationCamera):
         return c
 
 
-class CalibrationCameraSideWith2TargetYXZBis(CalibrationCamera):
+class CalibrationCameraSideWith2TargetYXZBis(
+        _CalibrationCameraSideWith2Target):
+    _free_parameters = [0, 1, 2, 5, 7, 8] + list(range(9, 21))
+
     def __init__(self):
         CalibrationCamera.__init__(self)
         self._verbose = False
@@ -2056,126 +2378,44 @@ class CalibrationCameraSideWith2TargetYXZBis(CalibrationCamera):
 
         return out
 
-    def fit_function(self, x0):
-        err = 0
-
-        cam_focal_length_x, cam_focal_length_y, \
-        cam_pos_x, \
-        cam_rot_x, cam_rot_z, \
-        angle_factor, \
-        target_1_pos_x, target_1_pos_y, target_1_pos_z, \
-        target_1_rot_x, target_1_rot_y, target_1_rot_z, \
-        target_2_pos_x, target_2_pos_y, target_2_pos_z, \
-        target_2_rot_x, target_2_rot_y, target_2_rot_z = x0
-
-        fr_cam = self.camera_frame(
-            cam_pos_x, self._cam_pos_y, self._cam_pos_z,
-            cam_rot_x, self._cam_rot_y, cam_rot_z,
-            self._cam_origin_axis)
+    def _initial_parameters(self, random_state):
+        cam_focal_length_x = random_state.uniform(1000.0, 10000.0)
+        cam_focal_length_y = random_state.uniform(1000.0, 10000.0)
 
-        for alpha, ref_pts in self._ref_target_1_points_2d.items():
-            fr_target = self.target_frame(target_1_pos_x,
-                                          target_1_pos_y,
-                                          target_1_pos_z,
-                                          target_1_rot_x,
-                                          target_1_rot_y,
-                                          target_1_rot_z,
-                                          math.radians(alpha * angle_factor))
+        # cam_focal_length_x = 4679
+        # cam_focal_length_y = 4676
 
-            target_pts = list(map(lambda pt: fr_target.global_point(pt),
-                             self._ref_target_1_points_local_3d))
+        cam_pos_x = 0.0
 
-            pts = list(map(lambda pt: self.pixel_coordinates(
-                fr_cam.local_point(pt),
-                self._cam_width_image,
-                self._cam_height_image,
-                cam_focal_length_x,
-                cam_focal_length_y), target_pts))
+        cam_rot_x = 0.0
+        cam_rot_z = 0.0
 
-            err += numpy.linalg.norm(numpy.array(pts) - ref_pts, axis=1).sum()
+        angle_factor = 1.0
 
-        for alpha, ref_pts in self._ref_target_2_points_2d.items():
-            fr_target = self.target_frame(target_2_pos_x,
-                                          target_2_pos_y,
-                                          target_2_pos_z,
-                                          target_2_rot_x,
-                                          target_2_rot_y,
-                                          target_2_rot_z,
-                                          math.radians(alpha * angle_factor))
+        target_1_pos_x = random_state.uniform(-1000.0, 1000.0)
+        target_1_pos_y = random_state.uniform(-1000.0, 1000.0)
+        target_1_pos_z = random_state.uniform(-1000, 1000.0)
+        target_1_rot_x = 0
+        target_1_rot_y = 0
+        target_1_rot_z = 0
 
-            target_pts = list(map(lambda pt: fr_target.global_point(pt),
-                             self._ref_target_2_points_local_3d))
+        target_2_pos_x = -target_1_pos_x
+        target_2_pos_y = -target_1_pos_y
+        target_2_pos_z = random_state.uniform(-1000, 1000.0)
+        target_2_rot_x = 0
+        target_2_rot_y = 0
+        target_2_rot_z = 0
 
-            pts = list(map(lambda pt: self.pixel_coordinates(
-                fr_cam.local_point(pt),
-                self._cam_width_image,
-                self._cam_height_image,
-                cam_focal_length_x,
-                cam_focal_length_y), target_pts))
+        parameters = [cam_focal_length_x, cam_focal_length_y,
+                      cam_pos_x,
+                      cam_rot_x, cam_rot_z,
+                      angle_factor,
+                      target_1_pos_x, target_1_pos_y, target_1_pos_z,
+                      target_1_rot_x, target_1_rot_y, target_1_rot_z,
+                      target_2_pos_x, target_2_pos_y, target_2_pos_z,
+                      target_2_rot_x, target_2_rot_y, target_2_rot_z]
 
-            err += numpy.linalg.norm(numpy.array(pts) - ref_pts, axis=1).sum()
-
-        if self._verbose:
-            print(err)
-
-        return err
-
-    def find_parameters(self, number_of_repetition):
-
-        best_parameters = None
-        min_err = float('inf')
-        for i in range(number_of_repetition + 1):
-
-            cam_focal_length_x = numpy.random.uniform(1000.0, 10000.0)
-            cam_focal_length_y = numpy.random.uniform(1000.0, 10000.0)
-
-            # cam_focal_length_x = 4679
-            # cam_focal_length_y = 4676
-
-            cam_pos_x = 0.0
-
-            cam_rot_x = 0.0
-            cam_rot_z = 0.0
-
-            angle_factor = 1.0
-
-            target_1_pos_x = numpy.random.uniform(-1000.0, 1000.0)
-            target_1_pos_y = numpy.random.uniform(-1000.0, 1000.0)
-            target_1_pos_z = numpy.random.uniform(-1000, 1000.0)
-            target_1_rot_x = 0
-            target_1_rot_y = 0
-            target_1_rot_z = 0
-
-            target_2_pos_x = -target_1_pos_x
-            target_2_pos_y = -target_1_pos_y
-            target_2_pos_z = numpy.random.uniform(-1000, 1000.0)
-            target_2_rot_x = 0
-            target_2_rot_y = 0
-            target_2_rot_z = 0
-
-            parameters = [cam_focal_length_x, cam_focal_length_y,
-                          cam_pos_x,
-                          cam_rot_x, cam_rot_z,
-                          angle_factor,
-                          target_1_pos_x, target_1_pos_y, target_1_pos_z,
-                          target_1_rot_x, target_1_rot_y, target_1_rot_z,
-                          target_2_pos_x, target_2_pos_y, target_2_pos_z,
-                          target_2_rot_x, target_2_rot_y, target_2_rot_z]
-
-            parameters = scipy.optimize.minimize(
-                self.fit_function, parameters, method='BFGS').x
-
-            err = self.fit_function(parameters)
-            if err < min_err:
-                min_err = err
-                best_parameters = parameters
-
-            if self._verbose:
-                err = self.fit_function(parameters)
-                print('Result : ', parameters)
-                print('Err : ', err / self._ref_number)
-
-        return best_parameters
+        return parameters
 
     def get_target_1_projected(self, alpha, ref_target_1_points_local_3d):
 
@@ -2268,7 +2508,12 @@ class CalibrationCameraSideWith2TargetYXZBis(CalibrationCamera):
                   ref_target_2_points_local_3d,
                   size_image,
                   number_of_repetition=3,
-                  verbose=False):
+                  verbose=False,
+                  method="BFGS",
+                  seed=None,
+                  target_error=None,
+                  processes=None,
+                  pool=None):
         """ Find physical parameters associated with a camera
         (i.e. distances and angles), using pictures of a rotating
         target.
@@ -2279,6 +2524,11 @@ class CalibrationCameraSideWith2TargetYXZBis(CalibrationCamera):
                         a picture taken with a given angle, list
                         the coordinates of all intersections on
                         the target in the picture
+         - 'method' (str): "BFGS" to minimize the sum of the reprojection
+                        distances or "least_squares" to minimize the sum
+                        of their squares
+         - 'seed', 'target_error', 'processes', 'pool': random restarts
+                        options, see _CalibrationCameraFit.find_parameters
         """
         self._verbose = verbose
 
@@ -2294,7 +2544,12 @@ class CalibrationCameraSideWith2TargetYXZBis(CalibrationCamera):
         self._cam_width_image = size_image[0]
         self._cam_height_image = size_image[1]
 
-        parameters = self.find_parameters(number_of_repetition)
+        parameters = self.find_parameters(number_of_repetition,
+                                          method=method,
+                                          seed=seed,
+                                          target_error=target_error,
+                                          processes=processes,
+                                          pool=pool)
 
         for i in [3, 4, 9, 10, 11, 15, 16, 17]:
             parameters[i] %= math.pi * 2.0
@@ -2455,6 +2710,132 @@ def find_position_3d_points(pt2d, calibrations):
     return parameters
 
 
+def triangulate_points(points_2d, calibrations, iterations=10,
+                       tolerance=1e-6):
+    """ Triangulate many 3d points at once from their 2d positions on the
+    images of several cameras and angles.
+
+    The points are initialized by a linear triangulation (DLT) and refined
+    by Gauss-Newton iterations minimizing the squared reprojection
+    distances, all the points being solved together with the projection
+    matrices cached by CalibrationCamera.get_projection. The 3d points are
+    expressed in the frame of get_projection (the frame of the
+    reconstruction), which is the frame of find_position_3d_points with the
+    x axis inverted.
+
+    Parameters
+    ----------
+    points_2d : list of dict
+        For each point, dict[id_camera][angle] of the (x, y) pixel position
+        of the point on the image. A point can be seen on any subset of the
+        images.
+
+    calibrations : dict of CalibrationCamera
+        Calibration of each id_camera. Views of an unknown id_camera are
+        ignored.
+
+    iterations : int, optional
+        Maximal number of Gauss-Newton iterations
+
+    tolerance : float, optional
+        Stop the iterations when the largest displacement of a point is below
+        tolerance (in mm)
+
+    Returns
+    -------
+    points_3d : numpy.ndarray
+        (N, 3) array of the 3d positions, NaN for the points seen on less
+        than two images
+
+    err : numpy.ndarray
+        (N, ) array of the mean reprojection distance (in pixel) of each
+        point
+    """
+    # Observations : index of the point, index of the view and 2d position
+    index, view_index, uv = list(), list(), list()
+    views, matrices = dict(), list()
+    for i, pt2d in enumerate(points_2d):
+        for id_camera in pt2d:
+            if id_camera not in calibrations:
+                continue
+
+            for angle in pt2d[id_camera]:
+                if (id_camera, angle) not in views:
+                    views[(id_camera, angle)] = len(matrices)
+                    matrices.append(
+                        calibrations[id_camera].get_projection(angle).matrix)
+
+                index.append(i)
+                view_index.append(views[(id_camera, angle)])
+                uv.append(pt2d[id_camera][angle])
+
+    nb_points = len(points_2d)
+    points_3d = numpy.full((nb_points, 3), numpy.nan)
+    err = numpy.full(nb_points, numpy.nan)
+    if len(index) == 0:
+        return points_3d, err
+
+    index = numpy.array(index, dtype=numpy.int64)
+    proj = numpy.array(matrices)[view_index]
+    uv = numpy.array(uv, dtype=numpy.float64).reshape((-1, 2))
+
+    def accumulate(jac, res):
+        # Normal equations of each point : sum of jac^T jac and jac^T res
+        jtj = numpy.einsum('mki,mkj->mij', jac, jac).reshape((-1, 9))
+        jtr = numpy.einsum('mki,mk->mi', jac, res)
+        a = numpy.column_stack([numpy.bincount(
+            index, weights=jtj[:, k], minlength=nb_points)
+            for k in range(9)]).reshape((-1, 3, 3))
+        b = numpy.column_stack([numpy.bincount(
+            index, weights=jtr[:, k], minlength=nb_points)
+            for k in range(3)])
+        return a, b
+
+    # Points seen on at least two images
+    valid = numpy.bincount(index, minlength=nb_points) >= 2
+    eye = numpy.eye(3)
+
+    # ==========================================================================
+    # Linear triangulation : (u * P3 - P1) . X = 0, (v * P3 - P2) . X = 0
+
+    rows = uv[:, :, numpy.newaxis] * proj[:, 2:3, :] - proj[:, :2, :]
+    rows /= numpy.linalg.norm(rows[:, :, :3], axis=2)[:, :, numpy.newaxis]
+    a, b = accumulate(rows[:, :, :3], -rows[:, :, 3])
+    a[~valid] = eye
+    x = numpy.linalg.solve(a, b[:, :, numpy.newaxis])[:, :, 0]
+
+    # ==========================================================================
+    # Gauss-Newton refinement of the reprojection distances
+
+    for _ in range(iterations):
+        h = numpy.einsum('mij,mj->mi', proj[:, :, :3], x[index])
+        h += proj[:, :, 3]
+        w = h[:, 2:]
+        res = h[:, :2] / w - uv
+
+        jac = (proj[:, :2, :3] -
+               (h[:, :2] / w)[:, :, numpy.newaxis] *
+               proj[:, 2:3, :3]) / w[:, :, numpy.newaxis]
+
+        a, b = accumulate(jac, res)
+        a[~valid] = eye
+        step = numpy.linalg.solve(a, b[:, :, numpy.newaxis])[:, :, 0]
+        step[~valid] = 0
+        x -= step
+
+        if numpy.abs(step).max() < tolerance:
+            break
+
+    h = numpy.einsum('mij,mj->mi', proj[:, :, :3], x[index]) + proj[:, :, 3]
+    distances = numpy.linalg.norm(h[:, :2] / h[:, 2:] - uv, axis=1)
+    err[valid] = (numpy.bincount(index, weights=distances,
+                                 minlength=nb_points)[valid] /
+                  numpy.bincount(index, minlength=nb_points)[valid])
+    points_3d[valid] = x[valid]
+
+    return points_3d, err
+
+
 def find_position_3d_points_soil(pts, calibrations, verbose=False):
 
     def soil_frame(pos_x, pos_y, pos_z,
@@ -13,6 +13,9 @@ import cv2
 import numpy
 import json
 import collections
+import hashlib
+import multiprocessing
+import os
 # ==============================================================================
 
 __all__ = ["Target", "Chessboard"]
@@ -20,6 +23,71 @@ __all__ = ["Target", "Chessboard"]
 # ==============================================================================
 
 
+def _find_chessboard_corners(image, shape, scale=None):
+    """ Detect the chessboard corners in a GRAYSCALE image and refine them at
+    the full resolution of the image.
+
+    If scale is not None, the corners are first detected on the image
+    downscaled by scale and only refined at full resolution, the full
+    resolution detection being used when nothing is found on the
+    downscaled image.
+
+    Returns the (N, 1, 2) float32 array of the corners or None if the
+    chessboard is not found.
+    """
+    flags = cv2.CALIB_CB_ADAPTIVE_THRESH + cv2.CALIB_CB_NORMALIZE_IMAGE
+
+    try:
+        corners = None
+        if scale is not None and 0 < scale < 1:
+            small_image = cv2.resize(image, None, fx=scale, fy=scale,
+                                     interpolation=cv2.INTER_AREA)
+
+            found, corners = cv2.findChessboardCorners(
+                small_image, tuple(shape), flags=flags)
+
+            # Pixel centers of the downscaled image in the full image
+            corners = (corners + 0.5) / scale - 0.5 if found else None
+
+        if corners is None:
+            found, corners = cv2.findChessboardCorners(
+                image, tuple(shape), flags=flags)
+
+            if not found:
+                return None
+
+        corners = numpy.ascontiguousarray(
+            numpy.reshape(corners, (-1, 1, 2)), dtype=numpy.float32)
+
+        cv2.cornerSubPix(
+            image, corners, (11, 11), (-1, -1),
+            criteria=(cv2.TERM_CRITERIA_EPS +
+                      cv2.TERM_CRITERIA_MAX_ITER, 30, 0.001))
+
+    except cv2.error:
+        return None
+
+    return corners
+
+
+def _corners_cache_key(image, shape, scale):
+    sha1 = hashlib.sha1(numpy.ascontiguousarray(image).data)
+    sha1.update(str((image.shape, image.dtype.str,
+                     tuple(shape), scale)).encode())
+    return sha1.hexdigest()
+
+
+def _find_chessboard_corners_worker(args):
+    key, image, shape, scale = args
+    return key, _find_chessboard_corners(image, shape, scale=scale)
+
+
+def _gray_image(image):
+    if len(image.shape) == 3:
+        return cv2.cvtColor(image, cv2.COLOR_RGB2GRAY)
+    return image
+
+
 class Target(object):
 
     def __init__(self):
@@ -69,7 +137,7 @@ class Chessboard(object):
 
         return corners_2d
 
-    def detect_corners(self, id_camera, angle, image):
+    def detect_corners(self, id_camera, angle, image, scale=None):
         """
         Detect chessboard corner in a image and save it in object with the
         id_camera and angle like keys.
@@ -77,33 +145,94 @@ class Chessboard(object):
         :param id_camera: id/label/name_key of the camera who take the picture
         :param angle: Angle of chessboard on the turnable platform
         :param image: numpy GRAYSCALE Image containing the chessboard target
+        :param scale: If not None, detect the corners on the image downscaled
+        by scale before refining them at full resolution
         :return: True if chessboard corner are found otherwise False.
         """
+        corners = _find_chessboard_corners(_gray_image(image), self.shape,
+                                           scale=scale)
 
-        if len(image.shape) == 3:
-            image = cv2.cvtColor(image, cv2.COLOR_RGB2GRAY)
-
-        try:
-
-            found, corners = cv2.findChessboardCorners(
-                image,
-                tuple(self.shape),
-                flags=cv2.CALIB_CB_ADAPTIVE_THRESH +
-                cv2.CALIB_CB_NORMALIZE_IMAGE)
-
-            if found:
-
-                cv2.cornerSubPix(
-                    image, corners, (11, 11), (-1, -1),
-                    criteria=(cv2.TERM_CRITERIA_EPS +
-                              cv2.TERM_CRITERIA_MAX_ITER, 30, 0.001))
-
-                self.image_points[id_camera][angle] = corners
-
-        except cv2.error:
+        if corners is None:
             return False
 
-        return found
+        self.image_points[id_camera][angle] = corners
+        return True
+
+    def detect_corners_batch(self,
+                             images,
+                             scale=0.5,
+                             cache_dir=None,
+                             processes=None,
+                             pool=None):
+        """
+        Detect the chessboard corners of all the images on a pool of
+        processes and save them in object like detect_corners.
+
+        :param images: dict[id_camera][angle] of the images
+        :param scale: Downscale factor of the first detection, the corners
+        being refined at full resolution (None to detect at full resolution)
+        :param cache_dir: If not None, directory where the corners detected
+        are cached in .npy files named by the hash of the image, so the
+        images already processed are not detected again
+        :param processes: Number of worker processes of the pool created when
+        pool is None. By default the number of CPU.
+        :param pool: Persistent multiprocessing pool of workers reused
+        between calls. It is not closed by this function.
+        :return: dict[id_camera][angle] of True if chessboard corner are
+        found otherwise False.
+        """
+        if cache_dir is not None and not os.path.exists(cache_dir):
+            os.makedirs(cache_dir)
+
+        views = collections.defaultdict(list)
+        results = dict()
+        tasks = list()
+        for id_camera in images:
+            for angle in images[id_camera]:
+                image = _gray_image(images[id_camera][angle])
+                key = _corners_cache_key(image, self.shape, scale)
+                views[key].append((id_camera, angle))
+
+                filename = None
+                if cache_dir is not None:
+                    filename = os.path.join(cache_dir, key + ".npy")
+
+                if len(views[key]) > 1:
+                    continue
+
+                if filename is not None and os.path.exists(filename):
+                    corners = numpy.load(filename)
+                    results[key] = corners if len(corners) > 0 else None
+                else:
+                    tasks.append((key, image, self.shape, scale))
+
+        if tasks:
+            own_pool = pool is None
+            if own_pool:
+                pool = multiprocessing.Pool(processes=processes)
+
+            try:
+                for key, corners in pool.imap_unordered(
+                        _find_chessboard_corners_worker, tasks):
+                    results[key] = corners
+
+                    if cache_dir is not None:
+                        numpy.save(os.path.join(cache_dir, key + ".npy"),
+                                   corners if corners is not None else
+                                   numpy.empty((0, 1, 2), numpy.float32))
+            finally:
+                if own_pool:
+                    pool.terminate()
+                    pool.join()
+
+        found = collections.defaultdict(dict)
+        for key, corners in results.items():
+            for id_camera, angle in views[key]:
+                found[id_camera][angle] = corners is not None
+                if corners is not None:
+                    self.image_points[id_camera][angle] = corners.copy()
+
+        return dict(found)
 
     def dump(self, filename):
         # Convert to json format
@@ -142,6 +271,6 @@ class Chessboard(object):
                 for angle in image_points[id_camera]:
                     chessboard.image_points[id_camera][float(angle)] = \
                         numpy.array(image_points[id_camera][angle]).astype(
-                            numpy.float)
+                            float)
 
         return chessboard
@@ -22,7 +22,11 @@ Threshold
     threshold_meanshift
     threshold_hsv
     mean_image
+    RunningMeanImage
     phenoarch_side_binarization
+    phenoarch_side_binarization_stream
+    SideBinarizationKernel
+    binary_image_roi
 
 
 Image Skeleton
@@ -16,6 +16,11 @@ Routines functions to binarize images
 from __future__ import division, print_function
 
 from __future__ import absolute_import
+import collections
+import concurrent.futures
+import multiprocessing
+import time
+
 import cv2
 import numpy
 
@@ -40,7 +45,7 @@ def mean_image(images):
 
     See Also
     --------
-    threshold_meanshift
+    RunningMeanImage, threshold_meanshift
     """
     # ==========================================================================
     # Check Parameters
@@ -70,6 +75,192 @@ def mean_image(images):
                   start)
 
 
+class RunningMeanImage(object):
+    """
+    Running mean of images, updated one image at a time.
+
+    Unsigned integer images are summed exactly in a uint32 accumulator (up to
+    16843009 uint8 images), signed integer images in a int64 accumulator and
+    floating images in a float32 accumulator. Only the running sum (and the
+    images of the sliding window, if any) is kept in memory. Images can be removed
+    from the mean, for instance to slide the background model across days.
+
+    Parameters
+    ----------
+    images : iterable of numpy.ndarray, optional
+        Images (of the same shape) added to the mean, they can come from a
+        generator.
+
+    window : int, optional
+        If given, only the last `window` added images are kept in the mean,
+        older images are removed automatically.
+
+    Examples
+    --------
+    >>> running_mean = RunningMeanImage(window=10)
+    >>> for image in images:
+    ...     running_mean.add(image)
+    >>> mean = running_mean.mean()
+
+    See Also
+    --------
+    mean_image, threshold_meanshift
+    """
+
+    def __init__(self, images=None, window=None):
+
+        if window is not None and window < 1:
+            raise ValueError('window must be greater than 0')
+
+        self.window = window
+        self._sum = None
+        self._dtype = None
+        self._count = 0
+        self._window_images = collections.deque()
+
+        if images is not None:
+            self.update(images)
+
+    def __len__(self):
+        return self._count
+
+    @property
+    def shape(self):
+        return None if self._sum is None else self._sum.shape
+
+    def _check_image(self, image):
+        if not isinstance(image, numpy.ndarray):
+            raise TypeError('image is not a ndarray')
+
+        if self._sum is None:
+            if numpy.issubdtype(image.dtype, numpy.unsignedinteger):
+                accumulator_dtype = numpy.uint32
+            elif numpy.issubdtype(image.dtype, numpy.integer):
+                accumulator_dtype = numpy.int64
+            else:
+                accumulator_dtype = numpy.float32
+            self._dtype = image.dtype
+            self._sum = numpy.zeros(image.shape, dtype=accumulator_dtype)
+        elif image.shape != self._sum.shape:
+            raise ValueError('Shape of ndarray image is different')
+
+    def add(self, image):
+        """
+        Add an image to the mean. If the sliding window is full, the oldest
+        image is removed.
+
+        Parameters
+        ----------
+        image : numpy.ndarray
+            Image of the same shape as the previous ones
+        """
+        self._check_image(image)
+
+        numpy.add(self._sum, image, out=self._sum, casting='unsafe')
+        self._count += 1
+
+        if self.window is not None:
+            self._window_images.append(image.copy())
+            if len(self._window_images) > self.window:
+                self.remove(self._window_images.popleft())
+
+    def update(self, images):
+        """
+        Add each image of an iterable to the mean.
+
+        Parameters
+        ----------
+        images : iterable of numpy.ndarray
+        """
+        for image in images:
+            self.add(image)
+
+    def remove(self, image):
+        """
+        Remove from the mean an image previously added.
+
+        Parameters
+        ----------
+        image : numpy.ndarray
+            Image previously added, with the same values
+        """
+        if self._count == 0:
+            raise ValueError('No image to remove')
+        self._check_image(image)
+
+        numpy.subtract(self._sum, image, out=self._sum, casting='unsafe')
+        self._count -= 1
+
+    def mean(self, dtype=None):
+        """
+        Compute the mean of the current images.
+
+        Parameters
+        ----------
+        dtype : numpy.dtype, optional
+            Type of the mean image, by default the type of the added images.
+            Integer means are rounded to the nearest value (half up).
+
+        Returns
+        -------
+        out : numpy.ndarray
+            Mean image
+        """
+        if self._count == 0:
+            raise ValueError('No image in the mean')
+
+        if dtype is None:
+            dtype = self._dtype
+        dtype = numpy.dtype(dtype)
+
+        if (numpy.issubdtype(dtype, numpy.integer) and
+                numpy.issubdtype(self._sum.dtype, numpy.integer)):
+            # Exact rounding : (2 * sum + count) // (2 * count)
+            mean = self._sum.astype(numpy.int64)
+            mean *= 2
+            mean += self._count
+            mean //= 2 * self._count
+            return mean.astype(dtype)
+
+        mean = self._sum / numpy.float32(self._count)
+        if numpy.issubdtype(dtype, numpy.integer):
+            mean = numpy.floor(mean + 0.5)
+        return mean.astype(dtype)
+
+
+def binary_image_roi(image, margin=0):
+    """
+    Bounding rectangle of the positive pixels of a binary image, as given by
+    cv2.boundingRect, enlarged by a margin and clipped to the image.
+
+    Parameters
+    ----------
+    image : numpy.ndarray
+        2-D binary image
+
+    margin : int, optional
+        Number of pixels added on each side of the rectangle
+
+    Returns
+    -------
+    out : (int, int, int, int) or None
+        (x, y, width, height) of the rectangle, None if the image has no
+        positive pixel
+    """
+    points = cv2.findNonZero(numpy.uint8(image > 0))
+    if points is None:
+        return None
+
+    x, y, width, height = cv2.boundingRect(points)
+
+    x_min = max(x - margin, 0)
+    y_min = max(y - margin, 0)
+    x_max = min(x + width + margin, image.shape[1])
+    y_max = min(y + height + margin, image.shape[0])
+
+    return x_min, y_min, x_max - x_min, y_max - y_min
+
+
 def phenoarch_side_binarization(image,
                                 mean_image,
                                 threshold=0.3,
@@ -90,3 +281,336 @@ def phenoarch_side_binarization(image,
     result = cv2.medianBlur(result, 3)
 
     return result
+
+
+class _SideBinarizationBuffers(object):
+    """ Preallocated temporary images of a SideBinarizationKernel, reused
+    from one image to the next by one worker.
+    """
+
+    def __init__(self, shape):
+        height, length = shape[:2]
+        self.shape = tuple(shape)
+        self.hsv = numpy.empty((height, length, 3), dtype=numpy.uint8)
+        self.binary_hsv = numpy.empty((height, length), dtype=numpy.uint8)
+        self.binary_mean_shift = numpy.empty((height, length),
+                                             dtype=numpy.uint8)
+
+
+def _mean_shift_bounds(float_mean_image, threshold, dark_background, dtype):
+    """ Per pixel and channel bounds of the values classified as background
+    by threshold_meanshift, for the integer images of type dtype.
+
+    The ratio image / mean is monotonic in the image value, so the
+    background values of each channel are an interval. Its limit is found by
+    evaluating the expression of threshold_meanshift on a few values around
+    threshold * mean, the result is therefore bit-exact.
+    """
+    max_value = numpy.iinfo(dtype).max
+
+    if dark_background:
+        # Background : ratio < 1 + threshold, foreground if any channel is
+        # greater than the limit
+        limit = float_mean_image * (1. + threshold)
+    else:
+        # Background : ratio > 1 - threshold, foreground if any channel is
+        # lower or equal to the limit
+        limit = float_mean_image * (1. - threshold)
+
+    first = numpy.floor(limit).astype(numpy.int64) - 2
+    nb_values = numpy.zeros(float_mean_image.shape, dtype=numpy.int64)
+    for offset in range(5):
+        value = first + offset
+        with numpy.errstate(divide='ignore', invalid='ignore'):
+            ratio = numpy.divide(
+                numpy.float32(numpy.clip(value, 0, max_value)),
+                float_mean_image)
+            ratio[~ numpy.isfinite(ratio)] = 0
+
+        if dark_background:
+            # Count the values of the interval which are background
+            is_background = ratio < (1. + threshold)
+            is_background[value > max_value] = False
+        else:
+            # Count the values of the interval which are foreground
+            is_background = ratio > (1. - threshold)
+            is_background[value > max_value] = True
+        is_background[value < 0] = dark_background
+        if dark_background:
+            nb_values += is_background
+        else:
+            nb_values += ~ is_background
+
+    is_zero = float_mean_image == 0
+    lower = numpy.zeros(float_mean_image.shape, dtype=dtype)
+    upper = numpy.full(float_mean_image.shape, max_value, dtype=dtype)
+    if dark_background:
+        # Background values : [0, last background value]
+        last = numpy.clip(first - 1 + nb_values, 0, max_value)
+        upper[:] = numpy.where(is_zero, max_value, last)
+    else:
+        # Background values : [last foreground value + 1, max_value], or
+        # none (lower > upper) if all the values are foreground
+        last = numpy.clip(first - 1 + nb_values, 0, max_value)
+        all_foreground = is_zero | (last == max_value)
+        lower[:] = numpy.where(all_foreground, 1, last + 1)
+        upper[all_foreground] = 0
+
+    return lower, upper
+
+
+class SideBinarizationKernel(object):
+    """
+    Fused equivalent of phenoarch_side_binarization for one camera, with a
+    fixed mean image, parameters and masks.
+
+    The float division by the mean image of threshold_meanshift is replaced
+    by per pixel integer bounds computed once at the creation of the kernel,
+    so an image is thresholded with a single comparison pass (cv2.inRange)
+    without float temporary images. The masks are also folded into these
+    bounds. The result is bit-exact with phenoarch_side_binarization.
+
+    Parameters
+    ----------
+    mean_image : numpy.ndarray
+        Mean image given to threshold_meanshift
+
+    threshold, dark_background, hsv_min, hsv_max, mask_mean_shift, mask_hsv :
+        Parameters of phenoarch_side_binarization
+
+    roi : (int, int, int, int), optional
+        (x, y, width, height) rectangle of the images where the plant is, as
+        returned by binary_image_roi. If given, only this region is
+        binarized and the binary image of the region is returned (same
+        values as the region of the full binary image), the memory and time
+        used depend on the size of the region.
+
+    Examples
+    --------
+    >>> kernel = SideBinarizationKernel(mean_image, mask_hsv=mask)
+    >>> binary_images = [kernel(image) for image in images]
+
+    See Also
+    --------
+    phenoarch_side_binarization, phenoarch_side_binarization_stream
+    """
+
+    def __init__(self,
+                 mean_image,
+                 threshold=0.3,
+                 dark_background=False,
+                 hsv_min=(30, 25, 0),
+                 hsv_max=(150, 254, 165),
+                 mask_mean_shift=None,
+                 mask_hsv=None,
+                 roi=None):
+
+        if not isinstance(mean_image, numpy.ndarray):
+            raise TypeError('mean should be a numpy.ndarray')
+        if mean_image.ndim != 3:
+            raise ValueError('mean should be 3D array')
+        if not (0.0 <= threshold <= 1.0):
+            raise ValueError('threshold must be between 0.0 and 1.0')
+        for mask in (mask_mean_shift, mask_hsv):
+            if mask is not None and mask.shape != mean_image.shape[:2]:
+                raise ValueError('mask and image must have equal sizes')
+
+        self.shape = mean_image.shape
+        # cv2.COLOR_BGR2HSV only converts 8 bits images
+        self.dtype = numpy.dtype(numpy.uint8)
+        self.hsv_min = hsv_min
+        self.hsv_max = hsv_max
+
+        if roi is None:
+            roi = (0, 0, self.shape[1], self.shape[0])
+        x, y, width, height = roi
+        if (width <= 0 or height <= 0 or x < 0 or y < 0 or
+                x + width > self.shape[1] or y + height > self.shape[0]):
+            raise ValueError('roi should be a rectangle inside the image')
+        self.roi = tuple(roi)
+
+        # The region is binarized with one more pixel on each side, so that
+        # the median blur of its border is the same as in the full image
+        x_min, y_min = max(x - 1, 0), max(y - 1, 0)
+        x_max = min(x + width + 1, self.shape[1])
+        y_max = min(y + height + 1, self.shape[0])
+        self._region = (slice(y_min, y_max), slice(x_min, x_max))
+        self._inner = (slice(y - y_min, y - y_min + height),
+                       slice(x - x_min, x - x_min + width))
+        self.region_shape = (y_max - y_min, x_max - x_min)
+
+        if mask_hsv is not None:
+            mask_hsv = mask_hsv[self._region]
+        self.mask_hsv = mask_hsv
+
+        self._lower, self._upper = _mean_shift_bounds(
+            numpy.float32(mean_image[self._region]), threshold,
+            dark_background, self.dtype)
+
+        if mask_mean_shift is not None:
+            mask_mean_shift = mask_mean_shift[self._region]
+            # threshold_meanshift keeps the pixels where mask & 1, all the
+            # values are background elsewhere
+            masked = numpy.bitwise_and(mask_mean_shift, 1) == 0
+            self._lower[masked] = 0
+            self._upper[masked] = numpy.iinfo(self.dtype).max
+
+    def __call__(self, image, buffers=None):
+        """
+        Binarize an image.
+
+        Parameters
+        ----------
+        image : numpy.ndarray
+            BGR uint8 image of the shape of the mean image
+
+        buffers : _SideBinarizationBuffers, optional
+            Temporary images, allocated if not given
+
+        Returns
+        -------
+        out : numpy.ndarray
+            Binary image (of the roi if given)
+        """
+        if image.shape != self.shape:
+            raise ValueError('image and mean must have equal sizes')
+        if image.dtype != self.dtype:
+            raise TypeError('image should be of type {}'.format(self.dtype))
+
+        image = image[self._region]
+        if buffers is None:
+            buffers = _SideBinarizationBuffers(self.region_shape)
+
+        cv2.cvtColor(image, cv2.COLOR_BGR2HSV, dst=buffers.hsv)
+        cv2.inRange(buffers.hsv, self.hsv_min, self.hsv_max,
+                    dst=buffers.binary_hsv)
+        if self.mask_hsv is not None:
+            cv2.bitwise_and(buffers.binary_hsv, self.mask_hsv,
+                            dst=buffers.binary_hsv)
+
+        # Foreground if a channel is out of the background bounds
+        cv2.inRange(image, self._lower, self._upper,
+                    dst=buffers.binary_mean_shift)
+        cv2.bitwise_not(buffers.binary_mean_shift,
+                        dst=buffers.binary_mean_shift)
+
+        # The binary images are 0 or 255, the saturated sum of
+        # phenoarch_side_binarization is a bitwise or
+        cv2.bitwise_or(buffers.binary_mean_shift, buffers.binary_hsv,
+                       dst=buffers.binary_mean_shift)
+
+        result = cv2.medianBlur(buffers.binary_mean_shift, 3)
+        if result.shape != (self.roi[3], self.roi[2]):
+            result = numpy.ascontiguousarray(result[self._inner])
+
+        return result
+
+
+def phenoarch_side_binarization_stream(images,
+                                       mean_image,
+                                       threshold=0.3,
+                                       dark_background=False,
+                                       hsv_min=(30, 25, 0),
+                                       hsv_max=(150, 254, 165),
+                                       mask_mean_shift=None,
+                                       mask_hsv=None,
+                                       roi=None,
+                                       threads=None,
+                                       executor=None,
+                                       verbose=False):
+    """
+    Binarize a stream of side images with a SideBinarizationKernel (same
+    result as phenoarch_side_binarization) on a pool of threads (OpenCV
+    releases the GIL).
+
+    The images are read from the iterable only when a worker is available,
+    and the temporary images of each worker are allocated once and reused,
+    so the memory used does not depend on the number of images. The binary
+    images are yielded as soon as they are completed, so not necessarily
+    in the input order.
+
+    Parameters
+    ----------
+    images : iterable of numpy.ndarray
+        Iterable (list, generator, ...) of the BGR images
+
+    mean_image : numpy.ndarray
+        Mean image given to threshold_meanshift
+
+    threshold, dark_background, hsv_min, hsv_max, mask_mean_shift, mask_hsv :
+        Parameters of phenoarch_side_binarization
+
+    roi : (int, int, int, int), optional
+        (x, y, width, height) region of the images binarized, see
+        SideBinarizationKernel
+
+    threads : int, optional
+        Number of threads of the pool created when executor is None. By
+        default the number of CPU.
+
+    executor : concurrent.futures.Executor, optional
+        Thread pool reused between calls. It is not shut down by this
+        function.
+
+    verbose : bool, optional
+        If True, print the number of images binarized and the throughput in
+        images per second when the generator is exhausted or closed.
+
+    Returns
+    -------
+    out : generator of (int, numpy.ndarray)
+        Index of the image in images and its binary image
+    """
+    kernel = SideBinarizationKernel(mean_image, threshold, dark_background,
+                                    hsv_min, hsv_max, mask_mean_shift,
+                                    mask_hsv, roi=roi)
+
+    own_executor = executor is None
+    if own_executor:
+        if threads is None:
+            threads = multiprocessing.cpu_count()
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=threads)
+
+    max_pending = 2 * (threads or multiprocessing.cpu_count())
+
+    free_buffers = list()
+    pending = dict()
+    images = enumerate(images)
+
+    nb_images = 0
+    start = time.time()
+    try:
+        while True:
+            for index, image in images:
+                if free_buffers:
+                    buffers = free_buffers.pop()
+                else:
+                    buffers = _SideBinarizationBuffers(kernel.region_shape)
+
+                future = executor.submit(kernel, image, buffers)
+                pending[future] = (index, buffers)
+
+                if len(pending) >= max_pending:
+                    break
+
+            if not pending:
+                break
+
+            done, _ = concurrent.futures.wait(
+                pending, return_when=concurrent.futures.FIRST_COMPLETED)
+
+            for future in done:
+                index, buffers = pending.pop(future)
+                free_buffers.append(buffers)
+                nb_images += 1
+                yield index, future.result()
+    finally:
+        for future in pending:
+            future.cancel()
+        if own_executor:
+            executor.shutdown(wait=True)
+
+        if verbose is True:
+            elapsed = time.time() - start
+            print("{} images binarized in {:.1f} s ({:.1f} images/s)".format(
+                nb_images, elapsed, nb_images / max(elapsed, 1e-9)))
@@ -49,14 +49,18 @@ def median_color_from_images(vertices, faces, calibration, images):
 
     angles = numpy.array(range(0, 360, 30)).astype(float)
 
+    # Project all the vertices once per angle
+    vertices = numpy.array(vertices)
+    vertices_projected = [
+        calibration.get_projection(angle)(vertices).astype(int)
+        for angle in angles]
+
     colors = list()
     for ind, (i, j, k) in enumerate(faces):
-        pt1, pt2, pt3 = vertices[i], vertices[j], vertices[k]
-        arr = numpy.array([pt1, pt2, pt3])
 
         cc = list()
-        for angle in angles:
-            pts = calibration.get_projection(angle)(arr).astype(int)
+        for angle, pts_projected in zip(angles, vertices_projected):
+            pts = pts_projected[[i, j, k]]
             if pts[0][1] == pts[1][1] == pts[2][1]:
                 color = images["side"][angle][(pts[:, 0], pts[:, 1])]
             else:
@@ -147,11 +151,11 @@ def project_mesh_on_image(vertices, faces, shape_image, projection):
     height, length = shape_image
     img = numpy.zeros((height, length), dtype=numpy.uint8)
 
-    # triangles = list()
+    # Project all the vertices once
+    vertices_projected = projection(vertices).astype(int)
+
     for i, j, k in faces:
-        pt1, pt2, pt3 = vertices[i], vertices[j], vertices[k]
-        arr = numpy.array([pt1, pt2, pt3])
-        pts = projection(arr).astype(int)
+        pts = vertices_projected[[i, j, k]]
         if pts[0][1] == pts[1][1] == pts[2][1]:
             continue
         else:
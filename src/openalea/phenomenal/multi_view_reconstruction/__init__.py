@@ -20,8 +20,13 @@ Main's function
    :toctree: generated/
 
     reconstruction_3d
+    reconstruction_3d_batch
+    crop_image_views
     project_voxel_centers_on_image
+    rasterize_boxes
     project_voxels_position_on_image
+    project_voxels_position_on_image_views
+    get_voxels_silhouette
     image_error
     reconstruction_error
 
@@ -10,13 +10,13 @@
 from __future__ import division, print_function, absolute_import
 
 import collections
-import math
 import numpy
 
-from .multi_view_reconstruction import get_bounding_box_voxel_projected
-from ..object import VoxelOctree
+from .multi_view_reconstruction import (get_bounding_box_voxel_projected,
+                                       voxels_is_visible_in_image)
+from ..object import VoxelOctree, VoxelLinearOctree
 # ==============================================================================
-# Function for no kep
+
 
 def voxel_is_visible_in_image(voxel_center,
                               voxel_size,
@@ -27,21 +27,7 @@ def voxel_is_visible_in_image(voxel_center,
     Return True or False if the voxel projected on image with the function
     projection (projection) have positive value on image.
 
-    **Algorithm**
-
-    1. Project the center voxel position on image if the position projected
-       (x, y) is positive on image return True
-
-    |
-
-    2. Project the bounding box of voxel in image, if one of the 4 corners
-       position of the bounding box projected have positive value on image
-       return True
-
-    |
-
-    3. Check if one pixel containing in the bounding box projected on image
-       have positive value, if yes return True else return False
+    The voxel is tested with voxels_is_visible_in_image.
 
     Parameters
     ----------
@@ -55,8 +41,12 @@ def voxel_is_visible_in_image(voxel_center,
         binary image
 
     projection : function ((x, y, z)) -> (x, y)
-        Function of projection who take 1 argument (tuple of position (x, y, z))
-         and return this position 2D (x, y)
+        Function of projection who take 1 argument (numpy.array([[x, y, z],
+        ...] of voxels positions) and return the projected 2D position
+        numpy.array([[x, y], ...])
+
+    inclusive : bool
+        If True, a voxel projected out of the image is visible
 
     Returns
     -------
@@ -64,46 +54,106 @@ def voxel_is_visible_in_image(voxel_center,
         True if voxel have a positive correspondence on image otherwise return
         False
     """
+    return bool(voxels_is_visible_in_image(
+        numpy.array([voxel_center], dtype=float),
+        voxel_size, image, projection, inclusive)[0])
+
 
+def _clipped_bounding_box(voxels_position, voxels_size, image, projection):
+    # Projected bounding boxes of the voxels, rounded outward and clipped to
+    # the image, as (x_min, y_min, x_max, y_max) arrays of pixel indexes
     height_image, length_image = image.shape
-    x, y = projection(voxel_center)
 
-    if (0 <= x < length_image and
-        0 <= y < height_image and
-            image[int(y), int(x)] > 0):
-        return True
+    min_xy_max_xy = get_bounding_box_voxel_projected(
+        voxels_position, voxels_size, projection)
 
-    # ==========================================================================
+    x_min = numpy.clip(numpy.floor(min_xy_max_xy[:, 0]), 0, length_image - 1)
+    y_min = numpy.clip(numpy.floor(min_xy_max_xy[:, 1]), 0, height_image - 1)
+    x_max = numpy.clip(numpy.ceil(min_xy_max_xy[:, 2]), 0, length_image - 1)
+    y_max = numpy.clip(numpy.ceil(min_xy_max_xy[:, 3]), 0, height_image - 1)
+
+    return [v.astype(int) for v in (x_min, y_min, x_max, y_max)]
+
+
+def fully_visible_integral_image(image):
+    """
+    Return the integral image of the positive pixels of image used by
+    voxels_is_fully_visible_in_image, with a first row and column of zeros.
+
+    Parameters
+    ----------
+    image: numpy.ndarray
+        binary image
+
+    Returns
+    -------
+    out : numpy.ndarray
+        Integral image of shape (height + 1, length + 1)
+    """
+    height_image, length_image = image.shape
+
+    image_int = numpy.zeros((height_image + 1, length_image + 1),
+                            dtype=numpy.int32)
+    numpy.cumsum(numpy.cumsum(image > 0, axis=0, dtype=numpy.int32),
+                 axis=1, out=image_int[1:, 1:])
+
+    return image_int
+
+
+def voxels_is_fully_visible_in_image(voxels_position,
+                                     voxels_size,
+                                     image,
+                                     projection,
+                                     image_int=None):
+    """
+    Return a numpy array containing True for the voxels whose bounding box
+    projected on image contains only positive pixels.
+
+    Parameters
+    ----------
+    voxels_position : numpy.ndarray
+        Center position of the voxels [[x, y, z], ...]
 
-    x_min, x_max, y_min, y_max = get_bounding_box_voxel_projected(
-        voxel_center, voxel_size, projection)
+    voxels_size : float
+        Size of side geometry of voxel
 
-    if (x_max < 0 or x_min >= length_image or
-            y_max < 0 or y_min >= height_image):
-        return inclusive
+    image: numpy.ndarray
+        binary image
 
-    # if ((not (0 <= x_min < length_image or 0 <= x_max < length_image)) or
-    #         (not (0 <= y_min < height_image or 0 <= y_max < height_image))):
-    #     return inclusive
+    projection : function ((x, y, z)) -> (x, y)
+        Function of projection who take 1 argument (numpy.array([[x, y, z],
+        ...] of voxels positions) and return the projected 2D position
+        numpy.array([[x, y], ...])
 
-    x_min = int(min(max(math.floor(x_min), 0), length_image - 1))
-    x_max = int(min(max(math.ceil(x_max), 0), length_image - 1))
-    y_min = int(min(max(math.floor(y_min), 0), height_image - 1))
-    y_max = int(min(max(math.ceil(y_max), 0), height_image - 1))
+    image_int : numpy.ndarray, optional
+        Integral image of image (see fully_visible_integral_image), computed
+        if not given. Give it when testing several sets of voxels on the same
+        image.
 
-    if (image[y_min, x_min] > 0 or
-        image[y_max, x_min] > 0 or
-        image[y_min, x_max] > 0 or
-            image[y_max, x_max] > 0):
-        return True
+    Returns
+    -------
+    out : numpy.ndarray
+        Boolean array
+    """
+    voxels_position = numpy.asarray(voxels_position, dtype=float)
+    if len(voxels_position) == 0:
+        return numpy.zeros(0, dtype=bool)
+
+    x_min, y_min, x_max, y_max = _clipped_bounding_box(
+        voxels_position, voxels_size, image, projection)
 
     # ==========================================================================
 
-    if numpy.any(image[y_min:y_max + 1, x_min:x_max + 1] > 0):
-        return True
+    if image_int is None:
+        image_int = fully_visible_integral_image(image)
 
-    return False
+    # int64 avoid the overflow of the intermediate sums
+    nb_positive = (image_int[y_max + 1, x_max + 1].astype(numpy.int64) -
+                   image_int[y_min, x_max + 1] -
+                   image_int[y_max + 1, x_min] +
+                   image_int[y_min, x_min])
 
+    return nb_positive == (x_max - x_min + 1) * (y_max - y_min + 1)
 
 
 def voxel_is_fully_visible_in_image(voxel_center,
@@ -111,95 +161,92 @@ def voxel_is_fully_visible_in_image(voxel_center,
                                     image,
                                     projection):
 
-    height_image, length_image = image.shape
+    x_min, y_min, x_max, y_max = [v[0] for v in _clipped_bounding_box(
+        numpy.array([voxel_center], dtype=float), voxel_size, image,
+        projection)]
 
-    # ==========================================================================
+    return bool(numpy.all(image[y_min:y_max + 1, x_min:x_max + 1] > 0))
 
-    x_min, x_max, y_min, y_max = get_bounding_box_voxel_projected(
-        voxel_center, voxel_size, projection)
 
-    x_min = int(min(max(math.floor(x_min), 0), length_image - 1))
-    x_max = int(min(max(math.ceil(x_max), 0), length_image - 1))
-    y_min = int(min(max(math.floor(y_min), 0), height_image - 1))
-    y_max = int(min(max(math.ceil(y_max), 0), height_image - 1))
+def _leafs_is_surrender(leaf_nodes):
+    # VoxelNode.is_surrender of all the leafs at the same time, on the linear
+    # octree of their root
+    if len(leaf_nodes) == 0:
+        return numpy.zeros(0, dtype=bool)
 
-    # ==========================================================================
+    root = leaf_nodes[0].get_root()
+    octree = VoxelLinearOctree.from_voxel_octree(
+        VoxelOctree.from_voxel_node(root))
 
-    if numpy.all(image[y_min:y_max + 1, x_min:x_max + 1] > 0):
-        return True
+    index = octree.find_nodes_position([leaf.position for leaf in leaf_nodes],
+                                       [leaf.size for leaf in leaf_nodes])
 
-    return False
+    return octree.is_surrender(index)
 
 
 def remove_surrounded(leaf_nodes):
-    kept = collections.deque()
-    for leaf in leaf_nodes:
-
-        if not leaf.is_surrender():
-            kept.append(leaf)
+    """
+    Return in a collections.deque the leaf nodes which are not surrounded by
+    nodes with data True (see VoxelLinearOctree.is_surrender), the surface of
+    the octree.
+    """
+    leaf_nodes = list(leaf_nodes)
+    surrounded = _leafs_is_surrender(leaf_nodes)
 
-    return kept
+    return collections.deque(
+        leaf for leaf, is_surrender in zip(leaf_nodes, surrounded)
+        if not is_surrender)
 
 
 def remove_surrounded_fully_visible(leaf_nodes,
                                     images_projections,
                                     error_tolerance=0):
-    kept = collections.deque()
-    for leaf in leaf_nodes:
-
-        if leaf.is_surrender():
-
-            voxel_center = leaf.position
-            voxel_size = leaf.size
-            negative_weight = 0
-
-            for image, projection in images_projections:
-                if not voxel_is_fully_visible_in_image(
-                        voxel_center, voxel_size, image, projection):
-                    negative_weight += 1
-                    if negative_weight > error_tolerance:
-                        break
-
-            if not negative_weight <= error_tolerance:
-                kept.append(leaf)
-
-        else:
-            kept.append(leaf)
-
-    return kept
+    """
+    Return in a collections.deque the leaf nodes which are not surrounded,
+    or not fully visible on more than error_tolerance images.
+    """
+    leaf_nodes = list(leaf_nodes)
+    surrounded = numpy.flatnonzero(_leafs_is_surrender(leaf_nodes))
+
+    kept = numpy.ones(len(leaf_nodes), dtype=bool)
+    if len(surrounded) > 0:
+        voxels_position = numpy.array(
+            [leaf_nodes[i].position for i in surrounded], dtype=float)
+        voxels_size = numpy.array([leaf_nodes[i].size for i in surrounded])
+
+        negative_weight = numpy.zeros(len(surrounded), dtype=int)
+        for image, projection in images_projections:
+            image_int = fully_visible_integral_image(image)
+            for size in numpy.unique(voxels_size):
+                same_size = voxels_size == size
+                negative_weight[same_size] += numpy.logical_not(
+                    voxels_is_fully_visible_in_image(
+                        voxels_position[same_size], size, image, projection,
+                        image_int=image_int))
+
+        kept[surrounded] = negative_weight > error_tolerance
+
+    return collections.deque(
+        leaf for leaf, is_kept in zip(leaf_nodes, kept) if is_kept)
 
 # ==============================================================================
 
 
-def _keep_visible(voxels_node,
+def _keep_visible(voxels_position,
+                  voxels_size,
                   image_views,
                   error_tolerance=0):
 
-    kept = collections.deque()
-    for voxel_node in voxels_node:
+    photo_consistent = numpy.zeros(len(voxels_position), dtype=int)
+    for image_view in image_views:
+        photo_consistent += voxels_is_visible_in_image(
+            voxels_position,
+            voxels_size,
+            image_view.image,
+            image_view.projection,
+            image_view.inclusive) > 0
 
-        voxel_position = voxel_node.position
-        voxel_size = voxel_node.size
-        negative_weight = 0
-
-        for image_view in image_views:
-            if not voxel_is_visible_in_image(
-                    voxel_position,
-                    voxel_size,
-                    image_view.image,
-                    image_view.projection,
-                    image_view.inclusive):
-                negative_weight += 1
-                if negative_weight > error_tolerance:
-                    break
-
-        if negative_weight <= error_tolerance:
-            kept.append(voxel_node)
-
-        else:
-            voxel_node.data = False
-
-    return kept
+    return photo_consistent >= len(image_views) - error_tolerance
 
 
 # ==============================================================================
@@ -209,7 +256,8 @@ def reconstruction_3d_octree(image_views,
                              error_tolerance=0,
                              voxel_center_origin=(0.0, 0.0, 0.0),
                              world_size=4096,
-                             verbose=False):
+                             verbose=False,
+                             linear=False):
     """
     Construct a list of voxel represented object with positive value on binary
     image in images of images_projections.
@@ -242,21 +290,24 @@ def reconstruction_3d_octree(image_views,
         If True, print for each iteration of split, number of voxel before and
         after projection on images
 
+    linear : bool, optional
+        If True, return the VoxelLinearOctree built, instead of converting it
+        to a VoxelOctree (one VoxelNode object by node).
+
     Returns
     -------
-    out : collections.deque
-        List of visible voxel projected on each image according
-        the error_tolerance
+    out : VoxelOctree or VoxelLinearOctree
+        Octree of the voxels, the data of the nodes visible on each image
+        according the error_tolerance are True
     """
 
     if len(image_views) == 0:
         raise ValueError("Len images view have not length")
 
-    voxel_octree = VoxelOctree.from_position(
+    voxel_octree = VoxelLinearOctree.from_position(
         voxel_center_origin, world_size, True)
 
-    leaf_nodes = collections.deque()
-    leaf_nodes.append(voxel_octree.root)
+    leafs = numpy.array([0])
 
     nb_iteration = 0
     while voxels_size < world_size:
@@ -265,18 +316,22 @@ def reconstruction_3d_octree(image_views,
 
     for i in range(nb_iteration):
 
-        tmp = collections.deque()
-        for leaf in leaf_nodes:
-            tmp.extend(leaf.creates_sons())
-        leaf_nodes = tmp
+        # No voxel visible at the previous level
+        if len(leafs) == 0:
+            break
+
+        leafs = voxel_octree.creates_sons(leafs)
 
         if verbose is True:
             print('Iteration', i + 1, '/', nb_iteration, end="")
-            print(' : ', len(leaf_nodes), end="")
+            print(' : ', len(leafs), end="")
 
-        leaf_nodes = _keep_visible(leaf_nodes,
-                                   image_views,
-                                   error_tolerance)
+        kept = _keep_visible(voxel_octree.nodes_position(leafs),
+                             world_size / 2.0 ** (i + 1),
+                             image_views,
+                             error_tolerance)
+        voxel_octree.data[leafs[~kept]] = False
+        leafs = leafs[kept]
 
         # Gain time is not enough for keeping that
         # if i + 1 < nb_iteration:
@@ -285,6 +340,9 @@ def reconstruction_3d_octree(image_views,
         #                                                  error_tolerance)
 
         if verbose is True:
-            print(' - ', len(leaf_nodes))
+            print(' - ', len(leafs))
+
+    if linear:
+        return voxel_octree
 
-    return voxel_octree
+    return voxel_octree.to_voxel_octree()
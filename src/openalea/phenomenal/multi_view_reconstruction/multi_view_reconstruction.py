@@ -10,15 +10,21 @@
 from __future__ import division, print_function
 
 import math
+import time
+import multiprocessing
+import multiprocessing.pool
+import multiprocessing.shared_memory
+import concurrent.futures
 import cv2
-import scipy.spatial
+import scipy.sparse
 import collections
 import numpy
 import sklearn.neighbors
 
 import openalea.phenomenal.multi_view_reconstruction._c_mvr as c_mvr
 
-from ..object import VoxelGrid
+from ..object import VoxelGrid, ImageView
+from ..image import binary_image_roi
 # ==============================================================================
 # Class
 
@@ -92,7 +98,7 @@ def get_bounding_box_voxel_projected(voxels_position,
     Returns
     -------
     bbox : numpy.ndarray
-        [[x_min, x_max, y_min, y_max], ...]
+        [[x_min, y_min, x_max, y_max], ...]
         Containing min and max value of point_3d projection in x and y axes.
     """
 
@@ -102,7 +108,14 @@ def get_bounding_box_voxel_projected(voxels_position,
 
     pt = numpy.reshape(pt, (pt.shape[0] // 8, 8, 2))
 
-    bbox = numpy.column_stack((pt.min(axis=1), pt.max(axis=1)))
+    # Pairwise min / max of the 8 corners, faster than a reduction on the
+    # short middle axis
+    bbox = numpy.empty((pt.shape[0], 4), dtype=pt.dtype)
+    numpy.minimum(pt[:, 0], pt[:, 1], out=bbox[:, 0:2])
+    numpy.maximum(pt[:, 0], pt[:, 1], out=bbox[:, 2:4])
+    for i in range(2, 8):
+        numpy.minimum(bbox[:, 0:2], pt[:, i], out=bbox[:, 0:2])
+        numpy.maximum(bbox[:, 2:4], pt[:, i], out=bbox[:, 2:4])
 
     return bbox
 
@@ -163,12 +176,45 @@ def split_voxels_in_eight(voxels):
 
 # ==============================================================================
 
+def integral_image_box_sum(image_int, min_xy_max_xy):
+    """ Return for each box the sum of the integral image between the corners
+    (x_min, y_min) excluded and (x_max, y_max) included.
+
+    The four lookups of all the boxes are done at once with fancy indexing.
+
+    Parameters
+    ----------
+    image_int : numpy.ndarray
+        Integral image of a binary image
+
+    min_xy_max_xy : numpy.ndarray
+        [[x_min, y_min, x_max, y_max], ...] integer corners of the boxes,
+        already clipped to the image shape
+
+    Returns
+    -------
+    out : numpy.ndarray
+        Number of positive pixels in each box
+    """
+    x_min = min_xy_max_xy[:, 0]
+    y_min = min_xy_max_xy[:, 1]
+    x_max = min_xy_max_xy[:, 2]
+    y_max = min_xy_max_xy[:, 3]
+
+    # int64 avoid the uint32 wrap-around of the intermediate subtraction
+    return (image_int[y_max, x_max].astype(numpy.int64) +
+            image_int[y_min, x_min] -
+            image_int[y_min, x_max] -
+            image_int[y_max, x_min])
+
+
 def voxels_is_visible_in_image(voxels_position,
                                voxels_size,
                                image,
                                projection,
                                inclusive,
-                               image_int=None):
+                               image_int=None,
+                               frame=None):
     """
     Return a numpy array containing True if the voxel are
         projected is photo-consistent on image else False
@@ -209,6 +255,11 @@ def voxels_is_visible_in_image(voxels_position,
 
     image_int: Integrale image of the binary image (optimization)
 
+    frame : (x_min, y_min, x_max, y_max), optional
+        Limits of the camera image in the coordinates of image, when image is
+        only a region of it (see crop_image_views). The voxels projected out
+        of image but in the frame are not visible, inclusive only applies to
+        the voxels projected out of the frame.
 
     Returns
     -------
@@ -246,7 +297,12 @@ def voxels_is_visible_in_image(voxels_position,
           (min_xy_max_xy[:, 1] >= height))
 
     not_vv = numpy.logical_not(vv)
-    result[vv] = 1 if inclusive else 0
+    result[vv] = 1 if inclusive and frame is None else 0
+    if inclusive and frame is not None:
+        result[(min_xy_max_xy[:, 2] < frame[0]) |
+               (min_xy_max_xy[:, 0] >= frame[2]) |
+               (min_xy_max_xy[:, 3] < frame[1]) |
+               (min_xy_max_xy[:, 1] >= frame[3])] = 1
 
     min_xy_max_xy = min_xy_max_xy[not_vv]
     bb = result[not_vv]
@@ -265,15 +321,11 @@ def voxels_is_visible_in_image(voxels_position,
 
     # ==========================================================================
 
-    for i, (x_min, y_min, x_max, y_max) in enumerate(min_xy_max_xy):
-
-        if (image_int[y_max, x_max] + image_int[y_min, x_min]
-        - image_int[y_min, x_max] - image_int[y_max, x_min]) > 0:
-            bb[i] = 1
+    if image_int is None:
+        image_int = numpy.zeros_like(image, dtype=numpy.uint32)
+        c_mvr.integral_image(image, image_int)
 
-    # for i, (x_min, y_min, x_max, y_max) in enumerate(min_xy_max_xy):
-    #     if numpy.count_nonzero(image[y_min:y_max + 1, x_min:x_max + 1]) > 0:
-    #         bb[i] = 1
+    bb[integral_image_box_sum(image_int, min_xy_max_xy) > 0] = 1
 
     result[not_vv] = bb
     ori_result[not_cond] = result
@@ -283,11 +335,119 @@ def voxels_is_visible_in_image(voxels_position,
 
 # ==============================================================================
 
+def _voxels_is_visible_in_image_view(args):
+    voxels_position, voxels_size, image_view, image_int = args
+
+    return voxels_is_visible_in_image(voxels_position,
+                                      voxels_size,
+                                      image_view.image,
+                                      image_view.projection,
+                                      image_view.inclusive,
+                                      image_int=image_int,
+                                      frame=image_view.frame)
+
+
+class _SharedArray(object):
+    """
+    Copy of a numpy array in a shared memory block. The instance is pickled
+    as the name of the block, the processes of a pool attach the block
+    instead of receiving a copy of the array.
+    """
+
+    def __init__(self, array):
+        array = numpy.ascontiguousarray(array)
+        self.shape = array.shape
+        self.dtype = array.dtype
+        self._shm = multiprocessing.shared_memory.SharedMemory(
+            create=True, size=max(array.nbytes, 1))
+        self.name = self._shm.name
+        numpy.ndarray(self.shape, self.dtype, buffer=self._shm.buf)[:] = array
+
+    def __getstate__(self):
+        return self.name, self.shape, self.dtype
+
+    def __setstate__(self, state):
+        self.name, self.shape, self.dtype = state
+        self._shm = None
+
+    def attach(self):
+        shm = multiprocessing.shared_memory.SharedMemory(name=self.name)
+        return shm, numpy.ndarray(self.shape, self.dtype, buffer=shm.buf)
+
+    def unlink(self):
+        self._shm.close()
+        self._shm.unlink()
+
+
+def _is_process_executor(executor):
+    return (isinstance(executor, concurrent.futures.ProcessPoolExecutor) or
+            (isinstance(executor, multiprocessing.pool.Pool) and
+             not isinstance(executor, multiprocessing.pool.ThreadPool)))
+
+
+def _voxels_is_visible_in_shared_image_view(args):
+    (shared_position, voxels_size, shared_image, shared_int,
+     projection, inclusive, frame) = args
+
+    shms = list()
+    arrays = list()
+    try:
+        for shared in (shared_position, shared_image, shared_int):
+            if shared is None:
+                arrays.append(None)
+            else:
+                shm, array = shared.attach()
+                shms.append(shm)
+                arrays.append(array)
+
+        return voxels_is_visible_in_image(arrays[0],
+                                          voxels_size,
+                                          arrays[1],
+                                          projection,
+                                          inclusive,
+                                          image_int=arrays[2],
+                                          frame=frame)
+    finally:
+        # The views on the blocks must be released before closing them
+        del arrays
+        for shm in shms:
+            shm.close()
+
+
+def _map_shared_image_views(executor, voxels_position, voxels_size,
+                            image_views, int_images):
+    shared_position = _SharedArray(voxels_position)
+    shareds = [shared_position]
+    try:
+        args = list()
+        for image_view, image_int in zip(image_views, int_images):
+            shared_image = _SharedArray(image_view.image)
+            shareds.append(shared_image)
+            shared_int = None
+            if image_int is not None:
+                shared_int = _SharedArray(image_int)
+                shareds.append(shared_int)
+
+            args.append((shared_position, voxels_size, shared_image,
+                         shared_int, image_view.projection,
+                         image_view.inclusive, image_view.frame))
+
+        return list(executor.map(_voxels_is_visible_in_shared_image_view,
+                                 args))
+    finally:
+        for shared in shareds:
+            shared.unlink()
+
+
 def kept_visible_voxel(voxels_position,
                        voxels_size,
                        image_views,
                        error_tolerance=0,
-                       int_images=None):
+                       int_images=None,
+                       executor=None,
+                       views_order=None,
+                       nb_tested=None,
+                       nb_rejected=None):
     """
     Kept in a new collections.deque the voxel who is visible on each image of
     images_projections according the error_tolerance
@@ -311,24 +471,89 @@ def kept_visible_voxel(voxels_position,
 
     int_images: Integral image of the binary image (optimization)
 
+    executor : object, optional
+        Executor (concurrent.futures.ThreadPoolExecutor,
+        multiprocessing.pool.ThreadPool, ...) providing a map method. If
+        given, all the views are tested at the same time on the whole set of
+        voxels and the visibility counts are reduced afterwards. With a
+        process pool (concurrent.futures.ProcessPoolExecutor,
+        multiprocessing.pool.Pool), the voxels position, the images and the
+        integral images are copied once in shared memory
+        (multiprocessing.shared_memory) and only the projections are
+        pickled for each view.
+
+    views_order : [int, ...], optional
+        Indexes of the image views in the order they are tested, by default
+        the order of image_views. The voxels rejected by a view are not
+        tested on the next ones, so the views rejecting the most voxels
+        should be first. The consistent voxels do not depend on the order.
+
+    nb_tested : numpy.ndarray, optional
+        Array of len(image_views) integers, incremented by the number of
+        voxels tested on each view
+
+    nb_rejected : numpy.ndarray, optional
+        Array of len(image_views) integers, incremented by the number of
+        tested voxels not visible on each view
+
     Returns
     -------
     out : VoxelsStage
     """
 
+    if int_images is None:
+        int_images = [None] * len(image_views)
+
+    if executor is not None:
+        if _is_process_executor(executor):
+            visibles = _map_shared_image_views(
+                executor, voxels_position, voxels_size, image_views,
+                int_images)
+        else:
+            visibles = list(executor.map(
+                _voxels_is_visible_in_image_view,
+                [(voxels_position, voxels_size, image_view, image_int)
+                 for image_view, image_int in zip(image_views, int_images)]))
+        photo_consistent = sum(visibles)
+
+        if nb_tested is not None:
+            nb_tested += len(voxels_position)
+        if nb_rejected is not None:
+            nb_rejected += [len(visible) - numpy.count_nonzero(visible)
+                            for visible in visibles]
+
+        cond = photo_consistent >= len(image_views) - error_tolerance
+
+        consistent = Voxels(voxels_position[cond], voxels_size)
+        inconsistent = Voxels(voxels_position[numpy.logical_not(cond)],
+                              voxels_size)
+
+        return VoxelsStage(consistent, inconsistent)
+
+    if views_order is None:
+        views_order = range(len(image_views))
+
     photo_consistent = numpy.zeros((len(voxels_position), ),  dtype=int)
     no_kept = None
 
-    for i, image_view in enumerate(image_views):
-        photo_consistent += voxels_is_visible_in_image(
+    for k, i in enumerate(views_order):
+        image_view = image_views[i]
+        visible = voxels_is_visible_in_image(
             voxels_position,
             voxels_size,
             image_view.image,
             image_view.projection,
             image_view.inclusive,
-            image_int=int_images[i])
+            image_int=int_images[i],
+            frame=image_view.frame)
+
+        if nb_tested is not None:
+            nb_tested[i] += len(visible)
+        if nb_rejected is not None:
+            nb_rejected[i] += len(visible) - numpy.count_nonzero(visible)
 
-        cond = photo_consistent >= i + 1 - error_tolerance
+        photo_consistent += visible
+        cond = photo_consistent >= k + 1 - error_tolerance
 
         if no_kept is None:
             no_kept = voxels_position[numpy.logical_not(cond)]
@@ -356,44 +581,137 @@ def have_image_ref(image_views):
     return False
 
 
-def create_groups(image_views, inconsistent):
+def _groups_incidence(image_views, inconsistent):
+    """ Sparse incidence matrix between the missing pixels of the reference
+    images and the inconsistent voxels whose bounding box contains them.
 
-    groups = collections.defaultdict(list)
-    kept_groups = collections.defaultdict(list)
+    Returns the (group_id, y, x) of the missing pixels contained in at least
+    one bounding box (view order, then row-major order) and the CSR matrix
+    of their voxel indexes (ascending in each row).
+    """
+    keys, rows, columns = list(), list(), list()
+    nb_pixels = 0
 
-    group_id = 0
-    for iv in image_views:
-        if iv.image_ref is not None:
-            height, length = iv.image.shape
+    for group_id, iv in enumerate(image_views):
+        if iv.image_ref is None:
+            continue
 
-            min_xy_max_xy = get_bounding_box_voxel_projected(
-                inconsistent.position, inconsistent.size, iv.projection)
+        height, length = iv.image.shape
+
+        # Missing pixels, sorted by linear index
+        missing = iv.image_ref[iv.yy, iv.xx] > 0
+        yy, xx = iv.yy[missing], iv.xx[missing]
+        linear = yy.astype(numpy.int64) * length + xx
+
+        min_xy_max_xy = get_bounding_box_voxel_projected(
+            inconsistent.position, inconsistent.size, iv.projection)
+
+        inside = numpy.logical_not((min_xy_max_xy[:, 2] < 0) |
+                                   (min_xy_max_xy[:, 0] >= length) |
+                                   (min_xy_max_xy[:, 3] < 0) |
+                                   (min_xy_max_xy[:, 1] >= height))
+        voxels = numpy.flatnonzero(inside)
+
+        min_xy_max_xy = numpy.floor(min_xy_max_xy[inside]).astype(int)
+        min_xy_max_xy[:, 0::2] = numpy.clip(min_xy_max_xy[:, 0::2],
+                                            0, length - 1)
+        min_xy_max_xy[:, 1::2] = numpy.clip(min_xy_max_xy[:, 1::2],
+                                            0, height - 1)
+
+        # One segment [x_min, x_max] per row of each bounding box
+        nb_rows = min_xy_max_xy[:, 3] - min_xy_max_xy[:, 1] + 1
+        segment_voxels = numpy.repeat(numpy.arange(len(voxels)), nb_rows)
+        y = (numpy.arange(len(segment_voxels)) -
+             numpy.repeat(numpy.cumsum(nb_rows) - nb_rows, nb_rows) +
+             min_xy_max_xy[segment_voxels, 1])
+
+        # Missing pixels in each segment
+        start = numpy.searchsorted(
+            linear, y * length + min_xy_max_xy[segment_voxels, 0], 'left')
+        stop = numpy.searchsorted(
+            linear, y * length + min_xy_max_xy[segment_voxels, 2], 'right')
+        nb = stop - start
+
+        pixels = (numpy.arange(nb.sum()) -
+                  numpy.repeat(numpy.cumsum(nb) - nb, nb) +
+                  numpy.repeat(start, nb))
+
+        keys.append(numpy.column_stack(
+            (numpy.full(len(yy), group_id), yy, xx)))
+        rows.append(nb_pixels + pixels)
+        columns.append(voxels[numpy.repeat(segment_voxels, nb)])
+        nb_pixels += len(yy)
+
+    if nb_pixels == 0:
+        return (numpy.zeros((0, 3), dtype=int),
+                scipy.sparse.csr_matrix((0, len(inconsistent.position)),
+                                        dtype=bool))
+
+    rows = numpy.concatenate(rows)
+    columns = numpy.concatenate(columns)
+    incidence = scipy.sparse.csr_matrix(
+        (numpy.ones(len(rows), dtype=bool), (rows, columns)),
+        shape=(nb_pixels, len(inconsistent.position)))
+    incidence.sort_indices()
+
+    # Kept only the pixels of at least one bounding box
+    kept = numpy.diff(incidence.indptr) > 0
+
+    return numpy.concatenate(keys)[kept], incidence[kept]
 
-            # add each voxels to a visual cones
-            for i, (x_min, y_min, x_max, y_max) in enumerate(min_xy_max_xy):
 
-                if x_max < 0 or x_min >= length or y_max < 0 or y_min >= height:
-                    continue
+def create_groups(image_views, inconsistent):
+    """ Group the inconsistent voxels by the missing pixels (positive in the
+    reference image but not in the image of the consistent voxels) of their
+    projected bounding box.
+
+    Returns
+    -------
+    out : dict
+        (group_id, y, x) -> [index of the inconsistent voxels, ...]
+    """
+    keys, incidence = _groups_incidence(image_views, inconsistent)
 
-                x_min = int(min(max(math.floor(x_min), 0), length - 1))
-                y_min = int(min(max(math.floor(y_min), 0), height - 1))
-                x_max = int(min(max(math.floor(x_max), 0), length - 1))
-                y_max = int(min(max(math.floor(y_max), 0), height - 1))
+    kept_groups = collections.defaultdict(list)
+    for key, start, stop in zip(keys.tolist(),
+                                incidence.indptr[:-1],
+                                incidence.indptr[1:]):
+        kept_groups[tuple(key)] = incidence.indices[start:stop].tolist()
 
-                img = iv.image_ref[y_min:y_max + 1, x_min:x_max + 1]
-                yy, xx = numpy.where(img > 0)
-                yy += y_min
-                xx += x_min
-                for y, x in zip(yy, xx):
-                    groups[(group_id, y, x)].append(i)
+    return kept_groups
 
-            for y, x in zip(iv.yy, iv.xx):
-                if len(groups[(group_id, y, x)]) > 0:
-                    kept_groups[(group_id, y, x)] = groups[(group_id, y, x)]
 
-        group_id += 1
+def _check_groups_incidence(neigh, inconsistent, incidence, nb_distance):
+    # Keep in each group (row) the nb_distance voxels the closest to the
+    # consistent voxels, the ties are broken by voxel index
+    used = numpy.zeros(len(inconsistent.position), dtype=bool)
+    used[incidence.indices] = True
+    voxels = numpy.flatnonzero(used)
+    distance = numpy.zeros(len(inconsistent.position))
+    if len(voxels) > 0:
+        distance[voxels] = neigh.kneighbors(
+            inconsistent.position[voxels])[0].min(axis=1)
+
+    # Rank of the voxels by distance then index, sorted in each row with a
+    # single integer key
+    nb_voxels = len(inconsistent.position)
+    voxels_order = numpy.lexsort((numpy.arange(nb_voxels), distance))
+    voxels_rank = numpy.empty(nb_voxels, dtype=numpy.int64)
+    voxels_rank[voxels_order] = numpy.arange(nb_voxels)
+
+    rows = numpy.repeat(numpy.arange(incidence.shape[0], dtype=numpy.int64),
+                        numpy.diff(incidence.indptr))
+    key = rows * nb_voxels + voxels_rank[incidence.indices]
+    key.sort()
+
+    rows = key // nb_voxels
+    rank = numpy.arange(len(key)) - incidence.indptr[rows]
+    selected = numpy.zeros(nb_voxels, dtype=bool)
+    selected[voxels_order[key[rank < nb_distance] % nb_voxels]] = True
+
+    position = numpy.unique(inconsistent.position[selected], axis=0)
 
-    return kept_groups
+    return Voxels(position, inconsistent.size)
 
 
 def check_groups(neigh, inconsistent, groups, nb_distance):
@@ -401,18 +719,16 @@ def check_groups(neigh, inconsistent, groups, nb_distance):
     if len(groups.values()) == 0:
         return None
 
-    positions = list()
-    for index in groups.values():
-        index = numpy.array(index)
+    lengths = [len(index) for index in groups.values()]
+    incidence = scipy.sparse.csr_matrix(
+        (numpy.ones(sum(lengths), dtype=bool),
+         numpy.concatenate([numpy.asarray(index, dtype=int)
+                            for index in groups.values()]),
+         numpy.concatenate(([0], numpy.cumsum(lengths)))),
+        shape=(len(lengths), len(inconsistent.position)))
 
-        distance, _ = neigh.kneighbors(inconsistent.position[index])
-        distance = distance.min(axis=1)
-        xx = distance.argsort()[:nb_distance]
-        positions.append(inconsistent.position[index[xx]])
-
-    position = numpy.unique(numpy.concatenate(positions, axis=0), axis=0)
-
-    return Voxels(position, inconsistent.size)
+    return _check_groups_incidence(neigh, inconsistent, incidence,
+                                   nb_distance)
 
 
 def reconstruction_inconsistent(image_views, stages, attractor=None):
@@ -451,10 +767,11 @@ def reconstruction_inconsistent(image_views, stages, attractor=None):
             position = numpy.unique(position, axis=0)
             inconsistent = Voxels(position, inconsistent.size)
 
-        groups = create_groups(image_views, inconsistent)
+        _, incidence = _groups_incidence(image_views, inconsistent)
         nb_distance = max(20 - int((20 / len(stages)) * i), 2)
-        consistents[i] = check_groups(
-            consistent_neighbors, inconsistent, groups, nb_distance)
+        if incidence.shape[0] > 0:
+            consistents[i] = _check_groups_incidence(
+                consistent_neighbors, inconsistent, incidence, nb_distance)
 
     consistent_stages = [None] * len(stages)
     for i, (stage, consistent) in enumerate(zip(stages, consistents)):
@@ -489,13 +806,101 @@ def get_integrale_image(img):
 # ==============================================================================
 
 
+class _OffsetProjection(object):
+    """ Projection on a region of the image, starting at pixel (x, y).
+
+    The integer offset is subtracted from the projected pixel coordinates
+    (exact for the pixels of the region), the projection stays picklable if
+    the original one is.
+    """
+
+    def __init__(self, projection, x, y):
+        self.projection = projection
+        self.offset = numpy.array([x, y], dtype=numpy.float64)
+
+    def __call__(self, pts):
+        return numpy.subtract(self.projection(pts), self.offset)
+
+
+def crop_image_views(image_views, margin=1):
+    """
+    Crop the images of the image views to the bounding rectangle of their
+    positive pixels (and of their reference image) and shift their
+    projections accordingly.
+
+    The reconstruction on the cropped image views gives the same voxels,
+    but the integral images and the visibility tests only use the region
+    of the plant, so the memory and time depend on the plant size and not
+    on the camera resolution.
+
+    Parameters
+    ----------
+    image_views : [ImageView, ...]
+        Image views with binary images
+
+    margin : int, optional
+        Number of pixels kept around the positive pixels. At least 1 pixel is
+        required on the top left side by the integral image lookups.
+
+    Returns
+    -------
+    out : [ImageView, ...]
+        Image views with cropped contiguous images, a projection on the
+        region and the limits of the original image as frame
+    """
+    cropped_image_views = list()
+    for image_view in image_views:
+        height, length = image_view.image.shape
+
+        rectangles = [binary_image_roi(image, margin=margin)
+                      for image in (image_view.image, image_view.image_ref)
+                      if image is not None]
+        rectangles = [r for r in rectangles if r is not None]
+        if not rectangles:
+            # Empty image, one pixel is kept
+            rectangles = [(0, 0, 1, 1)]
+
+        x_min = min(x for x, _, _, _ in rectangles)
+        y_min = min(y for _, y, _, _ in rectangles)
+        x_max = max(x + w for x, _, w, _ in rectangles)
+        y_max = max(y + h for _, y, _, h in rectangles)
+
+        region = (slice(y_min, y_max), slice(x_min, x_max))
+
+        frame = image_view.frame
+        if frame is None:
+            frame = (0, 0, length, height)
+        frame = (frame[0] - x_min, frame[1] - y_min,
+                 frame[2] - x_min, frame[3] - y_min)
+
+        image_ref = image_view.image_ref
+        if image_ref is not None:
+            image_ref = numpy.ascontiguousarray(image_ref[region])
+
+        cropped_image_views.append(ImageView(
+            numpy.ascontiguousarray(image_view.image[region]),
+            _OffsetProjection(image_view.projection, x_min, y_min),
+            inclusive=image_view.inclusive,
+            image_ref=image_ref,
+            frame=frame))
+
+    return cropped_image_views
+
+
+# ==============================================================================
+
+
 def reconstruction_3d(image_views,
                       voxels_size=4,
                       error_tolerance=0,
                       voxel_center_origin=(0.0, 0.0, 0.0),
                       start_voxel_size=4096,
                       voxels_position=None,
-                      attractor=None):
+                      attractor=None,
+                      executor=None,
+                      roi=False,
+                      adaptive_order=False,
+                      counters=None):
     """
     Construct a list of voxel represented object with positive value on binary
     image in images of images_projections.
@@ -524,6 +929,28 @@ def reconstruction_3d(image_views,
         List of first original voxel who will be split. If None, a list is
         create with the voxel_center_origin value.
 
+    executor : object, optional
+        Executor providing a map method (concurrent.futures.Executor,
+        multiprocessing.pool.ThreadPool, ...). If given, the views of each
+        octree level are tested in parallel. A thread pool shares the images
+        without copy; a process pool reads them from shared memory and
+        requires picklable projections (see kept_visible_voxel).
+
+    roi : bool, optional
+        If True, the images are first cropped to the bounding rectangle of
+        the plant (see crop_image_views), the result is the same.
+
+    adaptive_order : bool, optional
+        If True, the views are tested at each octree level by decreasing
+        rejection rate (proportion of the tested voxels not visible) of the
+        previous level, so that the voxels are rejected as soon as possible.
+        The consistent voxels are the same.
+
+    counters : list, optional
+        If given, (voxels_size, nb_tested, nb_rejected) is appended for each
+        tested octree level, nb_tested and nb_rejected being the number of
+        voxels tested and rejected by each view (see kept_visible_voxel).
+
     Returns
     -------
     out : VoxelGrid
@@ -532,6 +959,9 @@ def reconstruction_3d(image_views,
     if len(image_views) == 0:
         raise ValueError("Len images view have not length")
 
+    if roi:
+        image_views = crop_image_views(image_views)
+
     if voxels_position is None:
         voxels_position = numpy.array([voxel_center_origin])
 
@@ -548,9 +978,9 @@ def reconstruction_3d(image_views,
         c_mvr.integral_image(image_view.image, a)
         int_images.append(a)
 
-
     stage = VoxelsStage(Voxels(voxels_position, list_voxels_size[0]), None)
     stages = [stage]
+    views_order = None
 
     while stage.consistent.size != voxels_size:
         if len(stage.consistent.position) == 0:
@@ -561,10 +991,23 @@ def reconstruction_3d(image_views,
         print(voxels.size)
 
         if voxels.size < 512:
+            nb_tested = numpy.zeros(len(image_views), dtype=int)
+            nb_rejected = numpy.zeros(len(image_views), dtype=int)
+
             stage = kept_visible_voxel(
                 voxels.position, voxels.size, image_views,
                 error_tolerance=error_tolerance,
-                int_images=int_images)
+                int_images=int_images,
+                executor=executor,
+                views_order=views_order,
+                nb_tested=nb_tested,
+                nb_rejected=nb_rejected)
+
+            if adaptive_order:
+                rate = nb_rejected / numpy.maximum(nb_tested, 1)
+                views_order = numpy.argsort(-rate, kind='stable')
+            if counters is not None:
+                counters.append((voxels.size, nb_tested, nb_rejected))
         else:
             stage = VoxelsStage(voxels, None)
 
@@ -577,6 +1020,78 @@ def reconstruction_3d(image_views,
 
     return VoxelGrid(consistent_stages[-1].position, consistent_stages[-1].size)
 
+
+def _reconstruction_3d_worker(args):
+    index, image_views, kwargs = args
+
+    return index, reconstruction_3d(image_views, **kwargs)
+
+
+def reconstruction_3d_batch(list_image_views,
+                            processes=None,
+                            pool=None,
+                            stats=None,
+                            **kwargs):
+    """
+    Reconstruct many plants (or time points) on a pool of processes, each
+    plant being reconstructed by reconstruction_3d in one worker.
+
+    The results are yielded as soon as each VoxelGrid is completed, so
+    not necessarily in the input order.
+
+    Parameters
+    ----------
+    list_image_views : [[ImageView, ...], ...]
+        List of the image views of each plant. The projections must be
+        picklable (Projection returned by CalibrationCamera.get_projection)
+
+    processes : int, optional
+        Number of worker processes of the pool created when pool is None. By
+        default the number of CPU.
+
+    pool : multiprocessing.pool.Pool, optional
+        Persistent pool of workers reused between calls. It is not closed by
+        this function.
+
+    stats : dict, optional
+        If given, filled when the generator is exhausted or closed with the
+        number of plants reconstructed ('nb_plants'), the elapsed time in
+        seconds ('time') and the throughput ('plants_per_hour').
+
+    kwargs :
+        Keyword arguments given to reconstruction_3d (voxels_size,
+        error_tolerance, ...)
+
+    Returns
+    -------
+    out : generator of (int, VoxelGrid)
+        Index of the plant in list_image_views and its reconstruction
+    """
+    tasks = [(i, image_views, kwargs)
+             for i, image_views in enumerate(list_image_views)]
+
+    own_pool = pool is None
+    if own_pool:
+        pool = multiprocessing.Pool(processes=processes)
+
+    nb_plants = 0
+    start = time.time()
+    try:
+        for index, voxel_grid in pool.imap_unordered(
+                _reconstruction_3d_worker, tasks):
+            nb_plants += 1
+            yield index, voxel_grid
+    finally:
+        if own_pool:
+            pool.terminate()
+            pool.join()
+
+        if stats is not None:
+            elapsed = time.time() - start
+            stats['nb_plants'] = nb_plants
+            stats['time'] = elapsed
+            stats['plants_per_hour'] = nb_plants * 3600.0 / max(elapsed, 1e-9)
+
 # ==============================================================================
 
 
@@ -585,11 +1100,15 @@ def project_voxel_centers_on_image(voxels_position,
                                    shape_image,
                                    projection,
                                    value=255,
-                                   dtype=numpy.uint8):
+                                   dtype=numpy.uint8,
+                                   count=False):
     """
     Create a image with same shape that shape_image and project each voxel on
     image and write positive value (255) on it.
 
+    The footprints are painted in one pass with a 2D difference array and a
+    cumulative sum, see rasterize_boxes.
+
     Parameters
     ----------
     voxels_position : numpy.ndarray
@@ -605,6 +1124,9 @@ def project_voxel_centers_on_image(voxels_position,
         value between 0 and 255 of positive pixel. By default 255.
     dtype : type
         numpy type of the returned image. By default numpy.uint8.
+    count : bool, optional
+        If True, each pixel holds the number of voxel footprints covering it
+        instead of value.
 
     Returns
     -------
@@ -612,7 +1134,6 @@ def project_voxel_centers_on_image(voxels_position,
         Binary image
     """
     height, length = shape_image
-    img = numpy.zeros((height, length), dtype=dtype)
 
     min_xy_max_xy = get_bounding_box_voxel_projected(
         voxels_position, voxels_size, projection)
@@ -633,12 +1154,183 @@ def project_voxel_centers_on_image(voxels_position,
     (min_xy_max_xy[:, 3])[min_xy_max_xy[:, 3] >= height] = height - 1
     min_xy_max_xy = min_xy_max_xy.astype(int)
 
-    for x_min, y_min, x_max, y_max in min_xy_max_xy:
-        img[y_min:y_max + 1, x_min:x_max + 1] = value
+    return rasterize_boxes(min_xy_max_xy, (height, length),
+                           value=value, dtype=dtype, count=count)
+
+
+def _boxes_pixels(x_min, y_min, heights, lengths, length_image):
+    # Linear indices of all the pixels of the boxes : one segment per box row,
+    # then one index per segment pixel
+    def _ramp(sizes):
+        starts = numpy.cumsum(sizes) - sizes
+        return numpy.arange(sizes.sum()) - numpy.repeat(starts, sizes)
+
+    box = numpy.repeat(numpy.arange(len(heights)), heights)
+    rows_start = ((y_min[box] + _ramp(heights)) * length_image + x_min[box])
+    rows_length = lengths[box]
+
+    return numpy.repeat(rows_start, rows_length) + _ramp(rows_length)
+
+
+def rasterize_boxes(min_xy_max_xy, shape_image, value=1, dtype=numpy.int32,
+                    count=False):
+    """
+    Paint inclusive boxes [x_min, y_min, x_max, y_max] on a new image, without
+    a Python loop over the boxes.
+
+    The four corners of each box are accumulated with +1 / -1 in a 2D
+    difference array restricted to the region covered by the boxes, and the
+    cumulative sum along both axes gives the number of boxes covering each
+    pixel. When the boxes cover less pixels than this region (few boxes
+    spread on the image), the covered pixels are enumerated instead.
+
+    Parameters
+    ----------
+    min_xy_max_xy : numpy.ndarray
+        Integer boxes [[x_min, y_min, x_max, y_max], ...], inside the image
+    shape_image : 2-tuple
+        Size height and length of the image
+    value : int, optional
+        Value of the pixels covered by at least one box
+    dtype : type, optional
+        numpy type of the returned image
+    count : bool, optional
+        If True, each pixel holds the number of boxes covering it instead of
+        value.
+
+    Returns
+    -------
+    out : numpy.ndarray
+        Image of shape shape_image
+    """
+    img = numpy.zeros(shape_image, dtype=dtype)
+    if len(min_xy_max_xy) == 0:
+        return img
+
+    x_min, y_min, x_max, y_max = numpy.asarray(min_xy_max_xy, dtype=int).T
+    y0, x0 = y_min.min(), x_min.min()
+    height = y_max.max() - y0 + 2
+    length = x_max.max() - x0 + 2
+
+    heights, lengths = y_max - y_min + 1, x_max - x_min + 1
+    if numpy.dot(heights, lengths) < height * length:
+        flat = img.reshape(-1)
+        pixels = _boxes_pixels(x_min, y_min, heights, lengths,
+                               shape_image[1])
+        if count:
+            numpy.add.at(flat, pixels, 1)
+        else:
+            flat[pixels] = value
+        return img
+
+    y_min, y_max = y_min - y0, y_max - y0 + 1
+    x_min, x_max = x_min - x0, x_max - x0 + 1
+    size = height * length
+    diff = (numpy.bincount(numpy.concatenate((y_min * length + x_min,
+                                              y_max * length + x_max)),
+                           minlength=size) -
+            numpy.bincount(numpy.concatenate((y_min * length + x_max,
+                                              y_max * length + x_min)),
+                           minlength=size))
+    diff = diff.astype(numpy.int32).reshape((height, length))
+    cover = numpy.cumsum(numpy.cumsum(diff, axis=0), axis=1)[:-1, :-1]
+
+    region = img[y0:y0 + height - 1, x0:x0 + length - 1]
+    if count:
+        region[:] = cover
+    else:
+        region[cover > 0] = value
 
     return img
 
 
+def _convex_hull_chain(points):
+    # Monotone chain (Andrew) run at the same time on all the point sets :
+    # points is a (n, k, 2) array of points sorted by x then y, the chain of
+    # each set is kept in a fixed size stack.
+    n, k = points.shape[:2]
+    rows = numpy.arange(n)
+    stack = numpy.zeros_like(points)
+    size = numpy.zeros(n, dtype=int)
+    for i in range(k):
+        p = points[:, i]
+        for _ in range(i - 1):
+            a = stack[rows, numpy.maximum(size - 2, 0)]
+            b = stack[rows, numpy.maximum(size - 1, 0)]
+            cross = ((b[:, 0] - a[:, 0]) * (p[:, 1] - a[:, 1]) -
+                     (b[:, 1] - a[:, 1]) * (p[:, 0] - a[:, 0]))
+            pop = (size >= 2) & (cross <= 0)
+            if not pop.any():
+                break
+            size -= pop
+        stack[rows, size] = p
+        size += 1
+
+    return stack, size
+
+
+def get_voxels_silhouette(voxels_position, voxels_size, shape_image,
+                          projection):
+    """
+    Return for each voxel the convex polygon of its projection on the image,
+    the convex hull of its 8 projected corners.
+
+    The hulls of all the voxels are computed at the same time with a
+    monotone chain on their 8 corners, instead of one
+    scipy.spatial.ConvexHull by voxel.
+
+    Parameters
+    ----------
+    voxels_position : numpy.ndarray
+        Voxels center position [[x, y, z], ...]
+
+    voxels_size : float
+        Size of side geometry of voxel
+
+    shape_image: Tuple
+        size height and length of the image target projected
+
+    projection : function ((x, y, z)) -> (x, y)
+        Function of projection who take 1 argument (tuple of position (x, y, z))
+         and return this position 2D (x, y)
+
+    Returns
+    -------
+    out : numpy.ndarray
+        (n, 8, 2) integer array of the polygon vertices (x, y) of each voxel,
+        in counterclockwise order. The polygons with less than 8 vertices are
+        padded by repeating their last vertex.
+    """
+    height, length = shape_image
+
+    voxels_corners = get_voxels_corners(voxels_position, voxels_size)
+    pt = projection(voxels_corners)
+    pt = numpy.reshape(pt, (pt.shape[0] // 8, 8, 2))
+
+    pt[pt < 0] = 0
+    (pt[:, :, 0])[pt[:, :, 0] >= length] = length - 1
+    (pt[:, :, 1])[pt[:, :, 1] >= height] = height - 1
+    pt = numpy.floor(pt).astype(numpy.int32)
+
+    order = numpy.argsort(pt[:, :, 0] * height + pt[:, :, 1], axis=1)
+    pt = numpy.take_along_axis(pt, order[:, :, None], axis=1)
+
+    lower, nb_lower = _convex_hull_chain(pt)
+    upper, nb_upper = _convex_hull_chain(pt[:, ::-1])
+
+    # The last vertex of each chain is the first one of the other chain
+    nb_lower = nb_lower - 1
+    nb_vertices = nb_lower + nb_upper - 1
+    index = numpy.minimum(numpy.arange(8), nb_vertices[:, None] - 1)
+    from_upper = index >= nb_lower[:, None]
+    index_upper = numpy.where(from_upper, index - nb_lower[:, None], 0)
+
+    rows = numpy.arange(len(pt))[:, None]
+    return numpy.where(from_upper[:, :, None],
+                       upper[rows, index_upper],
+                       lower[rows, index])
+
+
 def project_voxels_position_on_image(voxels_position,
                                      voxels_size,
                                      shape_image,
@@ -669,23 +1361,64 @@ def project_voxels_position_on_image(voxels_position,
     """
 
     voxels_position = numpy.array(voxels_position)
-    height, length = shape_image
-    img = numpy.zeros((height, length), dtype=numpy.uint8)
+    img = numpy.zeros(shape_image, dtype=numpy.uint8)
+    if len(voxels_position) == 0:
+        return img
 
-    voxels_corners = get_voxels_corners(voxels_position, voxels_size)
-    pt = projection(voxels_corners)
-    pt = numpy.reshape(pt, (pt.shape[0] // 8, 8, 2))
-
-    pt[pt < 0] = 0
-    (pt[:, :, 0])[pt[:, :, 0] >= length] = length - 1
-    (pt[:, :, 1])[pt[:, :, 1] >= height] = height - 1
-    pt = numpy.floor(pt).astype(int)
-    for points in pt:
-        hull = scipy.spatial.ConvexHull(points)
-        cv2.fillConvexPoly(img, points[hull.vertices], 255)
+    # cv2.fillPoly fills the overlapping polygons with the even-odd rule,
+    # so the silhouettes are filled one by one
+    for points in get_voxels_silhouette(voxels_position, voxels_size,
+                                        shape_image, projection):
+        cv2.fillConvexPoly(img, points, 255)
 
     return img
 
+
+def _project_voxels_position_on_image_view(args):
+    voxels_position, voxels_size, image_view = args
+    return project_voxels_position_on_image(voxels_position,
+                                            voxels_size,
+                                            image_view.image.shape,
+                                            image_view.projection)
+
+
+def project_voxels_position_on_image_views(voxels_position,
+                                           voxels_size,
+                                           image_views,
+                                           executor=None):
+    """
+    Return the images of project_voxels_position_on_image for each image view.
+
+    Parameters
+    ----------
+    voxels_position : numpy.ndarray
+        Voxels center position [[x, y, z], ...]
+
+    voxels_size : float
+        Size of side geometry of voxel
+
+    image_views : [ImageView, ...]
+        Image views giving the shape of the images and the projections
+
+    executor : object, optional
+        Executor (concurrent.futures.ThreadPoolExecutor,
+        multiprocessing.pool.ThreadPool, ...) providing a map method, used to
+        project the views in parallel.
+
+    Returns
+    -------
+    out : [numpy.ndarray, ...]
+        Binary image of each image view
+    """
+    voxels_position = numpy.array(voxels_position)
+    args = [(voxels_position, voxels_size, image_view)
+            for image_view in image_views]
+
+    if executor is None:
+        return list(map(_project_voxels_position_on_image_view, args))
+
+    return list(executor.map(_project_voxels_position_on_image_view, args))
+
 # ==============================================================================
 
 
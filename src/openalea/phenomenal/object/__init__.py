@@ -18,8 +18,11 @@ Data Structure
    :toctree: generated/
 
    Image3D
+   ChunkedImage3D
    ImageView
    VoxelGrid
+   VoxelOctree
+   VoxelLinearOctree
    VoxelSegment
    VoxelOrgan
    VoxelSkeleton
@@ -29,8 +32,9 @@ Data Structure
 from __future__ import division, print_function, absolute_import
 
 from .imageView import ImageView
-from .image3D import Image3D
+from .image3D import Image3D, ChunkedImage3D
 from .voxelOctree import VoxelOctree
+from .voxelLinearOctree import VoxelLinearOctree
 from .voxelGrid import VoxelGrid
 from .voxelSegment import VoxelSegment
 from .voxelSkeleton import VoxelSkeleton
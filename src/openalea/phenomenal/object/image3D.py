@@ -97,6 +97,52 @@ class Image3D(numpy.ndarray):
                        voxels_size=voxels_size,
                        world_coordinate=world_coordinate)
 
+    def write_to_chunked_npz(self, filename, chunk_shape=(64, 64, 64)):
+        """ Write the image in a chunked npz file : each chunk is compressed
+        in its own archive member and empty chunks (only zeros) are not
+        written. An index of the occupied chunks is stored with the image
+        shape, so that ChunkedImage3D can read lazily a region of interest.
+
+        Parameters
+        ----------
+        filename : str
+            Path of the npz file
+
+        chunk_shape : (int, int, int), optional
+            Shape of the chunks
+        """
+        if (os.path.dirname(filename) and not os.path.exists(
+                os.path.dirname(filename))):
+            os.makedirs(os.path.dirname(filename))
+
+        chunk_shape = tuple(int(v) for v in chunk_shape)
+        grid_shape = tuple(-(-s // c) for s, c in zip(self.shape, chunk_shape))
+
+        chunks = dict()
+        index = list()
+        for chunk in numpy.ndindex(grid_shape):
+            start = [i * c for i, c in zip(chunk, chunk_shape)]
+            data = numpy.asarray(self[start[0]:start[0] + chunk_shape[0],
+                                      start[1]:start[1] + chunk_shape[1],
+                                      start[2]:start[2] + chunk_shape[2]])
+            if data.any():
+                chunks[_chunk_name(chunk)] = data
+                index.append(chunk)
+
+        numpy.savez_compressed(
+            filename,
+            shape=numpy.array(self.shape),
+            dtype=numpy.array(self.dtype.str),
+            chunk_shape=numpy.array(chunk_shape),
+            chunks=numpy.array(index, dtype=int).reshape((-1, 3)),
+            voxels_size=self.voxels_size,
+            world_coordinate=self.world_coordinate,
+            **chunks)
+
+    @staticmethod
+    def open_chunked_npz(filename):
+        return ChunkedImage3D(filename)
+
     def write_to_stack_image(self, folder_name):
         if not os.path.exists(folder_name):
             os.makedirs(folder_name)
@@ -174,4 +220,114 @@ class Image3D(numpy.ndarray):
                             voxels_size=image_3d.voxels_size,
                             world_coordinate=image_3d.world_coordinate,
                             dtype=image_3d.dtype,
-                            order=order)
\ No newline at end of file
+                            order=order)
+
+# ==============================================================================
+
+
+def _chunk_name(chunk):
+    return "chunk_{}_{}_{}".format(*chunk)
+
+
+class ChunkedImage3D(object):
+    """ Lazy reader of an Image3D written by Image3D.write_to_chunked_npz.
+
+    Only the index of the occupied chunks is loaded at opening, the chunks
+    are decompressed on demand when a region of interest is read.
+    """
+
+    def __init__(self, filename):
+        self._npz = numpy.load(filename, allow_pickle=False)
+
+        self.shape = tuple(int(v) for v in self._npz['shape'])
+        self.dtype = numpy.dtype(str(self._npz['dtype']))
+        self.chunk_shape = tuple(int(v) for v in self._npz['chunk_shape'])
+        self.chunks = [tuple(int(v) for v in chunk)
+                       for chunk in self._npz['chunks']]
+        self._occupied = set(self.chunks)
+        self.voxels_size = self._npz['voxels_size'].item()
+        self.world_coordinate = tuple(self._npz['world_coordinate'])
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        self._npz.close()
+
+    def read_chunk(self, chunk):
+        """ Return the data of the chunk of grid index chunk (i, j, k), zeros
+        if the chunk is empty.
+        """
+        if tuple(chunk) in self._occupied:
+            return self._npz[_chunk_name(tuple(chunk))]
+
+        shape = tuple(min(c, s - i * c) for i, c, s in
+                      zip(chunk, self.chunk_shape, self.shape))
+
+        return numpy.zeros(shape, dtype=self.dtype)
+
+    def iter_chunks(self):
+        """ Iterate over the occupied chunks only
+
+        Returns
+        -------
+        out : generator of ((int, int, int), numpy.ndarray)
+            Voxel index offset of the chunk in the image and its data
+        """
+        for chunk in self.chunks:
+            offset = tuple(i * c for i, c in zip(chunk, self.chunk_shape))
+            yield offset, self._npz[_chunk_name(chunk)]
+
+    def read_roi(self, start, stop):
+        """ Read the region of interest [start, stop[ of the image,
+        decompressing only the occupied chunks intersecting it.
+
+        Parameters
+        ----------
+        start : (int, int, int)
+            Voxel index of the first corner of the region (included)
+
+        stop : (int, int, int)
+            Voxel index of the last corner of the region (excluded)
+
+        Returns
+        -------
+        out : Image3D
+        """
+        start = [max(int(v), 0) for v in start]
+        stop = [min(int(v), s) for v, s in zip(stop, self.shape)]
+        shape = [max(b - a, 0) for a, b in zip(start, stop)]
+
+        roi = numpy.zeros(shape, dtype=self.dtype)
+
+        for chunk in self.chunks:
+            chunk_start = [i * c for i, c in zip(chunk, self.chunk_shape)]
+            chunk_stop = [min(a + c, s) for a, c, s in
+                          zip(chunk_start, self.chunk_shape, self.shape)]
+
+            low = [max(a, b) for a, b in zip(start, chunk_start)]
+            high = [min(a, b) for a, b in zip(stop, chunk_stop)]
+            if any(l >= h for l, h in zip(low, high)):
+                continue
+
+            data = self._npz[_chunk_name(chunk)]
+            roi[low[0] - start[0]:high[0] - start[0],
+                low[1] - start[1]:high[1] - start[1],
+                low[2] - start[2]:high[2] - start[2]] = data[
+                low[0] - chunk_start[0]:high[0] - chunk_start[0],
+                low[1] - chunk_start[1]:high[1] - chunk_start[1],
+                low[2] - chunk_start[2]:high[2] - chunk_start[2]]
+
+        world_coordinate = tuple(w + i * self.voxels_size for w, i in
+                                 zip(self.world_coordinate, start))
+
+        return Image3D(roi,
+                       voxels_size=self.voxels_size,
+                       world_coordinate=world_coordinate,
+                       dtype=self.dtype)
+
+    def to_image_3d(self):
+        return self.read_roi((0, 0, 0), self.shape)
@@ -14,8 +14,12 @@ from __future__ import division, print_function, absolute_import
 
 class ImageView(object):
 
-    def __init__(self, image, projection, inclusive=False, image_ref=None):
+    def __init__(self, image, projection, inclusive=False, image_ref=None,
+                 frame=None):
         self.image = image
         self.projection = projection
         self.inclusive = inclusive
         self.image_ref = image_ref
+        # (x_min, y_min, x_max, y_max) limits of the camera image, in the
+        # coordinates of image, when image is only a region of it
+        self.frame = frame
@@ -15,10 +15,22 @@ import json
 import numpy
 import csv
 
-from .image3D import Image3D
+from .image3D import Image3D, ChunkedImage3D
 # ==============================================================================
 
 
+def _indices_dtype(voxels_indices):
+    """ Return the smallest signed integer type able to store the indices """
+    if numpy.size(voxels_indices) == 0:
+        return numpy.int16
+
+    if (voxels_indices.min() >= numpy.iinfo(numpy.int16).min and
+            voxels_indices.max() <= numpy.iinfo(numpy.int16).max):
+        return numpy.int16
+
+    return numpy.int32
+
+
 class VoxelGrid(object):
 
     def __init__(self, voxels_position, voxels_size):
@@ -26,21 +38,112 @@ class VoxelGrid(object):
         self._voxels_position = voxels_position
         self._voxels_size = voxels_size
 
+        # Compact backing store : integer grid indices of the voxels, the
+        # position being world_coordinate + voxels_indices * voxels_size
+        self._voxels_indices = None
+        self._world_coordinate = None
+
+    @staticmethod
+    def from_indices(voxels_indices, voxels_size,
+                     world_coordinate=(0.0, 0.0, 0.0)):
+        """ Create a VoxelGrid stored as integer grid indices (compact
+        representation). The float positions are only computed when
+        voxels_position is accessed.
+
+        Parameters
+        ----------
+        voxels_indices : numpy.ndarray
+            [[i, j, k], ...] integer grid indices of the voxels
+
+        voxels_size : float
+            Diameter size of the voxels
+
+        world_coordinate : (x, y, z), optional
+            Position of the voxel of indices (0, 0, 0)
+
+        Returns
+        -------
+        out : VoxelGrid
+        """
+        voxels_indices = numpy.asarray(voxels_indices).reshape((-1, 3))
+
+        vg = VoxelGrid(None, voxels_size)
+        vg._voxels_indices = voxels_indices.astype(
+            _indices_dtype(voxels_indices))
+        vg._world_coordinate = tuple(float(v) for v in world_coordinate)
+
+        return vg
+
+    def to_compact(self):
+        """ Return a VoxelGrid of the same voxels stored as integer grid
+        indices, with the bounding box minimum as world coordinate.
+        """
+        if self.is_compact():
+            return self
+
+        voxels_position = numpy.asarray(self._voxels_position,
+                                        dtype=float).reshape((-1, 3))
+
+        if len(voxels_position) == 0:
+            return VoxelGrid.from_indices(voxels_position, self.voxels_size)
+
+        world_coordinate = voxels_position.min(axis=0)
+        voxels_indices = numpy.round(
+            (voxels_position - world_coordinate) / self.voxels_size)
+
+        return VoxelGrid.from_indices(voxels_indices.astype(numpy.int64),
+                                      self.voxels_size,
+                                      world_coordinate=world_coordinate)
+
+    def is_compact(self):
+        return self._voxels_indices is not None
+
     # ==========================================================================
     # GETTER & SETTER
     # ==========================================================================
 
     @property
     def voxels_position(self):
+        """ Center position of the voxels. On a compact grid, the positions
+        are decoded from the indices in a new read-only array, they are
+        modified by assigning a new array (the grid is then no more
+        compact).
+        """
+        if self._voxels_indices is not None:
+            voxels_position = (numpy.array(self._world_coordinate) +
+                               self._voxels_indices * float(self._voxels_size))
+            voxels_position.flags.writeable = False
+            return voxels_position
+
         return self._voxels_position
 
     @voxels_position.setter
     def voxels_position(self, voxels_position):
         self._voxels_position = voxels_position
+        self._voxels_indices = None
+        self._world_coordinate = None
 
     @voxels_position.deleter
     def voxels_position(self):
         del self._voxels_position
+        self._voxels_indices = None
+        self._world_coordinate = None
+
+    @property
+    def voxels_indices(self):
+        """ Integer grid indices of the voxels relative to world_coordinate
+        """
+        if self._voxels_indices is None:
+            return self.to_compact()._voxels_indices
+        return self._voxels_indices
+
+    @property
+    def world_coordinate(self):
+        """ Position of the voxel of grid indices (0, 0, 0)
+        """
+        if self._world_coordinate is None:
+            return self.to_compact()._world_coordinate
+        return self._world_coordinate
 
     @property
     def voxels_size(self):
@@ -48,6 +151,10 @@ class VoxelGrid(object):
 
     @voxels_size.setter
     def voxels_size(self, voxels_size):
+        # The positions of a compact grid depend on the size, they are
+        # converted back to floats so that the voxels do not move
+        if self._voxels_indices is not None:
+            self.voxels_position = self.voxels_position
         self._voxels_size = voxels_size
 
     @voxels_size.deleter
@@ -60,36 +167,32 @@ class VoxelGrid(object):
 
     def bounding_box(self):
 
-        if len(self._voxels_position) == 0:
+        if len(self) == 0:
             raise ValueError("Empty list")
 
-        x_min = float("inf")
-        y_min = float("inf")
-        z_min = float("inf")
-
-        x_max = - float("inf")
-        y_max = - float("inf")
-        z_max = - float("inf")
-
-        for x, y, z in self._voxels_position:
-            x_min = min(x_min, x)
-            y_min = min(y_min, y)
-            z_min = min(z_min, z)
+        if self._voxels_indices is not None:
+            world_coordinate = numpy.array(self._world_coordinate)
+            bound_min = (world_coordinate +
+                         self._voxels_indices.min(axis=0) * self._voxels_size)
+            bound_max = (world_coordinate +
+                         self._voxels_indices.max(axis=0) * self._voxels_size)
+        else:
+            voxels_position = numpy.asarray(self._voxels_position)
+            bound_min = voxels_position.min(axis=0)
+            bound_max = voxels_position.max(axis=0)
 
-            x_max = max(x_max, x)
-            y_max = max(y_max, y)
-            z_max = max(z_max, z)
-
-        return (x_min, y_min, z_min), (x_max, y_max, z_max)
+        return tuple(bound_min), tuple(bound_max)
 
     def volume(self):
         """
         Compute the volume of the voxel point cloud
         """
 
-        return len(self._voxels_position) * self._voxels_size ** 3
+        return len(self) * self._voxels_size ** 3
 
     def __len__(self):
+        if self._voxels_indices is not None:
+            return len(self._voxels_indices)
         return len(self._voxels_position)
 
     # ==========================================================================
@@ -111,14 +214,18 @@ class VoxelGrid(object):
             len_z = int((z_max - z_min) / self.voxels_size + 1)
 
             image_3d = Image3D.zeros((len_x, len_y, len_z),
-                                     dtype=numpy.bool,
+                                     dtype=numpy.bool_,
                                      voxels_size=self.voxels_size,
                                      world_coordinate=(x_min, y_min, z_min))
 
-            bound_min = numpy.array((x_min, y_min, z_min))
-            vs_pos = numpy.array(self.voxels_position)
+            if self._voxels_indices is not None:
+                r = self._voxels_indices - self._voxels_indices.min(axis=0)
+            else:
+                bound_min = numpy.array((x_min, y_min, z_min))
+                vs_pos = numpy.array(self.voxels_position)
+
+                r = ((vs_pos - bound_min) / self.voxels_size).astype(int)
 
-            r = ((vs_pos - bound_min) / self.voxels_size).astype(int)
             image_3d[r[:, 0], r[:, 1], r[:, 2]] = 1
 
             return image_3d
@@ -127,7 +234,8 @@ class VoxelGrid(object):
     @staticmethod
     def from_image_3d(image_3d, voxels_value=1,
                       voxels_size=None,
-                      world_coordinate=None):
+                      world_coordinate=None,
+                      compact=False):
 
         xx, yy, zz = numpy.where(image_3d >= voxels_value)
 
@@ -137,6 +245,11 @@ class VoxelGrid(object):
         if world_coordinate is None:
             world_coordinate = image_3d.world_coordinate
 
+        if compact:
+            return VoxelGrid.from_indices(numpy.column_stack((xx, yy, zz)),
+                                          voxels_size,
+                                          world_coordinate=world_coordinate)
+
         xxx = world_coordinate[0] + xx * voxels_size
         yyy = world_coordinate[1] + yy * voxels_size
 
@@ -181,9 +294,35 @@ class VoxelGrid(object):
         image_3d.write_to_npz(filename)
 
     @staticmethod
-    def read_from_npz(filename):
+    def read_from_npz(filename, compact=False):
         image_3d = Image3D.read_from_npz(filename)
-        return VoxelGrid.from_image_3d(image_3d)
+        return VoxelGrid.from_image_3d(image_3d, compact=compact)
+
+    def write_to_chunked_npz(self, filename, chunk_shape=(64, 64, 64)):
+        image_3d = self.to_image_3d()
+        image_3d.write_to_chunked_npz(filename, chunk_shape=chunk_shape)
+
+    @staticmethod
+    def read_from_chunked_npz(filename, compact=False):
+        """ Read a VoxelGrid from a chunked npz file, decompressing only the
+        occupied chunks one at a time.
+        """
+        with ChunkedImage3D(filename) as chunked_image_3d:
+            voxels_indices = [numpy.zeros((0, 3), dtype=int)]
+            for offset, data in chunked_image_3d.iter_chunks():
+                voxels_indices.append(
+                    numpy.column_stack(numpy.where(data >= 1)) + offset)
+
+            voxels_indices = numpy.concatenate(voxels_indices, axis=0)
+            voxels_size = chunked_image_3d.voxels_size
+            world_coordinate = chunked_image_3d.world_coordinate
+
+        vg = VoxelGrid.from_indices(voxels_indices, voxels_size,
+                                    world_coordinate=world_coordinate)
+        if compact:
+            return vg
+
+        return VoxelGrid(vg.voxels_position, voxels_size)
 
     def write_to_json(self, filename):
 
@@ -0,0 +1,454 @@
+# -*- python -*-
+#
+#       Copyright INRIA - CIRAD - INRA
+#
+#       Distributed under the Cecill-C License.
+#       See accompanying file LICENSE.txt or copy at
+#           http://www.cecill.info/licences/Licence_CeCILL-C_V1-en.html
+#
+# ==============================================================================
+from __future__ import division, print_function, absolute_import
+
+import json
+import os
+import numpy
+
+from .voxelGrid import VoxelGrid
+from .voxelOctree import VoxelNode, VoxelOctree
+# ==============================================================================
+
+# Deepest level of the nodes : the 3 * 20 bits of the Morton codes and the
+# offsets of the levels fit in an unsigned 64 bits integer
+MAX_LEVEL = 20
+
+_LEVEL_OFFSET = numpy.array([(8 ** level - 1) // 7
+                             for level in range(MAX_LEVEL + 2)],
+                            dtype=numpy.uint64)
+
+# Bits (x, y, z) of the sons in the order of VoxelNode.creates_sons
+_SONS_BITS = numpy.array([(0, 0, 0), (1, 0, 0), (0, 1, 0), (0, 0, 1),
+                          (1, 1, 0), (1, 0, 1), (0, 1, 1), (1, 1, 1)])
+
+# Offsets of the 26 neighbors in the order of
+# VoxelNode.get_neighbors_positions
+_NEIGHBORS_OFFSETS = numpy.array(
+    [(dx, dy, dz)
+     for dz in (1, 0, -1)
+     for dy in (0, -1, 1)
+     for dx in (0, -1, 1)
+     if (dx, dy, dz) != (0, 0, 0)])
+
+
+def _part1by2(v):
+    # Spread the 21 lower bits of v, two zeros between each bit
+    v = v.astype(numpy.uint64) & numpy.uint64(0x1fffff)
+    v = (v | (v << numpy.uint64(32))) & numpy.uint64(0x1f00000000ffff)
+    v = (v | (v << numpy.uint64(16))) & numpy.uint64(0x1f0000ff0000ff)
+    v = (v | (v << numpy.uint64(8))) & numpy.uint64(0x100f00f00f00f00f)
+    v = (v | (v << numpy.uint64(4))) & numpy.uint64(0x10c30c30c30c30c3)
+    v = (v | (v << numpy.uint64(2))) & numpy.uint64(0x1249249249249249)
+    return v
+
+
+def _compact1by2(v):
+    # Inverse of _part1by2
+    v = v & numpy.uint64(0x1249249249249249)
+    v = (v | (v >> numpy.uint64(2))) & numpy.uint64(0x10c30c30c30c30c3)
+    v = (v | (v >> numpy.uint64(4))) & numpy.uint64(0x100f00f00f00f00f)
+    v = (v | (v >> numpy.uint64(8))) & numpy.uint64(0x1f0000ff0000ff)
+    v = (v | (v >> numpy.uint64(16))) & numpy.uint64(0x1f00000000ffff)
+    v = (v | (v >> numpy.uint64(32))) & numpy.uint64(0x1fffff)
+    return v.astype(numpy.int64)
+
+
+def morton_encode(indices):
+    """ Return the Morton codes of integer grid indices [[i, j, k], ...],
+    the bits of i, j and k being interleaved (i is the lowest bit).
+    """
+    indices = numpy.asarray(indices).reshape((-1, 3))
+    return (_part1by2(indices[:, 0]) |
+            (_part1by2(indices[:, 1]) << numpy.uint64(1)) |
+            (_part1by2(indices[:, 2]) << numpy.uint64(2)))
+
+
+def morton_decode(codes):
+    """ Return the integer grid indices [[i, j, k], ...] of Morton codes """
+    codes = numpy.asarray(codes, dtype=numpy.uint64)
+    return numpy.column_stack((_compact1by2(codes),
+                               _compact1by2(codes >> numpy.uint64(1)),
+                               _compact1by2(codes >> numpy.uint64(2))))
+
+
+class VoxelLinearOctree(object):
+    """ Octree stored as flat arrays instead of one VoxelNode by node.
+
+    A node of level l is a cube of size root_size / 2**l, identified by the
+    Morton code of its integer position (i, j, k) in the grid of this level.
+    The nodes are sorted by level then by code, so that a node is found
+    with a binary search on the key level_offset[level] + code, and the 8
+    sons of a node are contiguous.
+    """
+
+    def __init__(self, position, size, codes=None, levels=None, data=None):
+
+        self.position = tuple(float(v) for v in position)
+        self.size = float(size)
+
+        if codes is None:
+            codes, levels, data = [0], [0], [True]
+
+        codes = numpy.asarray(codes, dtype=numpy.uint64)
+        levels = numpy.asarray(levels, dtype=numpy.uint8)
+        data = numpy.asarray(data, dtype=bool)
+
+        keys = _LEVEL_OFFSET[levels] + codes
+        order = numpy.argsort(keys, kind='stable')
+
+        self.codes = codes[order]
+        self.levels = levels[order]
+        self.data = data[order]
+        self._keys = keys[order]
+        self._is_leaf = None
+
+    @classmethod
+    def from_position(cls, position, size, data):
+        return cls(position, size, codes=[0], levels=[0], data=[data])
+
+    def __len__(self):
+        return len(self.codes)
+
+    # ==========================================================================
+    # NODES
+    # ==========================================================================
+
+    @property
+    def is_leaf(self):
+        """ Boolean array, True for the nodes without sons """
+        if self._is_leaf is None:
+            self._is_leaf = numpy.ones(len(self), dtype=bool)
+            sons = self.levels > 0
+            father_keys = (_LEVEL_OFFSET[self.levels[sons] - 1] +
+                           (self.codes[sons] >> numpy.uint64(3)))
+            self._is_leaf[self.find_keys(father_keys)] = False
+
+        return self._is_leaf
+
+    def find_keys(self, keys):
+        """ Return the indexes of the nodes of keys, -1 if there is no such
+        node.
+        """
+        keys = numpy.asarray(keys, dtype=numpy.uint64)
+        index = numpy.searchsorted(self._keys, keys)
+        index[index >= len(self)] = len(self) - 1
+        index[self._keys[index] != keys] = -1
+        return index
+
+    def find_nodes(self, indices, levels):
+        """ Return the indexes of the nodes of grid indices [[i, j, k], ...]
+        at levels, -1 if there is no such node.
+        """
+        levels = numpy.asarray(levels, dtype=numpy.uint8)
+        return self.find_keys(_LEVEL_OFFSET[levels] + morton_encode(indices))
+
+    def find_nodes_position(self, positions, sizes):
+        """ Return the indexes of the nodes of center positions [[x, y, z],
+        ...] and sizes, -1 if there is no such node.
+        """
+        positions = numpy.asarray(positions, dtype=float).reshape((-1, 3))
+        sizes = numpy.broadcast_to(numpy.asarray(sizes, dtype=float),
+                                   (len(positions),))
+
+        levels = numpy.round(numpy.log2(self.size / sizes)).astype(int)
+        origin = numpy.array(self.position) - self.size / 2.0
+        indices = numpy.floor((positions - origin) / sizes[:, None])
+
+        width = (2 ** numpy.clip(levels, 0, MAX_LEVEL))[:, None]
+        inside = (numpy.all((indices >= 0) & (indices < width), axis=1) &
+                  (levels >= 0) & (levels <= MAX_LEVEL))
+        index = numpy.full(len(positions), -1)
+        index[inside] = self.find_nodes(indices[inside].astype(numpy.int64),
+                                        levels[inside])
+        return index
+
+    def nodes_size(self, index=None):
+        """ Return the size of the nodes of index (all the nodes if None) """
+        levels = self.levels if index is None else self.levels[index]
+        return self.size / (2.0 ** levels.astype(float))
+
+    def nodes_indices(self, index=None):
+        """ Return the integer grid indices [[i, j, k], ...] of the nodes of
+        index in the grid of their level.
+        """
+        codes = self.codes if index is None else self.codes[index]
+        return morton_decode(codes)
+
+    def nodes_position(self, index=None):
+        """ Return the center position of the nodes of index """
+        size = self.nodes_size(index)[:, None]
+        origin = numpy.array(self.position) - self.size / 2.0
+        return origin + (self.nodes_indices(index) + 0.5) * size
+
+    def creates_sons(self, index):
+        """ Create the 8 sons of each leaf node of index, with the data of
+        their father, and return the indexes of the sons.
+        """
+        index = numpy.asarray(index, dtype=int).reshape(-1)
+        index = index[self.is_leaf[index]]
+
+        if len(index) and self.levels[index].max() >= MAX_LEVEL:
+            raise ValueError("Octree deeper than {}".format(MAX_LEVEL))
+
+        codes = ((self.codes[index] << numpy.uint64(3))[:, None] +
+                 numpy.arange(8, dtype=numpy.uint64)).reshape(-1)
+        levels = numpy.repeat(self.levels[index] + 1, 8)
+        data = numpy.repeat(self.data[index], 8)
+
+        self.__init__(self.position, self.size,
+                      codes=numpy.concatenate((self.codes, codes)),
+                      levels=numpy.concatenate((self.levels, levels)),
+                      data=numpy.concatenate((self.data, data)))
+
+        return self.find_keys(_LEVEL_OFFSET[levels] + codes)
+
+    def get_leafs(self):
+        """ Return the indexes of the leaf nodes """
+        return numpy.flatnonzero(self.is_leaf)
+
+    def get_leafs_with_data_equal_to(self, data):
+        return numpy.flatnonzero(self.is_leaf & (self.data == data))
+
+    def get_neighbors(self, index):
+        """ Return for each node of index the indexes of its 26 neighbors of
+        same size (-1 if there is no such node), in the order of
+        VoxelNode.get_neighbors_positions.
+        """
+        index = numpy.asarray(index, dtype=int).reshape(-1)
+        levels = self.levels[index]
+        indices = (self.nodes_indices(index)[:, None, :] +
+                   _NEIGHBORS_OFFSETS[None, :, :])
+
+        width = (2 ** levels.astype(numpy.int64))[:, None]
+        inside = numpy.all((indices >= 0) & (indices < width[:, :, None]),
+                           axis=2)
+        indices[~inside] = 0
+
+        neighbors = self.find_nodes(indices.reshape((-1, 3)),
+                                    numpy.repeat(levels, 26))
+        neighbors = neighbors.reshape((-1, 26))
+        neighbors[~inside] = -1
+
+        return neighbors
+
+    def get_neighbors_leaf(self, index):
+        """ Return for each node of index the indexes of the nodes covering
+        its 26 neighbor positions (-1 if the position is out of the octree),
+        in the order of VoxelNode.get_neighbors_positions.
+
+        The node covering a neighbor position is the node of same size at
+        this position if it exists, else the leaf of lower level containing
+        it. All the queries are solved at the same time, one level up at
+        each step.
+        """
+        index = numpy.asarray(index, dtype=int).reshape(-1)
+        levels = numpy.repeat(self.levels[index].astype(int), 26)
+        indices = (self.nodes_indices(index)[:, None, :] +
+                   _NEIGHBORS_OFFSETS[None, :, :]).reshape((-1, 3))
+
+        width = (2 ** levels)[:, None]
+        inside = numpy.all((indices >= 0) & (indices < width), axis=1)
+
+        neighbors = numpy.full(len(levels), -1)
+        query = numpy.flatnonzero(inside)
+        codes = morton_encode(indices[query])
+        levels = levels[query]
+        while len(query) > 0:
+            found = self.find_keys(_LEVEL_OFFSET[levels] + codes)
+            neighbors[query] = found
+
+            missing = (found < 0) & (levels > 0)
+            query, codes = query[missing], codes[missing] >> numpy.uint64(3)
+            levels = levels[missing] - 1
+
+        return neighbors.reshape((-1, 26))
+
+    def is_surrender(self, index):
+        """ Return for each node of index True if its 26 neighbor positions
+        are covered by nodes with data True (see get_neighbors_leaf). The
+        root is never surrounded.
+        """
+        index = numpy.asarray(index, dtype=int).reshape(-1)
+        neighbors = self.get_neighbors_leaf(index)
+
+        surrounded = numpy.all(neighbors >= 0, axis=1)
+        surrounded &= numpy.all(self.data[neighbors], axis=1)
+        surrounded &= self.levels[index] > 0
+
+        return surrounded
+
+    # ==========================================================================
+    # VOXELS
+    # ==========================================================================
+
+    def _nodes_with_size(self, voxels_size):
+        sizes = self.nodes_size()
+        return numpy.flatnonzero(self.data & (sizes == voxels_size))
+
+    def get_voxel_point_cloud(self, voxels_size):
+        """ Return the VoxelGrid of the nodes of size voxels_size with data
+        True.
+        """
+        index = self._nodes_with_size(voxels_size)
+        return VoxelGrid(self.nodes_position(index), voxels_size)
+
+    def get_voxels_position(self, voxels_size):
+        """ Return the position of the voxels of size voxels_size with data
+        True : the nodes of this size, and the sub-voxels of this size of the
+        bigger leaf nodes.
+        """
+        sizes = self.nodes_size()
+        positions = [self.nodes_position(self._nodes_with_size(voxels_size))]
+
+        bigger = numpy.flatnonzero(self.data & self.is_leaf &
+                                   (sizes > voxels_size))
+        for level in numpy.unique(self.levels[bigger]):
+            index = bigger[self.levels[bigger] == level]
+            depth = int(round(numpy.log2(sizes[index[0]] / voxels_size)))
+
+            # Morton codes of the sub-voxels are contiguous
+            sub_codes = numpy.arange(8 ** depth, dtype=numpy.uint64)
+            codes = ((self.codes[index] << numpy.uint64(3 * depth))[:, None] +
+                     sub_codes).reshape(-1)
+
+            origin = numpy.array(self.position) - self.size / 2.0
+            positions.append(
+                origin + (morton_decode(codes) + 0.5) * voxels_size)
+
+        return numpy.concatenate(positions, axis=0)
+
+    # ==========================================================================
+    # VOXEL OCTREE ADAPTOR
+    # ==========================================================================
+
+    @classmethod
+    def from_voxel_octree(cls, voxel_octree):
+        """ Return the VoxelLinearOctree of the nodes of a VoxelOctree """
+        root = voxel_octree.root
+        nodes = root.get_nodes(func_get=lambda n: (n.position, n.size, n.data))
+
+        positions = numpy.array([position for position, _, _ in nodes],
+                                dtype=float)
+        sizes = numpy.array([size for _, size, _ in nodes], dtype=float)
+        data = numpy.array([data for _, _, data in nodes], dtype=bool)
+
+        levels = numpy.round(numpy.log2(root.size / sizes)).astype(int)
+        origin = numpy.array(root.position) - root.size / 2.0
+        indices = numpy.floor((positions - origin) / sizes[:, None])
+
+        return cls(root.position, root.size,
+                   codes=morton_encode(indices.astype(numpy.int64)),
+                   levels=levels,
+                   data=data)
+
+    def to_voxel_octree(self):
+        """ Return a VoxelOctree (one VoxelNode by node) of the same nodes """
+        positions = self.nodes_position()
+        sizes = self.nodes_size()
+        data = self.data.tolist()
+
+        # Index of each son in the sons list of its father
+        bits = self.codes & numpy.uint64(7)
+        son_index = numpy.zeros(8, dtype=int)
+        son_index[_SONS_BITS[:, 0] + 2 * _SONS_BITS[:, 1] +
+                  4 * _SONS_BITS[:, 2]] = numpy.arange(8)
+        son_index = son_index[bits.astype(int)]
+
+        fathers = numpy.full(len(self), -1)
+        sons = self.levels > 0
+        fathers[sons] = self.find_keys(
+            _LEVEL_OFFSET[self.levels[sons] - 1] +
+            (self.codes[sons] >> numpy.uint64(3)))
+
+        # The fathers are before their sons
+        nodes = list()
+        for i in range(len(self)):
+            father = nodes[fathers[i]] if fathers[i] >= 0 else None
+            node = VoxelNode(tuple(positions[i]), sizes[i], data[i], father)
+            if father is not None:
+                father.sons[son_index[i]] = node
+                father.is_leaf = False
+            nodes.append(node)
+
+        return VoxelOctree.from_voxel_node(nodes[0])
+
+    # ==========================================================================
+    # READ / WRITES
+    # ==========================================================================
+
+    def write(self, filename):
+        ext = filename.split(".")[-1]
+
+        if ext == "npz":
+            return self.write_to_npz(filename)
+        if ext == "json":
+            return self.write_to_json(filename)
+
+        raise ValueError("No extension")
+
+    @staticmethod
+    def read(filename):
+        ext = filename.split(".")[-1]
+
+        if ext == "npz":
+            return VoxelLinearOctree.read_from_npz(filename)
+        if ext == "json":
+            return VoxelLinearOctree.read_from_json(filename)
+
+        raise ValueError("No extension")
+
+    def write_to_npz(self, filename):
+
+        if (os.path.dirname(filename) and not os.path.exists(
+                os.path.dirname(filename))):
+            os.makedirs(os.path.dirname(filename))
+
+        numpy.savez_compressed(filename,
+                               position=self.position,
+                               size=self.size,
+                               codes=self.codes,
+                               levels=self.levels,
+                               data=self.data)
+
+    @staticmethod
+    def read_from_npz(filename):
+        npz = numpy.load(filename, allow_pickle=False)
+
+        return VoxelLinearOctree(tuple(npz['position']),
+                                 float(npz['size']),
+                                 codes=npz['codes'],
+                                 levels=npz['levels'],
+                                 data=npz['data'])
+
+    def write_to_json(self, filename):
+
+        if (os.path.dirname(filename) and not os.path.exists(
+                os.path.dirname(filename))):
+            os.makedirs(os.path.dirname(filename))
+
+        with open(filename, 'w') as f:
+            json.dump({"position": self.position,
+                       "size": self.size,
+                       "codes": self.codes.tolist(),
+                       "levels": self.levels.tolist(),
+                       "data": self.data.tolist()}, f)
+
+    @staticmethod
+    def read_from_json(filename):
+
+        with open(filename, 'r') as f:
+            data = json.load(f)
+
+        return VoxelLinearOctree(data["position"],
+                                 data["size"],
+                                 codes=data["codes"],
+                                 levels=data["levels"],
+                                 data=data["data"])
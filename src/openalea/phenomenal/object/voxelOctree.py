@@ -179,7 +179,7 @@ class VoxelNode(object):
                 return self
             else:
                 for son in self.sons:
-                    leaf = son.find_leaf_with_position(position)
+                    leaf = son.get_with_position(position)
                     if leaf is not None:
                         return leaf
         else:
@@ -198,49 +198,47 @@ class VoxelNode(object):
 
             return father
 
-    def get_neighbors_leaf(self):
-
-        neighbors_positions = self.get_neighbors_positions()
+    def _linear_octree(self):
+        # Linear octree of the whole tree of the node and index of the node
+        # in it, the neighbors queries are solved on it
+        from .voxelLinearOctree import VoxelLinearOctree
 
         root = self.get_root()
+        linear = VoxelLinearOctree.from_voxel_octree(
+            VoxelOctree.from_voxel_node(root))
+        index = linear.find_nodes_position([self.position], [self.size])
+
+        return root, linear, index
 
-        neighbors_leaf = list()
-        for position in neighbors_positions:
+    def get_neighbors_leaf(self):
+        """ Return the nodes covering the 26 neighbor positions of the node
+        (see VoxelLinearOctree.get_neighbors_leaf), in the order of
+        get_neighbors_positions. The positions out of the octree are
+        skipped.
 
-            leaf = root.find_leaf_with_position(position)
+        The whole tree is converted for each call, use
+        VoxelLinearOctree.get_neighbors_leaf to query many nodes.
+        """
+        root, linear, index = self._linear_octree()
+        neighbors = linear.get_neighbors_leaf(index)[0]
 
-            if leaf is not None:
-                neighbors_leaf.append(leaf)
+        nodes = root.get_nodes()
+        nodes_index = linear.find_nodes_position(
+            [node.position for node in nodes], [node.size for node in nodes])
+        nodes = dict(zip(nodes_index.tolist(), nodes))
 
-        return neighbors_leaf
+        return [nodes[i] for i in neighbors.tolist() if i >= 0]
 
     def is_surrender(self):
+        """ Return True if the 26 neighbor positions of the node are covered
+        by nodes with data True (see VoxelLinearOctree.is_surrender).
 
-        neighbors_positions = self.get_neighbors_positions()
+        The whole tree is converted for each call, use
+        VoxelLinearOctree.is_surrender to query many nodes.
+        """
+        _, linear, index = self._linear_octree()
 
-        if self.father is None:
-            return False
-        else:
-            for node in self.father.sons:
-                if node is self:
-                    continue
-
-                if node.position in neighbors_positions:
-                    if node.data is True:
-                        neighbors_positions.remove(node.position)
-                    else:
-                        return False
-                else:
-                    return False
-
-            root = self.get_root()
-            for position in neighbors_positions:
-                leaf = root.find_leaf_with_position(position)
-
-                if leaf is None or leaf.data is False:
-                    return False
-
-            return True
+        return bool(linear.is_surrender(index)[0])
 
     def depth(self):
 
@@ -21,6 +21,8 @@ Skeletonization
 
     connect_all_node_with_nearest_neighbors
     create_graph
+    create_adjacency_matrix
+    adjacency_matrix_from_graph
     graph_from_voxel_grid
     skeletonize
     segment_reduction
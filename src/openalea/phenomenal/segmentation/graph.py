@@ -11,6 +11,7 @@ from __future__ import division, print_function, absolute_import
 
 import networkx
 import numpy
+import scipy.sparse
 import sklearn.feature_extraction.image
 import sklearn.neighbors
 
@@ -66,6 +67,79 @@ def connect_all_node_with_nearest_neighbors(graph):
     return graph
 
 
+def _neighbors_offsets():
+    """ Return the 26 neighbors offsets (in voxels unit) in the (x, y, z)
+    lexicographic order
+    """
+    return numpy.array([offset for offset in numpy.ndindex((3, 3, 3))
+                        if offset != (1, 1, 1)]) - 1
+
+
+def _voxels_neighbors_pairs(voxels_position, voxels_size):
+    """ Find all the pairs of 26-neighbors voxels at once, by sorting the
+    linear index of the voxels in their grid.
+
+    Parameters
+    ----------
+    voxels_position : numpy.ndarray
+        Center position of the voxels
+    voxels_size : int
+        Diameter size of voxels
+
+    Returns
+    -------
+    index_src, index_dst, distances : numpy.ndarray
+        Index of the voxels of each pair (ordered by source voxel then by
+        neighbor offset, both directions are present) and the distance
+        between their centers.
+    """
+    voxels_position = numpy.asarray(voxels_position, dtype=float)
+    if len(voxels_position) == 0:
+        empty = numpy.zeros((0, ), dtype=int)
+        return empty, empty, numpy.zeros((0, ), dtype=float)
+
+    # Integer grid coordinates with a one voxel margin, so neighbors of the
+    # border voxels stay in the grid
+    bound_min = voxels_position.min(axis=0)
+    indices = numpy.round(
+        (voxels_position - bound_min) / voxels_size).astype(numpy.int64) + 1
+    shape = indices.max(axis=0) + 2
+
+    linear = numpy.ravel_multi_index(indices.T, shape)
+    order = numpy.argsort(linear)
+    linear_sorted = linear[order]
+
+    offsets = _neighbors_offsets()
+    linear_offsets = numpy.ravel_multi_index((offsets + 1).T, (3, 3, 3))
+    strides = numpy.array([shape[1] * shape[2], shape[2], 1])
+    delta = numpy.dot(offsets, strides)
+
+    index_src, index_dst, offset_id = list(), list(), list()
+    for k, d in enumerate(delta):
+        neighbor = linear + d
+        pos = numpy.searchsorted(linear_sorted, neighbor)
+        pos[pos >= len(linear_sorted)] = 0
+        found = linear_sorted[pos] == neighbor
+
+        index_src.append(numpy.flatnonzero(found))
+        index_dst.append(order[pos[found]])
+        offset_id.append(numpy.full(numpy.count_nonzero(found), k))
+
+    index_src = numpy.concatenate(index_src)
+    index_dst = numpy.concatenate(index_dst)
+    offset_id = numpy.concatenate(offset_id)
+
+    # Same edges order than a loop over the voxels then over the offsets
+    lex_order = numpy.lexsort((offset_id, index_src))
+    index_src = index_src[lex_order]
+    index_dst = index_dst[lex_order]
+    offset_id = offset_id[lex_order]
+
+    distances = numpy.linalg.norm(offsets * voxels_size, axis=1)
+
+    return index_src, index_dst, distances[offset_id]
+
+
 def create_graph(voxels_position, voxels_size):
     """ Create a networkx.graph from voxels positions and voxels_size
 
@@ -83,52 +157,98 @@ def create_graph(voxels_position, voxels_size):
     graph = networkx.Graph()
     graph.add_nodes_from(voxels_position)
 
-    vs = voxels_size
-    neighbors = numpy.array([(-vs, -vs, -vs),
-                             (-vs, -vs, 0),
-                             (-vs, -vs, vs),
+    index_src, index_dst, distances = _voxels_neighbors_pairs(
+        voxels_position, voxels_size)
 
-                             (-vs, 0, -vs),
-                             (-vs, 0, 0),
-                             (-vs, 0, vs),
+    nodes = list(map(tuple, voxels_position))
+    graph.add_weighted_edges_from(
+        (nodes[i], nodes[j], w) for i, j, w in zip(index_src.tolist(),
+                                                   index_dst.tolist(),
+                                                   distances.tolist()))
 
-                             (-vs, vs, -vs),
-                             (-vs, vs, 0),
-                             (-vs, vs, vs),
+    return graph
 
-                             (0, -vs, -vs),
-                             (0, -vs, 0),
-                             (0, -vs, vs),
 
-                             (0, 0, -vs),
-                             (0, 0, vs),
+def create_adjacency_matrix(voxels_position, voxels_size):
+    """ Create the weighted 26-neighbors adjacency matrix of the voxels, the
+    same graph than create_graph without networkx.
+
+    Parameters
+    ----------
+    voxels_position : numpy.ndarray
+        Center position of the voxels
+    voxels_size : int
+        Diameter size of voxels
 
-                             (0, vs, -vs),
-                             (0, vs, 0),
-                             (0, vs, vs),
+    Returns
+    -------
+    adjacency : scipy.sparse.csr_matrix
+        (N, N) symmetric matrix where adjacency[i, j] is the distance between
+        the neighbors voxels i and j, in the voxels_position order.
+    """
+    index_src, index_dst, distances = _voxels_neighbors_pairs(
+        voxels_position, voxels_size)
 
-                             (vs, -vs, -vs),
-                             (vs, -vs, 0),
-                             (vs, -vs, vs),
+    n = len(voxels_position)
+    return scipy.sparse.csr_matrix((distances, (index_src, index_dst)),
+                                   shape=(n, n))
 
-                             (vs, 0, -vs),
-                             (vs, 0, 0),
-                             (vs, 0, vs),
 
-                             (vs, vs, -vs),
-                             (vs, vs, 0),
-                             (vs, vs, vs)])
+def adjacency_matrix_from_graph(graph, voxels_size):
+    """ Return the nodes of a voxels graph (see graph_from_voxel_grid) and
+    its weighted adjacency matrix, in the graph.nodes() order.
 
-    arr_vs = numpy.array(voxels_position)
-    distances = numpy.linalg.norm(neighbors, axis=1)
+    The 26-neighbors edges are computed from the nodes positions with
+    create_adjacency_matrix. Only the edges of the nodes with other edges
+    (the edges connecting the connected components, see
+    connect_all_node_with_nearest_neighbors) are read from the graph.
 
-    for i, pt in enumerate(voxels_position):
-        neighbors_position = list(map(tuple, neighbors + arr_vs[i]))
-        for j, pos in enumerate(neighbors_position):
-            if graph.has_node(pos):
-                graph.add_edge(pt, pos, weight=distances[j])
+    Parameters
+    ----------
+    graph : networkx.Graph
+        Graph of the 26-neighbors voxels center positions, with possibly a
+        few other edges
+    voxels_size : int
+        Diameter size of voxels
 
-    return graph
+    Returns
+    -------
+    nodes : list
+        list of 3-tuple, the nodes of the graph
+    adjacency : scipy.sparse.csr_matrix
+        (N, N) symmetric matrix of the weights of the edges of the graph
+    """
+    nodes = list(graph.nodes())
+    adjacency = create_adjacency_matrix(numpy.array(nodes, dtype=float),
+                                        voxels_size)
+
+    # Nodes whose edges are not exactly their 26-neighbors
+    degree = numpy.fromiter((d for _, d in graph.degree()), dtype=int,
+                            count=len(nodes))
+    other = numpy.flatnonzero(degree != numpy.diff(adjacency.indptr))
+    if len(other) == 0:
+        return nodes, adjacency
+
+    index = dict(zip(nodes, range(len(nodes))))
+    edges = numpy.array(
+        [(index[u], index[v], w) for u, v, w in graph.edges(
+            [nodes[i] for i in other], data="weight")],
+        dtype=float).reshape((-1, 3))
+    src, dst = edges[:, 0].astype(int), edges[:, 1].astype(int)
+
+    is_other = numpy.zeros(len(nodes), dtype=bool)
+    is_other[other] = True
+    adjacency = adjacency.tocoo()
+    kept = ~ (is_other[adjacency.row] | is_other[adjacency.col])
+
+    n = len(nodes)
+    adjacency = scipy.sparse.csr_matrix(
+        (numpy.concatenate((adjacency.data[kept], edges[:, 2], edges[:, 2])),
+         (numpy.concatenate((adjacency.row[kept], src, dst)),
+          numpy.concatenate((adjacency.col[kept], dst, src)))),
+        shape=(n, n))
+
+    return nodes, adjacency
 
 
 def _create_graph_with_sklearn(voxels_position, voxels_size):
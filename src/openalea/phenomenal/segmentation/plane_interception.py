@@ -13,6 +13,8 @@ import math
 import numpy
 import networkx
 import scipy
+import scipy.sparse.csgraph
+import scipy.spatial
 # ==============================================================================
 
 
@@ -70,16 +72,62 @@ def connected_points_with_point(points, points_graph, src_point):
     :return: Return the connected points with src_point, based on points graph
     connection.
     """
-    # Compute connected component in points in the ball
-    subgraph = points_graph.subgraph(points)
-    connected_components = networkx.connected_components(subgraph)
-    # Set points in ball by the connected points group with the current
-    # point of the path
-    for connected_points in connected_components:
-        if src_point in connected_points:
-            return connected_points
+    # Breadth-first search from src_point restricted to the points, it is the
+    # connected component of src_point in the subgraph of the points
+    points = set(points)
+    if src_point not in points or src_point not in points_graph:
+        return [src_point]
+
+    adjacency = points_graph.adj
+    connected_points = {src_point}
+    next_level = [src_point]
+    while next_level:
+        this_level = next_level
+        next_level = list()
+        for node in this_level:
+            for neighbor in adjacency[node]:
+                if neighbor in points and neighbor not in connected_points:
+                    connected_points.add(neighbor)
+                    next_level.append(neighbor)
+
+    return connected_points
+
+
+def _connected_index_with_point(index, points, points_adjacency, src_point):
+    """
+    Return the index of the points of index connected with src_point, based
+    on the adjacency matrix of all the points (the same result as
+    connected_points_with_point on points[index]). index must be sorted.
+    """
+    is_src = numpy.all(points[index] == src_point, axis=1)
+    if not numpy.any(is_src):
+        return None
+
+    # Adjacency restricted to the points of index : neighbors of each point
+    # of index, kept if they are in index
+    starts = points_adjacency.indptr[index]
+    counts = points_adjacency.indptr[index + 1] - starts
+    neighbors = points_adjacency.indices[
+        numpy.repeat(starts - numpy.cumsum(counts) + counts, counts) +
+        numpy.arange(counts.sum())]
+
+    local = numpy.searchsorted(index, neighbors)
+    local[local >= len(index)] = 0
+    inside = index[local] == neighbors
+    rows = numpy.repeat(numpy.arange(len(index)), counts)[inside]
 
-    return [src_point]
+    local_indptr = numpy.zeros(len(index) + 1, dtype=int)
+    numpy.cumsum(numpy.bincount(rows, minlength=len(index)),
+                 out=local_indptr[1:])
+    local_adjacency = scipy.sparse.csr_matrix(
+        (numpy.ones(len(rows)), local[inside], local_indptr),
+        shape=(len(index), len(index)))
+
+    local = scipy.sparse.csgraph.breadth_first_order(
+        local_adjacency, int(numpy.argmax(is_src)), directed=False,
+        return_predecessors=False)
+
+    return index[local]
 
 
 def connected_voxel_with_point(voxels_point, voxels_size, src_voxel_point):
@@ -114,12 +162,25 @@ def connected_voxel_with_point(voxels_point, voxels_size, src_voxel_point):
     return list(map(tuple, closest_node))
 
 
+def _query_ball_index(points_tree, center, radius):
+    """
+    Return the sorted index of the points of points_tree in the ball of center
+    and radius. The radius is slightly enlarged, the caller filter the exact
+    distances itself.
+    """
+    radius = float(numpy.max(radius))
+    index = points_tree.query_ball_point(center, radius * (1 + 1e-9) + 1e-9)
+
+    return numpy.sort(numpy.array(index, dtype=int))
+
+
 def intercept_points_from_src_point_with_plane_equation(
         points,
         src_point,
         plane_equation,
         distance_from_plane,
-        distance_from_src_point=None):
+        distance_from_src_point=None,
+        points_tree=None):
     """
     Intercept the points whose the distance from the plane (generate by
     plane_equation) are equal or inferior to the distance_from_plane. If
@@ -135,8 +196,33 @@ def intercept_points_from_src_point_with_plane_equation(
     :param plane_equation:
     :param distance_from_plane:
     :param distance_from_src_point:
+    :param points_tree: scipy.spatial.cKDTree of points, if not None and
+    distance_from_src_point is not None, only the points near src_point are
+    tested.
     :return: return the intercepted points
     """
+    return points[_intercept_index_from_src_point_with_plane_equation(
+        points, src_point, plane_equation, distance_from_plane,
+        distance_from_src_point=distance_from_src_point,
+        points_tree=points_tree)]
+
+
+def _intercept_index_from_src_point_with_plane_equation(
+        points,
+        src_point,
+        plane_equation,
+        distance_from_plane,
+        distance_from_src_point=None,
+        points_tree=None):
+    # Sorted index of the points of
+    # intercept_points_from_src_point_with_plane_equation
+    if points_tree is not None and distance_from_src_point is not None:
+        index = _query_ball_index(
+            points_tree, src_point, distance_from_src_point)
+    else:
+        index = numpy.arange(len(points))
+    points = points[index]
+
     res = abs(points[:, 0] * plane_equation[0] +
               points[:, 1] * plane_equation[1] +
               points[:, 2] * plane_equation[2] -
@@ -144,15 +230,14 @@ def intercept_points_from_src_point_with_plane_equation(
                                               plane_equation[1] ** 2 +
                                               plane_equation[2] ** 2))
 
-    index = numpy.where(res < distance_from_plane)[0]
-    closest_voxel = points[index]
+    kept = numpy.where(res < distance_from_plane)[0]
+    index, points = index[kept], points[kept]
 
     if distance_from_src_point is not None:
-        res = numpy.linalg.norm(closest_voxel - src_point, axis=1)
-        index = numpy.where(res < distance_from_src_point)[0]
-        closest_voxel = closest_voxel[index]
+        res = numpy.linalg.norm(points - src_point, axis=1)
+        index = index[numpy.where(res < distance_from_src_point)[0]]
 
-    return closest_voxel
+    return index
 
 
 def compute_plane_equation(orientation_vector, src_point):
@@ -210,7 +295,24 @@ def intercept_points_along_path_with_planes(points,
                                             without_connection=False,
                                             voxels_size=4,
                                             with_relative_distance=True,
-                                            fix_distance_from_src_point=None):
+                                            fix_distance_from_src_point=None,
+                                            points_tree=None,
+                                            points_adjacency=None):
+    """
+    Intercept the points along the polyline with a plane orthogonal to the
+    polyline at each of its points, from the last point to the first one.
+
+    :param points_tree: scipy.spatial.cKDTree of points, built if None
+    :param points_adjacency: scipy.sparse matrix, adjacency matrix of the
+    points_graph in the points order (see adjacency_matrix_from_graph). If
+    given, the connected points are searched on it instead of points_graph,
+    the result is the same.
+    :return: ([{(x, y, z), ...}, ...], [plane_equation, ...]) : intercepted
+    points and plane equation at each point of the polyline
+    """
+
+    if points_tree is None:
+        points_tree = scipy.spatial.cKDTree(points)
 
     length_polyline = len(polyline)
     intercepted_points = [None] * length_polyline
@@ -242,21 +344,38 @@ def intercept_points_along_path_with_planes(points,
 
         # ======================================================================
 
-        pts = intercept_points_from_src_point_with_plane_equation(
-            points,
-            point,
-            plane_equation,
-            distance_from_plane,
-            distance_from_src_point)
-
-        if without_connection:
-            pts = list(map(tuple, pts))
-        elif points_graph is not None:
-
-            pts = list(map(tuple, pts))
-            pts = connected_points_with_point(pts, points_graph, point)
+        if points_adjacency is not None and not without_connection:
+            index = _intercept_index_from_src_point_with_plane_equation(
+                points,
+                point,
+                plane_equation,
+                distance_from_plane,
+                distance_from_src_point,
+                points_tree=points_tree)
+
+            index = _connected_index_with_point(
+                index, points, points_adjacency, point)
+            if index is None:
+                pts = [point]
+            else:
+                pts = set(map(tuple, points[index]))
         else:
-            pts = connected_voxel_with_point(pts, voxels_size, point)
+            pts = intercept_points_from_src_point_with_plane_equation(
+                points,
+                point,
+                plane_equation,
+                distance_from_plane,
+                distance_from_src_point,
+                points_tree=points_tree)
+
+            if without_connection:
+                pts = list(map(tuple, pts))
+            elif points_graph is not None:
+
+                pts = list(map(tuple, pts))
+                pts = connected_points_with_point(pts, points_graph, point)
+            else:
+                pts = connected_voxel_with_point(pts, voxels_size, point)
 
         intercepted_points[i] = pts
         planes_equation[i] = plane_equation
@@ -264,7 +383,8 @@ def intercept_points_along_path_with_planes(points,
     return intercepted_points, planes_equation
 
 
-def intercept_points_with_ball(points, ball_center, ball_radius):
+def intercept_points_with_ball(points, ball_center, ball_radius,
+                               points_tree=None):
     """
     Return a list of the intercept points by a ball of radius ball_radius and
     with center position ball_center.
@@ -273,8 +393,14 @@ def intercept_points_with_ball(points, ball_center, ball_radius):
     :param ball_center: cndarray - position x, y, z of center position of the
     ball. Ball center position should be in the points graph.
     :param ball_radius: float value of the ball radius
+    :param points_tree: scipy.spatial.cKDTree of points, if not None only the
+    points near ball_center are tested.
     :return: list of intercepted points
     """
+    if points_tree is not None:
+        points = points[_query_ball_index(
+            points_tree, ball_center, ball_radius)]
+
     # Compute points in the ball
     points_distance_from_point = numpy.linalg.norm(points - ball_center, axis=1)
     index = numpy.where(points_distance_from_point < ball_radius)
@@ -285,7 +411,9 @@ def intercept_points_with_ball(points, ball_center, ball_radius):
 def intercept_points_along_polyline_with_ball(points,
                                               graph,
                                               polyline,
-                                              ball_radius=50):
+                                              ball_radius=50,
+                                              points_tree=None,
+                                              points_adjacency=None):
     """
     Return a list of intercept point along a polyline by a ball at each
     points.
@@ -294,19 +422,38 @@ def intercept_points_along_polyline_with_ball(points,
     :param polyline: ndarray ot points
     :param graph: graph of the points
     :param ball_radius: size of the ball radius in mm
+    :param points_tree: scipy.spatial.cKDTree of points, built if None
+    :param points_adjacency: scipy.sparse matrix, adjacency matrix of the
+    graph in the points order (see adjacency_matrix_from_graph). If given,
+    the connected points are searched on it instead of graph, the result is
+    the same.
     :return: [[(x, y, z), ...], ...] : list of points intercepted by the ball
     """
+    if points_tree is None:
+        points_tree = scipy.spatial.cKDTree(points)
+
     intercepted_points = list()
     for point in polyline:
-        points_in_ball = intercept_points_with_ball(points,
-                                                    point,
-                                                    ball_radius)
+        if points_adjacency is not None:
+            index = _query_ball_index(points_tree, point, ball_radius)
+            distance = numpy.linalg.norm(points[index] - point, axis=1)
+            index = _connected_index_with_point(
+                index[distance < ball_radius], points, points_adjacency,
+                tuple(point))
+
+            if index is None:
+                points_in_ball = [tuple(point)]
+            else:
+                points_in_ball = set(map(tuple, points[index]))
+        else:
+            points_in_ball = intercept_points_with_ball(
+                points, point, ball_radius, points_tree=points_tree)
 
-        points_in_ball = list(map(tuple, points_in_ball))
+            points_in_ball = list(map(tuple, points_in_ball))
 
-        points_in_ball = connected_points_with_point(points_in_ball,
-                                                     graph,
-                                                     tuple(point))
+            points_in_ball = connected_points_with_point(points_in_ball,
+                                                         graph,
+                                                         tuple(point))
 
         intercepted_points.append(points_in_ball)
 
@@ -11,11 +11,14 @@ from __future__ import division, print_function, absolute_import
 
 import numpy
 import networkx
+import scipy.sparse.csgraph
+import scipy.spatial
 
 from ..multi_view_reconstruction import project_voxel_centers_on_image
 from .plane_interception import (
     intercept_points_along_path_with_planes,
     intercept_points_along_polyline_with_ball)
+from .graph import adjacency_matrix_from_graph
 from ..object import (VoxelSkeleton, VoxelGrid, VoxelSegment)
 
 import openalea.phenomenal.segmentation._c_skeleton as c_skeleton
@@ -63,9 +66,9 @@ def segment_reduction(voxel_skeleton,
     len_images = len(image_projection)
     list_array = [None] * len_segments * len_images
     for i, vs in enumerate(orderer_voxel_segments):
+        vp = numpy.array(list(vs.voxels_position))
         for j, (image, projection) in enumerate(image_projection):
 
-            vp = numpy.array(list(vs.voxels_position))
             list_array[i * len_images + j] = project_voxel_centers_on_image(
                 vp,
                 voxel_skeleton.voxels_size,
@@ -140,7 +143,70 @@ def segment_reduction(voxel_skeleton,
 # ==============================================================================
 
 
+class ShortestPathTree(object):
+    """ All the shortest paths from a source node, stored as the distance and
+    the predecessor of each node. A path is rebuilt on demand when
+    accessed with tree[node], like the dict of paths returned by
+    networkx.single_source_dijkstra_path.
+    """
+
+    def __init__(self, nodes, distances, predecessors, source):
+        self.nodes = nodes
+        self.index = dict(zip(nodes, range(len(nodes))))
+        self.distances = distances
+        self.predecessors = predecessors
+        self.source = source
+
+        # Number of nodes in the path of each node (0 if unreachable),
+        # computed by pointer jumping along the predecessors
+        hops = (predecessors >= 0).astype(numpy.int64)
+        jump = predecessors.copy()
+        active = numpy.flatnonzero(jump >= 0)
+        while len(active) > 0:
+            hops[active] += hops[jump[active]]
+            jump[active] = jump[jump[active]]
+            active = active[jump[active] >= 0]
+
+        self.lengths = numpy.where(numpy.isfinite(distances), hops + 1, 0)
+
+    def __len__(self):
+        return int(numpy.count_nonzero(self.lengths))
+
+    def __contains__(self, node):
+        return node in self.index and self.lengths[self.index[node]] > 0
+
+    def __getitem__(self, node):
+        i = self.index[node]
+        if self.lengths[i] == 0:
+            raise KeyError(node)
+
+        path = [None] * int(self.lengths[i])
+        for k in range(len(path) - 1, -1, -1):
+            path[k] = self.nodes[i]
+            i = self.predecessors[i]
+
+        return path
+
+    def longest_path(self, nodes):
+        """ Return the path with the most nodes among the paths of nodes,
+        the first one in case of equality. None if no path.
+        """
+        index = numpy.fromiter((self.index[node] for node in nodes),
+                               dtype=numpy.int64)
+        if len(index) == 0:
+            return None
+
+        i = int(numpy.argmax(self.lengths[index]))
+        if self.lengths[index[i]] == 0:
+            return None
+
+        return self[self.nodes[index[i]]]
+
+
 def _get_longest_shortest_path_in_nodes(nodes, paths):
+    if isinstance(paths, ShortestPathTree):
+        return paths.longest_path(nodes)
+
     leaf_skeleton_path = None
     longest_length = 0
     for node in nodes:
@@ -153,46 +219,87 @@ def _get_longest_shortest_path_in_nodes(nodes, paths):
     return leaf_skeleton_path
 
 
-def _segment_path(voxels,
-                  array_voxels,
-                  skeleton_path,
-                  graph,
-                  voxels_size=4,
-                  mode="plane",
-                  plane_width=4,
-                  ball_radius=10):
+def _intercept_polyline(polyline,
+                        array_voxels,
+                        graph,
+                        voxels_size=4,
+                        mode="plane",
+                        plane_width=4,
+                        ball_radius=10,
+                        points_tree=None,
+                        points_adjacency=None):
 
-    # ==========================================================================
-    # Get the longest shorted path of voxels
-    polyline = _get_longest_shortest_path_in_nodes(
-        voxels, skeleton_path)
+    if mode == "ball":
+        intercept_points = intercept_points_along_polyline_with_ball(
+            array_voxels,
+            graph,
+            polyline,
+            ball_radius=ball_radius,
+            points_tree=points_tree,
+            points_adjacency=points_adjacency)
+    else:
+        intercept_points, _ = intercept_points_along_path_with_planes(
+            array_voxels,
+            polyline,
+            distance_from_plane=plane_width,
+            points_graph=graph,
+            voxels_size=voxels_size,
+            points_tree=points_tree,
+            points_adjacency=points_adjacency)
 
-    # ==========================================================================
+    voxels_position = set().union(*intercept_points)
 
-    if polyline:
-        if mode == "ball":
-            intercept_points = intercept_points_along_polyline_with_ball(
-                array_voxels,
-                graph,
-                polyline,
-                ball_radius=ball_radius)
-        else:
-            intercept_points, _ = intercept_points_along_path_with_planes(
-                array_voxels,
-                polyline,
-                distance_from_plane=plane_width,
-                points_graph=graph,
-                voxels_size=voxels_size)
+    return VoxelSegment(polyline, voxels_position, intercept_points)
 
-        voxels_position = set().union(*intercept_points)
 
-        segment = VoxelSegment(polyline,
-                               voxels_position,
-                               intercept_points)
+class _LongestPathQueue(object):
+    """ Voxels remaining to segment, ordered by decreasing number of nodes in
+    their shortest path (first voxel in the given order in case of
+    equality). The voxels are indexed once and the remaining ones are kept
+    in a boolean mask, so removing a segment costs its number of voxels and
+    finding the next longest path only moves a cursor forward.
+    """
 
-        remain = set(voxels).difference(segment.voxels_position)
+    def __init__(self, nodes, paths):
+        self.nodes = list(nodes)
+        self.index = dict(zip(self.nodes, range(len(self.nodes))))
 
-        return segment, remain
+        if isinstance(paths, ShortestPathTree):
+            self.lengths = paths.lengths[numpy.fromiter(
+                (paths.index[node] for node in self.nodes),
+                dtype=numpy.int64, count=len(self.nodes))]
+        else:
+            self.lengths = numpy.fromiter(
+                (len(paths.get(node, ())) for node in self.nodes),
+                dtype=numpy.int64, count=len(self.nodes))
+
+        self.order = numpy.argsort(-self.lengths, kind="stable")
+        self.remaining = numpy.ones(len(self.nodes), dtype=bool)
+        self._nb_remaining = len(self.nodes)
+        self._cursor = 0
+
+    def __len__(self):
+        return self._nb_remaining
+
+    def top(self):
+        """ Return the remaining voxel with the longest path and the number
+        of nodes of its path (0 if unreachable).
+        """
+        while not self.remaining[self.order[self._cursor]]:
+            self._cursor += 1
+
+        i = self.order[self._cursor]
+        return self.nodes[i], int(self.lengths[i])
+
+    def discard(self, nodes):
+        """ Remove nodes from the remaining voxels, nodes not in the queue
+        are ignored.
+        """
+        for node in nodes:
+            i = self.index.get(node)
+            if i is not None and self.remaining[i]:
+                self.remaining[i] = False
+                self._nb_remaining -= 1
 
 
 def find_base_stem_position(voxels_position, voxels_size, neighbor_size=45):
@@ -257,7 +364,8 @@ def find_base_stem_position(voxels_position, voxels_size, neighbor_size=45):
     return base_stem_position
 
 
-def compute_all_shorted_path(graph, voxels_size, neighbor_size=45):
+def compute_all_shorted_path(graph, voxels_size, neighbor_size=45,
+                             backend="networkx"):
     """ Compute all the shorted path from the base position of the graph
     position.
 
@@ -269,9 +377,16 @@ def compute_all_shorted_path(graph, voxels_size, neighbor_size=45):
     voxels_size : int
         Voxels diameter size
 
+    backend : str, optional
+        "networkx" (default) to store the full path of each node in a dict,
+        "scipy" to run scipy.sparse.csgraph.dijkstra on the adjacency
+        matrix of the graph (see adjacency_matrix_from_graph) and keep only
+        the distances and the predecessors (ShortestPathTree). In case of
+        paths of equal length, the two backends can choose different paths.
+
     Returns
     -------
-    all_shorted_path_to_stem_base : dict
+    all_shorted_path_to_stem_base : dict or ShortestPathTree
         List of all the shorted path of the graph from the base
     """
     # ==========================================================================
@@ -284,6 +399,19 @@ def compute_all_shorted_path(graph, voxels_size, neighbor_size=45):
     # ==========================================================================
     # Compute the shorted path
 
+    if backend == "scipy":
+        nodes, adjacency = adjacency_matrix_from_graph(graph, voxels_size)
+
+        source = nodes.index((x_stem, y_stem, z_stem))
+        distances, predecessors = scipy.sparse.csgraph.dijkstra(
+            adjacency, directed=False, indices=source,
+            return_predecessors=True)
+
+        return ShortestPathTree(nodes, distances, predecessors, nodes[source])
+
+    if backend != "networkx":
+        raise ValueError("Unknown backend : {}".format(backend))
+
     all_shorted_path_to_stem_base = networkx.single_source_dijkstra_path(
         graph, (x_stem, y_stem, z_stem), weight="weight")
 
@@ -297,9 +425,16 @@ def skeletonize(voxel_grid,
                 mode="plane",
                 plane_width=None,
                 ball_radius=None,
-                neighbor_size=45):
+                neighbor_size=45,
+                backend="networkx"):
     """ Compute phenomenal skeletonization on the voxel_grid based on the graph.
 
+    At each step, the remaining voxel with the longest shortest path to the
+    stem base gives the polyline of the next segment (the first one in the
+    order of voxels_position_remain in case of equality), then the voxels
+    intercepted along this polyline are removed. Voxels without path to the
+    stem base are ignored.
+
     Parameters
     ----------
     voxel_grid : VoxelGrid
@@ -322,6 +457,10 @@ def skeletonize(voxel_grid,
         Size in mm of the radius of the ball. By default or if None is equal
         to the voxel_size * 4 of the voxel_grid
 
+    backend : str, optional
+        Shortest paths backend of compute_all_shorted_path, "networkx"
+        (default) or "scipy"
+
     Returns
     -------
     voxel_skeleton : VoxelSkeleton
@@ -337,28 +476,43 @@ def skeletonize(voxel_grid,
 
     voxels_size = voxel_grid.voxels_size
     all_shorted_path_to_stem_base = compute_all_shorted_path(
-        subgraph, voxels_size, neighbor_size=neighbor_size)
+        subgraph, voxels_size, neighbor_size=neighbor_size, backend=backend)
 
     # ==========================================================================
     if voxels_position_remain is None:
         voxels_position_remain = subgraph.nodes()
 
-    np_arr_all_graph_voxels_plant = numpy.array(graph.nodes())
+    # Adjacency matrix of the graph, the connected intercepted voxels are
+    # searched on it
+    nodes, points_adjacency = adjacency_matrix_from_graph(graph, voxels_size)
+    np_arr_all_graph_voxels_plant = numpy.array(nodes)
+    # Spatial index built once for all the interceptions
+    points_tree = scipy.spatial.cKDTree(np_arr_all_graph_voxels_plant)
     # ==========================================================================
 
+    # The remaining voxels are indexed once, each segment then only clears
+    # its own voxels
+    queue = _LongestPathQueue(voxels_position_remain,
+                              all_shorted_path_to_stem_base)
+
     segments = list()
-    while len(voxels_position_remain) != 0:
+    while len(queue) != 0:
+        node, length = queue.top()
+        if length == 0:
+            break
 
-        (voxel_segment, voxels_position_remain) = _segment_path(
-            voxels_position_remain,
+        voxel_segment = _intercept_polyline(
+            all_shorted_path_to_stem_base[node],
             np_arr_all_graph_voxels_plant,
-            all_shorted_path_to_stem_base,
             graph,
             voxels_size=voxels_size,
             mode=mode,
             plane_width=plane_width,
-            ball_radius=ball_radius)
+            ball_radius=ball_radius,
+            points_tree=points_tree,
+            points_adjacency=points_adjacency)
 
+        queue.discard(voxel_segment.voxels_position)
         segments.append(voxel_segment)
 
     return VoxelSkeleton(segments, voxels_size)
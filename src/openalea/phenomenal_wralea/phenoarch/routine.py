@@ -25,16 +25,27 @@ import openalea.phenomenal.display as phm_display
 
 def detect_chessboard(chessboard_images,
                       size_of_chessboard=47,
-                      shape_of_chessboard=(8, 6)):
+                      shape_of_chessboard=(8, 6),
+                      cache_dir=None,
+                      scale=None,
+                      processes=1):
 
     # BUILD CHESSBOARD OBJECT
     chessboard = phm_calib.Chessboard(size_of_chessboard,
                                       shape_of_chessboard)
 
-    for id_camera in chessboard_images:
-        for angle in chessboard_images[id_camera]:
-            im = chessboard_images[id_camera][angle]
-            found = chessboard.detect_corners(id_camera, angle, im)
+    if processes == 1 and cache_dir is None:
+        for id_camera in chessboard_images:
+            for angle in chessboard_images[id_camera]:
+                im = chessboard_images[id_camera][angle]
+                found = chessboard.detect_corners(id_camera, angle, im,
+                                                  scale=scale)
+    else:
+        # processes=None uses all the CPU
+        chessboard.detect_corners_batch(chessboard_images,
+                                        scale=scale,
+                                        cache_dir=cache_dir,
+                                        processes=processes)
 
     return [chessboard],
 
@@ -80,24 +91,40 @@ def calibrations(chessboards,
 # ==============================================================================
 
 
-def routine_side_binarization(image, mean_img):
+_SIDE_BINARIZATION_PARAMETERS = dict(threshold=0.3,
+                                     dark_background=False,
+                                     hsv_min=(30, 11, 0),
+                                     hsv_max=(129, 254, 141))
+
+
+def _side_binarization_parameters():
+    # Parameters of phenoarch_side_binarization shared by the side routines
     maks = phm_data.tutorial_data_binarization_mask()
 
-    threshold = 0.3
-    dark_background = False
+    parameters = dict(_SIDE_BINARIZATION_PARAMETERS)
+    parameters['mask_hsv'] = maks[0]
+    parameters['mask_mean_shift'] = maks[1]
+
+    return parameters
+
 
-    hsv_min = (30, 11, 0)
-    hsv_max = (129, 254, 141)
+def routine_side_binarization(image, mean_img):
+    parameters = _side_binarization_parameters()
 
     # Convert image on HSV representation
     hsv_image = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
     # Threshold the image with HSV min and max value
-    binary_hsv_image = phm_img.threshold_hsv(hsv_image, hsv_min, hsv_max,
-                                             maks[0])
+    binary_hsv_image = phm_img.threshold_hsv(hsv_image,
+                                             parameters['hsv_min'],
+                                             parameters['hsv_max'],
+                                             parameters['mask_hsv'])
 
     # Threshold the image with difference between image and mean_image
     binary_mean_shift_image = phm_img.threshold_meanshift(
-        image, mean_img, threshold, dark_background, maks[1])
+        image, mean_img,
+        parameters['threshold'],
+        parameters['dark_background'],
+        parameters['mask_mean_shift'])
 
     # Add the two image
     result = cv2.add(binary_hsv_image, binary_mean_shift_image)
@@ -130,17 +157,27 @@ def routine_top_binarization(image):
 
 def binarize(raw_images):
 
-    # Compute the mean image of the side view image
-    mean_img = phm_img.mean_image(raw_images['side'].values())
+    bin_images = collections.defaultdict(dict)
 
-    routine_binarization = {
-        'side': lambda im: routine_side_binarization(im, mean_img),
-        'top': lambda im: routine_top_binarization(im)}
+    if 'side' in raw_images:
+        # Compute the mean image of the side view image
+        angles = list(raw_images['side'])
+        mean_img = phm_img.mean_image(
+            [raw_images['side'][angle] for angle in angles])
+
+        # Same thresholds as routine_side_binarization, on a pool of threads
+        for index, bin_img in phm_img.phenoarch_side_binarization_stream(
+                (raw_images['side'][angle] for angle in angles),
+                mean_img,
+                **_side_binarization_parameters()):
+            bin_images['side'][angles[index]] = bin_img
 
-    bin_images = collections.defaultdict(dict)
     for id_camera in raw_images:
+        if id_camera == 'side':
+            continue
+
         for angle in raw_images[id_camera]:
-            bin_images[id_camera][angle] = routine_binarization[id_camera](
+            bin_images[id_camera][angle] = routine_top_binarization(
                 raw_images[id_camera][angle])
 
     return bin_images
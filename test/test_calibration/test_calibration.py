@@ -12,6 +12,8 @@
 from __future__ import division, print_function
 
 import os
+import multiprocessing
+import numpy
 
 import openalea.phenomenal.calibration as phm_calib
 
@@ -25,6 +27,179 @@ def test_calibration_working():
 
     chessboards = phm_data.chessboards(name_dir)
 
+
+def test_calibration_side_with_2_target_jacobian():
+
+    name_dir = os.path.join(os.path.dirname(os.path.realpath(__file__)),
+                            "../data/plant_1")
+
+    chessboard_1, chessboard_2 = phm_data.chessboards(name_dir)
+    calibration = phm_calib.CalibrationCameraSideWith2Target.load(
+        os.path.join(name_dir, "calibration/calibration_camera_side.json"))
+
+    calibration._ref_target_1_points_local_3d = \
+        chessboard_1.get_corners_local_3d()
+    calibration._ref_target_2_points_local_3d = \
+        chessboard_2.get_corners_local_3d()
+    calibration._ref_target_1_points_2d = chessboard_1.get_corners_2d("side")
+    calibration._ref_target_2_points_2d = chessboard_2.get_corners_2d("side")
+
+    x0 = numpy.array([calibration._cam_focal_length_x,
+                      calibration._cam_focal_length_y,
+                      calibration._cam_pos_x,
+                      calibration._cam_pos_y,
+                      calibration._cam_rot_x,
+                      calibration._cam_rot_z,
+                      calibration._angle_factor] +
+                     [getattr(calibration, "_target_{}_{}_{}".format(i, t, a))
+                      for i in [1, 2] for t in ["pos", "rot"]
+                      for a in ["x", "y", "z"]])
+
+    # Reference : corners projected one by one
+    err = 0
+    for alpha, ref_pts in calibration._ref_target_1_points_2d.items():
+        pts = calibration.get_target_1_projected(
+            alpha, calibration._ref_target_1_points_local_3d)
+        err += numpy.linalg.norm(numpy.array(pts) - ref_pts, axis=1).sum()
+    for alpha, ref_pts in calibration._ref_target_2_points_2d.items():
+        pts = calibration.get_target_2_projected(
+            alpha, calibration._ref_target_2_points_local_3d)
+        err += numpy.linalg.norm(numpy.array(pts) - ref_pts, axis=1).sum()
+
+    assert numpy.isclose(calibration.fit_function(x0), err)
+
+    jac = calibration.jacobian(x0)
+    assert jac.shape == (len(calibration.residuals(x0)), len(x0))
+    for j in range(len(x0)):
+        h = 1e-5 * max(1.0, abs(x0[j]))
+        x_plus, x_minus = x0.copy(), x0.copy()
+        x_plus[j] += h
+        x_minus[j] -= h
+        d = (calibration.residuals(x_plus) -
+             calibration.residuals(x_minus)) / (2 * h)
+        assert numpy.allclose(jac[:, j], d, rtol=1e-4,
+                              atol=1e-6 * numpy.abs(d).max())
+
+
+def test_calibration_side_with_2_target_references():
+
+    name_dir = os.path.join(os.path.dirname(os.path.realpath(__file__)),
+                            "../data/plant_1")
+
+    chessboard_1, chessboard_2 = phm_data.chessboards(name_dir)
+    calibration = phm_calib.CalibrationCameraSideWith2Target.load(
+        os.path.join(name_dir, "calibration/calibration_camera_side.json"))
+
+    calibration._ref_target_1_points_local_3d = \
+        chessboard_1.get_corners_local_3d()
+    calibration._ref_target_2_points_local_3d = \
+        chessboard_2.get_corners_local_3d()
+    calibration._ref_target_1_points_2d = chessboard_1.get_corners_2d("side")
+    calibration._ref_target_2_points_2d = chessboard_2.get_corners_2d("side")
+
+    assert len(calibration._references()[3]) == sum(
+        len(pts) for ref_points_2d in [calibration._ref_target_1_points_2d,
+                                       calibration._ref_target_2_points_2d]
+        for pts in ref_points_2d.values())
+
+    # Assigning new corners drops the stacked references
+    alpha, ref_pts = next(iter(
+        calibration._ref_target_2_points_2d.items()))
+    calibration._ref_target_2_points_2d = {alpha: ref_pts}
+
+    target, angles, _, points_2d = calibration._references()
+    assert len(points_2d) == len(target) == sum(
+        len(pts) for pts in calibration._ref_target_1_points_2d.values()) + \
+        len(ref_pts)
+    assert numpy.all(angles[target == 1] == float(alpha))
+    assert numpy.array_equal(points_2d[target == 1], ref_pts)
+
+
+
+    name_dir = os.path.join(os.path.dirname(os.path.realpath(__file__)),
+                            "../data/plant_1")
+
+    chessboard_1, chessboard_2 = phm_data.chessboards(name_dir)
+
+    numpy.random.seed(0)
+    calibration = phm_calib.CalibrationCameraSideWith2TargetYXZ()
+    err = calibration.calibrate(chessboard_1.get_corners_2d("side"),
+                                chessboard_1.get_corners_local_3d(),
+                                chessboard_2.get_corners_2d("side"),
+                                chessboard_2.get_corners_local_3d(),
+                                (2056, 2454),
+                                number_of_repetition=0,
+                                method="least_squares")
+
+    # Mean reprojection error by corner under the pixel
+    assert err / 49 < 1.0
+
+
+
+def test_calibration_find_parameters_restarts():
+
+    name_dir = os.path.join(os.path.dirname(os.path.realpath(__file__)),
+                            "../data/plant_1")
+
+    chessboard_1, chessboard_2 = phm_data.chessboards(name_dir)
+    args = (chessboard_1.get_corners_2d("side"),
+            chessboard_1.get_corners_local_3d(),
+            chessboard_2.get_corners_2d("side"),
+            chessboard_2.get_corners_local_3d(),
+            (2056, 2454))
+
+    calibration = phm_calib.CalibrationCameraSideWith2TargetYXZ()
+    err = calibration.calibrate(*args, number_of_repetition=2,
+                                method="least_squares", seed=42)
+    restarts = calibration._restarts
+    assert [index for index, _, _, _ in restarts] == [0, 1, 2]
+    assert numpy.isclose(err, min(e for _, _, e, _ in restarts))
+
+    # Same restarts run in a pool of processes
+    pool = multiprocessing.Pool(2)
+    try:
+        calibration = phm_calib.CalibrationCameraSideWith2TargetYXZ()
+        calibration.calibrate(*args, number_of_repetition=2,
+                              method="least_squares", seed=42, pool=pool)
+    finally:
+        pool.close()
+        pool.join()
+
+    for r1, r2 in zip(sorted(calibration._restarts), restarts):
+        assert r1[:2] == r2[:2]
+        assert numpy.isclose(r1[2], r2[2])
+
+    # Stop at the first restart reaching the target error
+    calibration = phm_calib.CalibrationCameraSideWith2TargetYXZ()
+    calibration.calibrate(*args, number_of_repetition=2,
+                          method="least_squares", seed=42,
+                          target_error=float("inf"))
+    assert len(calibration._restarts) == 1
+    assert calibration._restarts[0][:2] == restarts[0][:2]
+
+
+def test_calibration_initial_parameters_abstract():
+    import openalea.phenomenal.calibration.calibration as calibration
+
+    for cls in [calibration._CalibrationCameraFit,
+                calibration._CalibrationCameraSideWith2Target]:
+        try:
+            cls()
+        except TypeError:
+            pass
+        else:
+            assert False
+
+    random_state = numpy.random.RandomState(0)
+    for cls in [phm_calib.CalibrationCameraTop,
+                phm_calib.CalibrationCameraSideWith2Target,
+                phm_calib.CalibrationCameraSideWith2TargetYXZ]:
+        assert len(cls()._initial_parameters(random_state)) > 0
+
+    # The loaded cameras are not optimized
+    phm_calib.CalibrationCamera()
+
+
 if __name__ == "__main__":
     for func_name in dir():
         if func_name.startswith('test_'):
@@ -11,9 +11,11 @@
 # ==============================================================================
 from __future__ import division, print_function
 
+import math
 import numpy
 import os
 
+import openalea.phenomenal.calibration as phm_calib
 import openalea.phenomenal.data as phm_data
 # ==============================================================================
 
@@ -113,6 +115,81 @@ def test_projection():
         assert tuple(pt_2d) == (1337.425449561377, 1070.8621710384346)
 
 
+def test_projection_matrix():
+    dir_path = os.path.join(os.path.dirname(os.path.realpath(__file__)),
+                            "../data/plant_1")
+
+    calibrations = phm_data.calibrations(dir_path)
+    pts_3d = numpy.array([[-472, -472, 200],
+                          [0, 0, 0],
+                          [100, -50, 800],
+                          [350, 20, -100]], dtype=numpy.float32)
+
+    for id_camera in calibrations:
+        for angle in range(0, 360, 30):
+            projection = calibrations[id_camera].get_projection(angle)
+            assert projection is calibrations[id_camera].get_projection(angle)
+
+            calibration = calibrations[id_camera]
+            alpha = math.radians(angle * calibration._angle_factor)
+            x = (- pts_3d[:, 0] * math.cos(alpha) -
+                 pts_3d[:, 1] * math.sin(alpha))
+            y = (- pts_3d[:, 0] * math.sin(alpha) +
+                 pts_3d[:, 1] * math.cos(alpha))
+            ref = calibration.arr_pixel_coordinates(
+                calibration.get_camera_frame().arr_local_point(
+                    numpy.column_stack((x, y, pts_3d[:, 2]))),
+                calibration._cam_width_image,
+                calibration._cam_height_image,
+                calibration._cam_focal_length_x,
+                calibration._cam_focal_length_y)
+
+            out = numpy.empty((len(pts_3d), 2))
+            result = projection(pts_3d, out=out)
+
+            assert result is out
+            assert numpy.allclose(ref, result)
+
+    side_calibration = calibrations["side"]
+    projection = side_calibration.get_projection(0)
+    side_calibration._cam_focal_length_x *= 2
+    assert projection is not side_calibration.get_projection(0)
+
+
+
+def test_triangulate_points():
+    dir_path = os.path.join(os.path.dirname(os.path.realpath(__file__)),
+                            "../data/plant_1")
+
+    calibrations = phm_data.calibrations(dir_path)
+    pts_3d = numpy.array([[-300, 250, 100],
+                          [0, 0, 0],
+                          [100, -50, 800],
+                          [350, 20, 1200],
+                          [10, 20, 30]], dtype=float)
+
+    points_2d = [dict() for _ in pts_3d]
+    for angle in range(0, 360, 30):
+        pts_2d = calibrations["side"].get_projection(angle)(pts_3d)
+        for i in range(len(pts_3d) - 1):
+            # Each point is seen on a part of the images
+            if (angle // 30 + i) % 3 != 0:
+                points_2d[i].setdefault("side", dict())[angle] = pts_2d[i]
+
+    pts_2d = calibrations["top"].get_projection(0)(pts_3d)
+    for i in range(len(pts_3d)):
+        points_2d[i]["top"] = {0: pts_2d[i]}
+
+    result, err = phm_calib.triangulate_points(points_2d, calibrations)
+
+    assert numpy.allclose(result[:-1], pts_3d[:-1], atol=1e-6)
+    assert numpy.all(err[:-1] < 1e-6)
+
+    # Point seen on a single image
+    assert numpy.all(numpy.isnan(result[-1]))
+    assert numpy.isnan(err[-1])
+
+
 if __name__ == "__main__":
     for func_name in dir():
         if func_name.startswith('test_'):
@@ -13,6 +13,8 @@ from __future__ import division, print_function
 
 import numpy
 import os
+import shutil
+import tempfile
 
 import openalea.phenomenal.data as phm_data
 import openalea.phenomenal.calibration as phm_calib
@@ -70,6 +72,44 @@ def test_chessboard_3():
         assert False
 
 
+
+def test_chessboard_detect_corners_batch():
+
+    dir_path = os.path.join(os.path.dirname(os.path.realpath(__file__)),
+                            "../data/plant_1")
+    images = phm_data.chessboard_images(dir_path)[0]
+
+    ref = phm_calib.Chessboard(50, (8, 6))
+    assert ref.detect_corners("side", 42, images['side'][42])
+
+    # Same image twice, the second is detected only once
+    images = {"side": {42: images['side'][42], 0: images['side'][42]}}
+    cache_dir = tempfile.mkdtemp()
+    try:
+        chess = phm_calib.Chessboard(50, (8, 6))
+        found = chess.detect_corners_batch(images, cache_dir=cache_dir,
+                                           processes=1)
+        assert found == {"side": {42: True, 0: True}}
+        assert len(os.listdir(cache_dir)) == 1
+
+        corners = chess.image_points["side"][42]
+        assert corners.shape == (48, 1, 2)
+        assert numpy.abs(corners - ref.image_points["side"][42]).max() < 0.01
+
+        # Corners read from the cache, without any detection
+        class NoDetectionPool(object):
+            def imap_unordered(self, func, tasks):
+                raise AssertionError("Corners not cached")
+
+        chess = phm_calib.Chessboard(50, (8, 6))
+        found = chess.detect_corners_batch(images, cache_dir=cache_dir,
+                                           pool=NoDetectionPool())
+        assert found == {"side": {42: True, 0: True}}
+        assert numpy.array_equal(chess.image_points["side"][0], corners)
+    finally:
+        shutil.rmtree(cache_dir)
+
+
 if __name__ == "__main__":
     for func_name in dir():
         if func_name.startswith('test_'):
@@ -11,6 +11,10 @@
 # ==============================================================================
 from __future__ import division, print_function
 
+import concurrent.futures
+import contextlib
+import io
+import cv2
 import numpy
 
 import openalea.phenomenal.image as phm_img
@@ -122,6 +126,187 @@ def test_mean_image_3():
     assert image.shape == (25, 25, 3)
 
 
+
+def test_running_mean_image():
+    random_state = numpy.random.RandomState(0)
+    images = [random_state.randint(0, 256, (25, 20, 3)).astype(numpy.uint8)
+              for _ in range(7)]
+
+    running_mean = phm_img.RunningMeanImage(image for image in images)
+    assert len(running_mean) == 7
+    assert running_mean.shape == (25, 20, 3)
+
+    ref = numpy.mean(numpy.array(images, dtype=float), axis=0)
+    mean = running_mean.mean()
+    assert mean.dtype == numpy.uint8
+    assert numpy.array_equal(mean, numpy.floor(ref + 0.5))
+    assert numpy.allclose(running_mean.mean(dtype=numpy.float32), ref)
+
+    # Remove images
+    running_mean.remove(images[0])
+    running_mean.remove(images[1])
+    ref = numpy.mean(numpy.array(images[2:], dtype=float), axis=0)
+    assert numpy.array_equal(running_mean.mean(), numpy.floor(ref + 0.5))
+
+    # Sliding window
+    running_mean = phm_img.RunningMeanImage(window=3)
+    for i, image in enumerate(images):
+        running_mean.add(image)
+        ref = numpy.mean(numpy.array(images[max(0, i - 2):i + 1],
+                                     dtype=float), axis=0)
+        assert len(running_mean) == min(i + 1, 3)
+        assert numpy.array_equal(running_mean.mean(), numpy.floor(ref + 0.5))
+
+    # Floating images
+    running_mean = phm_img.RunningMeanImage([numpy.ones((25, 25, 3))] +
+                                            [numpy.zeros((25, 25, 3))] * 9)
+    assert numpy.allclose(running_mean.mean(), 0.1)
+
+    try:
+        running_mean.add(numpy.zeros((20, 25, 3)))
+    except Exception as e:
+        assert type(e) == ValueError
+    else:
+        assert False
+
+    try:
+        phm_img.RunningMeanImage().mean()
+    except Exception as e:
+        assert type(e) == ValueError
+    else:
+        assert False
+
+
+def test_side_binarization_kernel():
+    random_state = numpy.random.RandomState(0)
+
+    # All the values of image and mean are compared
+    mean_image = numpy.zeros((256, 256, 3), dtype=numpy.uint8)
+    mean_image[:] = numpy.arange(256, dtype=numpy.uint8)[:, None, None]
+    image = numpy.zeros((256, 256, 3), dtype=numpy.uint8)
+    image[:] = numpy.arange(256, dtype=numpy.uint8)[None, :, None]
+    image[:, :, 1] = numpy.roll(image[:, :, 1], 7, axis=1)
+
+    float_mean_image = mean_image * random_state.uniform(0.5, 1.5,
+                                                         mean_image.shape)
+
+    # Any mask value (threshold_meanshift only keeps the odd ones)
+    mask_hsv = numpy.uint8(random_state.randint(0, 256, (256, 256)))
+    mask_mean_shift = numpy.uint8(random_state.randint(0, 256, (256, 256)))
+
+    for mean in [mean_image, float_mean_image]:
+        for threshold in [0.0, 0.3, 0.77, 1.0]:
+            for dark_background in [False, True]:
+                for masks in [(None, None), (mask_mean_shift, mask_hsv)]:
+                    kernel = phm_img.SideBinarizationKernel(
+                        mean, threshold, dark_background,
+                        mask_mean_shift=masks[0],
+                        mask_hsv=masks[1])
+
+                    ref = phm_img.phenoarch_side_binarization(
+                        image, mean, threshold, dark_background,
+                        mask_mean_shift=masks[0],
+                        mask_hsv=masks[1])
+                    assert numpy.array_equal(kernel(image), ref)
+
+                    # Before the median blur
+                    ref = phm_img.threshold_meanshift(
+                        image, mean, threshold, dark_background, masks[0])
+                    assert numpy.array_equal(
+                        255 - cv2.inRange(image, kernel._lower,
+                                          kernel._upper), ref)
+
+    try:
+        kernel(numpy.zeros((25, 25, 3), dtype=numpy.uint8))
+    except Exception as e:
+        assert type(e) == ValueError
+    else:
+        assert False
+
+    # Only 8 bits images are supported
+    try:
+        kernel(numpy.zeros(mean.shape, dtype=numpy.uint16))
+    except Exception as e:
+        assert type(e) == TypeError
+    else:
+        assert False
+
+
+def test_side_binarization_kernel_roi():
+    random_state = numpy.random.RandomState(0)
+    image = random_state.randint(0, 256, (40, 30, 3)).astype(numpy.uint8)
+    mean_image = random_state.randint(0, 256, (40, 30, 3)).astype(numpy.uint8)
+
+    binary = phm_img.SideBinarizationKernel(mean_image)(image)
+    for roi in [(0, 0, 30, 40), (0, 0, 5, 7), (3, 4, 10, 20), (25, 30, 5, 10)]:
+        x, y, width, height = roi
+        kernel = phm_img.SideBinarizationKernel(mean_image, roi=roi)
+        assert numpy.array_equal(kernel(image),
+                                 binary[y:y + height, x:x + width])
+
+    try:
+        phm_img.SideBinarizationKernel(mean_image, roi=(25, 30, 6, 10))
+    except Exception as e:
+        assert type(e) == ValueError
+    else:
+        assert False
+
+
+def test_binary_image_roi():
+    image = numpy.zeros((40, 30), dtype=numpy.uint8)
+    assert phm_img.binary_image_roi(image) is None
+
+    image[5:10, 20:22] = 255
+    assert phm_img.binary_image_roi(image) == (20, 5, 2, 5)
+    assert phm_img.binary_image_roi(image, margin=10) == (10, 0, 20, 20)
+
+
+def test_phenoarch_side_binarization_stream():
+    random_state = numpy.random.RandomState(0)
+    images = [random_state.randint(0, 256, (40, 30, 3)).astype(numpy.uint8)
+              for _ in range(7)]
+    mean_image = phm_img.mean_image(images)
+    mean_image[0, 0] = 0
+    mask_hsv = numpy.uint8(random_state.randint(0, 2, (40, 30)) * 255)
+    mask_mean_shift = numpy.uint8(random_state.randint(0, 2, (40, 30)) * 255)
+
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=2)
+    try:
+        for dark_background in [False, True]:
+            for masks in [(None, None), (mask_mean_shift, mask_hsv)]:
+                result = dict(phm_img.phenoarch_side_binarization_stream(
+                    (image for image in images),
+                    mean_image,
+                    dark_background=dark_background,
+                    mask_mean_shift=masks[0],
+                    mask_hsv=masks[1],
+                    executor=executor))
+
+                assert sorted(result) == list(range(len(images)))
+                for i, image in enumerate(images):
+                    ref = phm_img.phenoarch_side_binarization(
+                        image, mean_image,
+                        dark_background=dark_background,
+                        mask_mean_shift=masks[0],
+                        mask_hsv=masks[1])
+                    assert numpy.array_equal(result[i], ref)
+
+        # Nothing printed by default, the throughput is printed in verbose
+        # mode even if the stream is closed before its end
+        for verbose in [False, True]:
+            output = io.StringIO()
+            with contextlib.redirect_stdout(output):
+                stream = phm_img.phenoarch_side_binarization_stream(
+                    iter(images), mean_image, executor=executor,
+                    verbose=verbose)
+                next(stream)
+                stream.close()
+
+            assert ("images binarized" in output.getvalue()) == verbose
+    finally:
+        executor.shutdown()
+
+
 if __name__ == "__main__":
     for func_name in dir():
         if func_name.startswith('test_'):
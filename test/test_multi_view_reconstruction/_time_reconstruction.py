@@ -0,0 +1,96 @@
+# -*- python -*-
+#
+#       Copyright INRIA - CIRAD - INRA
+#
+#       Distributed under the Cecill-C License.
+#       See accompanying file LICENSE.txt or copy at
+#           http://www.cecill.info/licences/Licence_CeCILL-C_V1-en.html
+#
+#       OpenAlea WebSite : http://openalea.gforge.inria.fr
+#
+# ==============================================================================
+from __future__ import division, print_function
+
+import os
+import time
+import numpy
+
+import openalea.phenomenal.data as phm_data
+import openalea.phenomenal.object as phm_obj
+import openalea.phenomenal.multi_view_reconstruction as phm_mvr
+import openalea.phenomenal.multi_view_reconstruction._c_mvr as c_mvr
+# ==============================================================================
+
+plant_1_dir = os.path.join(os.path.dirname(os.path.realpath(__file__)),
+                           "../data/plant_1")
+
+voxels_size = 4
+bin_images = phm_data.bin_images(plant_1_dir)
+calibrations = phm_data.calibrations(plant_1_dir)
+
+image_views = list()
+for id_camera in bin_images:
+    for angle in bin_images[id_camera]:
+        projection = calibrations[id_camera].get_projection(angle)
+        image_views.append(phm_obj.ImageView(bin_images[id_camera][angle],
+                                             projection,
+                                             inclusive=False))
+
+int_images = list()
+for image_view in image_views:
+    a = numpy.zeros_like(image_view.image, dtype=numpy.uint32)
+    c_mvr.integral_image(image_view.image, a)
+    int_images.append(a)
+
+# ==============================================================================
+
+start = time.time()
+vg = phm_mvr.reconstruction_3d(image_views, voxels_size=voxels_size * 2)
+print("time processing , reconstruction_3d ({} mm) : {}".format(
+    voxels_size * 2, time.time() - start))
+
+voxels = phm_mvr.split_voxels_in_eight(
+    phm_mvr.Voxels(vg.voxels_position, vg.voxels_size))
+print("len(voxels.position) : {}".format(len(voxels.position)))
+
+
+def loop_box_sum(image_int, min_xy_max_xy):
+    # Reference : previous per-voxel loop implementation
+    bb = numpy.zeros(len(min_xy_max_xy), dtype=int)
+    for i, (x_min, y_min, x_max, y_max) in enumerate(min_xy_max_xy):
+        if (image_int[y_max, x_max] + image_int[y_min, x_min] -
+                image_int[y_min, x_max] - image_int[y_max, x_min]) > 0:
+            bb[i] = 1
+    return bb
+
+
+boxes = list()
+for image_view in image_views:
+    height, length = image_view.image.shape
+    bbox = phm_mvr.get_bounding_box_voxel_projected(
+        voxels.position, voxels.size, image_view.projection)
+    bbox = numpy.floor(bbox).astype(int)
+    bbox[:, 0:2] -= 1
+    bbox[:, 0::2] = numpy.clip(bbox[:, 0::2], 0, length - 1)
+    bbox[:, 1::2] = numpy.clip(bbox[:, 1::2], 0, height - 1)
+    boxes.append(bbox)
+
+start = time.time()
+ref = [loop_box_sum(image_int, bbox)
+       for image_int, bbox in zip(int_images, boxes)]
+time_loop = time.time() - start
+print("time processing , loop lookup : {}".format(time_loop))
+
+start = time.time()
+res = [phm_mvr.integral_image_box_sum(image_int, bbox) > 0
+       for image_int, bbox in zip(int_images, boxes)]
+time_vectorized = time.time() - start
+print("time processing , vectorized lookup : {}".format(time_vectorized))
+
+assert all(numpy.array_equal(r > 0, v) for r, v in zip(ref, res))
+print("speedup : {:.1f}x".format(time_loop / max(time_vectorized, 1e-9)))
+
+start = time.time()
+vg = phm_mvr.reconstruction_3d(image_views, voxels_size=voxels_size)
+print("time processing , reconstruction_3d ({} mm) : {}".format(
+    voxels_size, time.time() - start))
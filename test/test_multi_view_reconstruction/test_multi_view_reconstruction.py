@@ -11,12 +11,18 @@
 # ==============================================================================
 from __future__ import division, print_function
 
+import concurrent.futures
+import multiprocessing
 import numpy
 import os
+import cv2
+import scipy.spatial
+import sklearn.neighbors
 
 import openalea.phenomenal.data as phm_data
 import openalea.phenomenal.object as phm_obj
 import openalea.phenomenal.multi_view_reconstruction as phm_mvr
+import openalea.phenomenal.multi_view_reconstruction._c_mvr as c_mvr
 # ==============================================================================
 
 plant_1_dir = os.path.join(os.path.dirname(os.path.realpath(__file__)),
@@ -149,6 +155,141 @@ def test_split_and_projection():
         voxels_size = voxels.size
 
 
+def test_rasterize_boxes():
+    rng = numpy.random.RandomState(0)
+    shape = (60, 80)
+    xy_min = numpy.column_stack((rng.randint(0, 80, 200),
+                                 rng.randint(0, 60, 200)))
+    xy_max = numpy.minimum(xy_min + rng.randint(0, 15, (200, 2)), (79, 59))
+    boxes = numpy.column_stack((xy_min, xy_max))
+
+    ref = numpy.zeros(shape, dtype=numpy.int32)
+    for x_min, y_min, x_max, y_max in boxes:
+        ref[y_min:y_max + 1, x_min:x_max + 1] += 1
+
+    img = phm_mvr.rasterize_boxes(boxes, shape, count=True)
+    assert img.dtype == numpy.int32
+    assert numpy.array_equal(img, ref)
+
+    img = phm_mvr.rasterize_boxes(boxes, shape, value=True, dtype=bool)
+    assert numpy.array_equal(img, ref > 0)
+
+    # Few boxes, the covered pixels are enumerated
+    ref = numpy.zeros(shape, dtype=numpy.int32)
+    for x_min, y_min, x_max, y_max in boxes[:5]:
+        ref[y_min:y_max + 1, x_min:x_max + 1] += 1
+
+    img = phm_mvr.rasterize_boxes(boxes[:5], shape, count=True)
+    assert numpy.array_equal(img, ref)
+
+    img = phm_mvr.rasterize_boxes(boxes[:5], shape, value=255,
+                                  dtype=numpy.uint8)
+    assert numpy.array_equal(img, (ref > 0) * 255)
+
+    img = phm_mvr.rasterize_boxes(boxes[:0], shape)
+    assert img.shape == shape and numpy.count_nonzero(img) == 0
+
+
+def test_project_voxels_position_on_image():
+    calibrations = phm_data.calibrations(plant_1_dir)
+    shape_image = (2454, 2056)
+    rng = numpy.random.RandomState(0)
+    voxels_position = rng.uniform(-400, 400, (300, 3))
+    voxels_size = 8
+
+    image_views = list()
+    for angle in (0, 90, 210):
+        projection = calibrations["side"].get_projection(angle)
+        image_views.append(phm_obj.ImageView(
+            numpy.zeros(shape_image, dtype=numpy.uint8), projection))
+
+        polygons = phm_mvr.get_voxels_silhouette(
+            voxels_position, voxels_size, shape_image, projection)
+
+        # Reference : one scipy convex hull by voxel
+        ref = numpy.zeros(shape_image, dtype=numpy.uint8)
+        corners = projection(phm_mvr.get_voxels_corners(voxels_position,
+                                                         voxels_size))
+        corners = numpy.floor(corners.reshape((-1, 8, 2))).astype(numpy.int32)
+        for points, polygon in zip(corners, polygons):
+            hull = scipy.spatial.ConvexHull(points)
+            assert (set(map(tuple, points[hull.vertices])) ==
+                    set(map(tuple, polygon)))
+            cv2.fillConvexPoly(ref, points[hull.vertices], 255)
+
+        img = phm_mvr.project_voxels_position_on_image(
+            voxels_position, voxels_size, shape_image, projection)
+        assert numpy.array_equal(img, ref)
+
+    # Voxels projected on a single pixel or a segment (degenerated hulls)
+    polygons = phm_mvr.get_voxels_silhouette(
+        voxels_position, 0.01, shape_image, projection)
+    corners = projection(phm_mvr.get_voxels_corners(voxels_position, 0.01))
+    corners = numpy.floor(corners.reshape((-1, 8, 2))).astype(numpy.int32)
+    for points, polygon in zip(corners, polygons):
+        assert set(map(tuple, polygon)) <= set(map(tuple, points))
+        if len(set(map(tuple, points))) == 1:
+            assert len(set(map(tuple, polygon))) == 1
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=2) as executor:
+        images = phm_mvr.project_voxels_position_on_image_views(
+            voxels_position, voxels_size, image_views, executor=executor)
+
+    assert len(images) == len(image_views)
+    for image_view, img in zip(image_views, images):
+        assert numpy.array_equal(img, phm_mvr.project_voxels_position_on_image(
+            voxels_position, voxels_size, shape_image, image_view.projection))
+
+
+# ==============================================================================
+
+
+def test_integral_image_box_sum():
+
+    numpy.random.seed(0)
+    img = (numpy.random.rand(50, 60) > 0.9).astype(numpy.uint8)
+    image_int = numpy.zeros_like(img, dtype=numpy.uint32)
+    c_mvr.integral_image(img, image_int)
+
+    boxes = numpy.column_stack((numpy.random.randint(0, 30, 100),
+                                numpy.random.randint(0, 25, 100),
+                                numpy.random.randint(30, 60, 100),
+                                numpy.random.randint(25, 50, 100)))
+
+    res = phm_mvr.integral_image_box_sum(image_int, boxes)
+
+    for (x_min, y_min, x_max, y_max), r in zip(boxes, res):
+        ref = numpy.count_nonzero(
+            img[y_min + 1:y_max + 1, x_min + 1:x_max + 1])
+        assert r == ref
+
+
+def test_voxels_is_visible_in_image():
+
+    bin_images = phm_data.bin_images(plant_1_dir)
+    calibrations = phm_data.calibrations(plant_1_dir)
+
+    image = bin_images["side"][0]
+    projection = calibrations["side"].get_projection(0)
+
+    voxels_size = 16
+    voxels_position = phm_data.build_cube(cube_size=20,
+                                          voxels_size=voxels_size,
+                                          voxels_position=(0, 0, 500))
+
+    image_int = numpy.zeros_like(image, dtype=numpy.uint32)
+    c_mvr.integral_image(image, image_int)
+
+    res = phm_mvr.voxels_is_visible_in_image(
+        voxels_position, voxels_size, image, projection, False,
+        image_int=image_int)
+    res_no_int = phm_mvr.voxels_is_visible_in_image(
+        voxels_position, voxels_size, image, projection, False)
+
+    assert numpy.array_equal(res, res_no_int)
+    assert 0 < numpy.count_nonzero(res) < len(voxels_position)
+
+
 # ==============================================================================
 
 
@@ -246,6 +387,265 @@ def test_reconstruction_3d_3():
     assert len(vg.voxels_position) > 0
 
 
+def test_reconstruction_3d_executor():
+    voxels_size = 20
+    error_tolerance = 1
+
+    image_views = get_image_views_cube_projected(with_ref=False)
+
+    vg = phm_mvr.reconstruction_3d(image_views,
+                                   voxels_size=voxels_size,
+                                   error_tolerance=error_tolerance)
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=4) as executor:
+        vg_executor = phm_mvr.reconstruction_3d(
+            image_views,
+            voxels_size=voxels_size,
+            error_tolerance=error_tolerance,
+            executor=executor)
+
+    assert vg.voxels_size == vg_executor.voxels_size
+    assert (set(map(tuple, vg.voxels_position)) ==
+            set(map(tuple, vg_executor.voxels_position)))
+
+
+def test_reconstruction_3d_process_executor():
+    voxels_size = 20
+    error_tolerance = 1
+
+    image_views = get_image_views_cube_projected(with_ref=False)
+
+    vg = phm_mvr.reconstruction_3d(image_views,
+                                   voxels_size=voxels_size,
+                                   error_tolerance=error_tolerance)
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=2) as executor:
+        vg_executor = phm_mvr.reconstruction_3d(
+            image_views,
+            voxels_size=voxels_size,
+            error_tolerance=error_tolerance,
+            executor=executor)
+
+        # Without the integral images, the images are only shared
+        voxels_position = phm_data.build_cube(cube_size=10,
+                                              voxels_size=40,
+                                              voxels_position=(0, 0, 0))
+        nb_rejected = numpy.zeros(len(image_views), dtype=int)
+        stage = phm_mvr.kept_visible_voxel(voxels_position, 40, image_views,
+                                           executor=executor,
+                                           nb_rejected=nb_rejected)
+
+    assert vg.voxels_size == vg_executor.voxels_size
+    assert (set(map(tuple, vg.voxels_position)) ==
+            set(map(tuple, vg_executor.voxels_position)))
+
+    ref_rejected = numpy.zeros(len(image_views), dtype=int)
+    with concurrent.futures.ThreadPoolExecutor(max_workers=2) as executor:
+        ref = phm_mvr.kept_visible_voxel(voxels_position, 40, image_views,
+                                         executor=executor,
+                                         nb_rejected=ref_rejected)
+
+    assert numpy.array_equal(ref.consistent.position,
+                             stage.consistent.position)
+    assert numpy.array_equal(ref_rejected, nb_rejected)
+
+
+def test_kept_visible_voxel_views_order():
+    image_views = get_image_views_cube_projected(with_ref=False)
+
+    voxels_size = 40
+    voxels_position = phm_data.build_cube(cube_size=10,
+                                          voxels_size=voxels_size,
+                                          voxels_position=(0, 0, 0))
+
+    nb_views = len(image_views)
+    for error_tolerance in [0, 1]:
+        ref = phm_mvr.kept_visible_voxel(voxels_position, voxels_size,
+                                         image_views,
+                                         error_tolerance=error_tolerance)
+
+        nb_tested = numpy.zeros(nb_views, dtype=int)
+        nb_rejected = numpy.zeros(nb_views, dtype=int)
+        views_order = list(range(nb_views))[::-1]
+        stage = phm_mvr.kept_visible_voxel(voxels_position, voxels_size,
+                                           image_views,
+                                           error_tolerance=error_tolerance,
+                                           views_order=views_order,
+                                           nb_tested=nb_tested,
+                                           nb_rejected=nb_rejected)
+
+        assert numpy.array_equal(ref.consistent.position,
+                                 stage.consistent.position)
+        assert (set(map(tuple, ref.inconsistent.position)) ==
+                set(map(tuple, stage.inconsistent.position)))
+
+        assert nb_tested[views_order[0]] == len(voxels_position)
+        assert numpy.all(nb_tested[views_order[1:]] <=
+                         nb_tested[views_order[:-1]])
+        assert numpy.all(nb_rejected <= nb_tested)
+
+        # All the voxels are tested on all the views
+        with concurrent.futures.ThreadPoolExecutor(max_workers=2) as executor:
+            nb_tested_executor = numpy.zeros(nb_views, dtype=int)
+            nb_rejected_executor = numpy.zeros(nb_views, dtype=int)
+            phm_mvr.kept_visible_voxel(voxels_position, voxels_size,
+                                       image_views,
+                                       error_tolerance=error_tolerance,
+                                       executor=executor,
+                                       nb_tested=nb_tested_executor,
+                                       nb_rejected=nb_rejected_executor)
+
+        assert numpy.all(nb_tested_executor == len(voxels_position))
+        assert nb_rejected_executor[views_order[0]] == nb_rejected[
+            views_order[0]]
+
+
+def test_reconstruction_3d_adaptive_order():
+    image_views = get_image_views_cube_projected(with_ref=False)
+
+    counters = list()
+    vg = phm_mvr.reconstruction_3d(image_views, voxels_size=20,
+                                   counters=counters)
+    counters_adaptive = list()
+    vg_adaptive = phm_mvr.reconstruction_3d(image_views, voxels_size=20,
+                                            adaptive_order=True,
+                                            counters=counters_adaptive)
+
+    assert numpy.array_equal(vg.voxels_position, vg_adaptive.voxels_position)
+    assert len(counters) == len(counters_adaptive) > 0
+    for (size, nb_tested, nb_rejected), (size_adaptive, _, _) in zip(
+            counters, counters_adaptive):
+        assert size == size_adaptive
+        assert len(nb_tested) == len(nb_rejected) == len(image_views)
+
+
+def test_create_and_check_groups():
+    image_views = get_image_views_cube_projected(with_ref=True)
+
+    voxels_size = 20
+    inconsistent = phm_mvr.Voxels(
+        phm_data.build_cube(cube_size=12, voxels_size=voxels_size,
+                            voxels_position=(0, 0, 0)),
+        voxels_size)
+
+    # Missing pixels : a band of the reference image
+    iv = image_views[3]
+    iv.il = iv.image_ref.copy()
+    iv.il[:1100] = 0
+    iv.yy, iv.xx = numpy.where(iv.il > 0)
+
+    groups = phm_mvr.create_groups(image_views, inconsistent)
+    assert len(groups) > 0
+
+    height, length = iv.image.shape
+    bbox = phm_mvr.get_bounding_box_voxel_projected(
+        inconsistent.position, inconsistent.size, iv.projection)
+    bbox = numpy.clip(numpy.floor(bbox).astype(int), 0,
+                      [length - 1, height - 1, length - 1, height - 1])
+
+    for (group_id, y, x), index in groups.items():
+        assert group_id == 3
+        assert iv.il[y, x] > 0
+        ref = numpy.flatnonzero((bbox[:, 0] <= x) & (x <= bbox[:, 2]) &
+                                (bbox[:, 1] <= y) & (y <= bbox[:, 3]))
+        assert list(index) == ref.tolist()
+
+    neigh = sklearn.neighbors.NearestNeighbors(n_neighbors=1)
+    neigh.fit(numpy.array([[0, 0, 0]]))
+    distance = neigh.kneighbors(inconsistent.position)[0][:, 0]
+
+    voxels = phm_mvr.check_groups(neigh, inconsistent, groups, 1)
+    ref = set()
+    for index in groups.values():
+        ref.add(tuple(inconsistent.position[
+            min(index, key=lambda i: (distance[i], i))]))
+    assert set(map(tuple, voxels.position)) == ref
+
+    voxels = phm_mvr.check_groups(neigh, inconsistent, groups, 100000)
+    ref = numpy.unique(numpy.concatenate(list(groups.values())))
+    assert len(voxels.position) == len(ref)
+
+
+def test_crop_image_views():
+
+    bin_images = phm_data.bin_images(plant_1_dir)
+    calibrations = phm_data.calibrations(plant_1_dir)
+
+    image = bin_images["side"][0]
+    projection = calibrations["side"].get_projection(0)
+
+    # Voxels projected out of the image
+    voxels_size = 64
+    voxels_position = phm_data.build_cube(cube_size=30,
+                                          voxels_size=voxels_size,
+                                          voxels_position=(0, 0, 500))
+
+    for inclusive in [False, True]:
+        image_view = phm_obj.ImageView(image, projection, inclusive=inclusive)
+        cropped_image_view = phm_mvr.crop_image_views([image_view])[0]
+
+        assert cropped_image_view.image.size < image.size / 4
+        assert (numpy.count_nonzero(cropped_image_view.image) ==
+                numpy.count_nonzero(image))
+
+        res = phm_mvr.voxels_is_visible_in_image(
+            voxels_position, voxels_size, image, projection, inclusive)
+        res_crop = phm_mvr.voxels_is_visible_in_image(
+            voxels_position, voxels_size,
+            cropped_image_view.image,
+            cropped_image_view.projection,
+            inclusive,
+            frame=cropped_image_view.frame)
+
+        assert numpy.array_equal(res, res_crop)
+
+
+def test_reconstruction_3d_roi():
+
+    for with_ref in [False, True]:
+        image_views = get_image_views_cube_projected(with_ref=with_ref)
+
+        vg = phm_mvr.reconstruction_3d(image_views, voxels_size=20)
+        vg_roi = phm_mvr.reconstruction_3d(image_views, voxels_size=20,
+                                           roi=True)
+
+        assert (set(map(tuple, vg.voxels_position)) ==
+                set(map(tuple, vg_roi.voxels_position)))
+
+
+def test_reconstruction_3d_batch():
+    voxels_size = 40
+
+    list_image_views = [get_image_views_cube_projected(with_ref=False),
+                        get_image_views_cube_projected(with_ref=False)[::2]]
+
+    refs = [phm_mvr.reconstruction_3d(image_views, voxels_size=voxels_size)
+            for image_views in list_image_views]
+
+    stats = dict()
+    pool = multiprocessing.Pool(processes=2)
+    try:
+        results = dict(phm_mvr.reconstruction_3d_batch(
+            list_image_views, pool=pool, stats=stats,
+            voxels_size=voxels_size))
+
+        # Statistics of the plants reconstructed before the stream is closed
+        stream = phm_mvr.reconstruction_3d_batch(
+            list_image_views, pool=pool, stats=stats,
+            voxels_size=voxels_size)
+        next(stream)
+        stream.close()
+        assert stats['nb_plants'] == 1
+    finally:
+        pool.close()
+        pool.join()
+
+    assert sorted(results.keys()) == [0, 1]
+    for i, ref in enumerate(refs):
+        assert numpy.array_equal(ref.voxels_position,
+                                 results[i].voxels_position)
+
+
 if __name__ == "__main__":
 
     for func_name in dir():
@@ -12,8 +12,12 @@
 from __future__ import division, print_function
 
 import os
+import numpy
 
 import openalea.phenomenal.object as phm_obj
+import openalea.phenomenal.multi_view_reconstruction as phm_mvr
+
+from test_multi_view_reconstruction import get_image_views_cube_projected
 # ==============================================================================
 
 
@@ -94,6 +98,225 @@ def test_octree_4():
     print(octree.root.sons[0])
 
 
+def _nodes_set(octree):
+    return set(octree.root.get_nodes(
+        func_get=lambda n: (tuple(n.position), n.size, n.data, n.is_leaf)))
+
+
+def test_linear_octree():
+    octree = phm_obj.VoxelOctree.from_position((0, 0, 0), 32, True)
+    octree.root.creates_sons()
+    octree.root.sons[0].creates_sons()
+    octree.root.sons[7].creates_sons()
+    octree.root.sons[0].sons[3].data = False
+    octree.root.sons[5].data = False
+
+    linear = phm_obj.VoxelLinearOctree.from_voxel_octree(octree)
+    assert len(linear) == 1 + 8 + 16
+
+    leafs = linear.get_leafs()
+    assert (set(zip(map(tuple, linear.nodes_position(leafs)),
+                    linear.nodes_size(leafs))) ==
+            set((leaf.position, leaf.size) for leaf in octree.get_leafs()))
+    assert (len(linear.get_leafs_with_data_equal_to(False)) ==
+            len(octree.get_leafs_with_data_equal_to(False)))
+
+    assert _nodes_set(linear.to_voxel_octree()) == _nodes_set(octree)
+
+    for voxels_size in (4, 8, 16):
+        assert (set(map(tuple, linear.get_voxels_position(voxels_size))) ==
+                set(octree.get_voxels_position(voxels_size)))
+        assert (set(map(tuple, linear.get_voxel_point_cloud(
+                voxels_size).voxels_position)) ==
+                set(map(tuple, octree.get_voxel_point_cloud(
+                    voxels_size).voxels_position)))
+
+    # Neighbors of same size in the order of get_neighbors_positions
+    node = octree.root.sons[7].sons[0]
+    index = linear.find_nodes(
+        linear.nodes_indices(leafs), linear.levels[leafs])
+    assert numpy.array_equal(index, leafs)
+
+    index = [i for i in leafs
+             if tuple(linear.nodes_position([i])[0]) == node.position]
+    neighbors = linear.get_neighbors(index)[0]
+    positions = node.get_neighbors_positions()
+    for i, position in zip(neighbors, positions):
+        if i >= 0:
+            assert tuple(linear.nodes_position([i])[0]) == position
+    # The 7 other sons of sons[7], and the corner son of sons[0]
+    assert numpy.count_nonzero(neighbors >= 0) == 8
+
+
+def test_linear_octree_read_write():
+    linear = phm_obj.VoxelLinearOctree.from_position((10, -20, 30), 64, True)
+    sons = linear.creates_sons([0])
+    linear.data[sons[:3]] = False
+    linear.creates_sons(sons[3:5])
+
+    for filename in ("test.npz", "test.json"):
+        linear.write(filename)
+        read = phm_obj.VoxelLinearOctree.read(filename)
+        os.remove(filename)
+
+        assert read.position == linear.position
+        assert read.size == linear.size
+        assert numpy.array_equal(read.codes, linear.codes)
+        assert numpy.array_equal(read.levels, linear.levels)
+        assert numpy.array_equal(read.data, linear.data)
+
+
+def test_reconstruction_3d_octree():
+    voxels_size = 16
+    image_views = get_image_views_cube_projected(with_ref=False)
+
+    vg = phm_mvr.reconstruction_3d(image_views, voxels_size=voxels_size)
+
+    linear = phm_mvr.reconstruction_3d_octree(
+        image_views, voxels_size=voxels_size, linear=True)
+    assert (set(map(tuple, linear.get_voxel_point_cloud(
+        voxels_size).voxels_position)) ==
+            set(map(tuple, vg.voxels_position)))
+
+    octree = phm_mvr.reconstruction_3d_octree(
+        image_views, voxels_size=voxels_size)
+    assert _nodes_set(octree) == _nodes_set(linear.to_voxel_octree())
+
+
+
+def test_reconstruction_3d_octree_empty_image():
+    image_views = get_image_views_cube_projected(with_ref=False)
+    image_views[0].image = numpy.zeros((100, 100), dtype=numpy.uint8)
+
+    linear = phm_mvr.reconstruction_3d_octree(
+        image_views, voxels_size=16, linear=True)
+    assert len(linear.get_leafs_with_data_equal_to(True)) == 0
+    assert len(linear.get_voxel_point_cloud(16).voxels_position) == 0
+
+    octree = phm_mvr.reconstruction_3d_octree(image_views, voxels_size=16)
+    assert len(octree.get_leafs_with_data_equal_to(True)) == 0
+
+
+def test_octree_is_surrender():
+    voxels_size = 16
+    image_views = get_image_views_cube_projected(with_ref=False)
+
+    linear = phm_mvr.reconstruction_3d_octree(
+        image_views, voxels_size=voxels_size, linear=True)
+    leafs = linear.get_leafs_with_data_equal_to(True)
+    surrounded = linear.is_surrender(leafs)
+
+    # Reference : the 26 neighbors of the voxel are in the voxel grid
+    positions = linear.nodes_position(leafs)
+    voxels = set(map(tuple, positions))
+    offsets = [(dx, dy, dz)
+               for dx in (-1, 0, 1) for dy in (-1, 0, 1) for dz in (-1, 0, 1)
+               if (dx, dy, dz) != (0, 0, 0)]
+    for position, is_surrender in zip(positions, surrounded):
+        assert is_surrender == all(
+            tuple(position + numpy.array(offset) * voxels_size) in voxels
+            for offset in offsets)
+    assert 0 < numpy.count_nonzero(surrounded) < len(leafs)
+
+    neighbors = linear.get_neighbors_leaf(leafs)
+    assert numpy.all(neighbors >= 0)
+    assert numpy.all(linear.data[neighbors] | ~surrounded[:, None])
+
+    octree = linear.to_voxel_octree()
+    leaf_nodes = octree.get_leafs_with_data_equal_to(True)
+    kept = phm_mvr.remove_surrounded(leaf_nodes)
+    assert (set(leaf.position for leaf in kept) ==
+            set(map(tuple, positions[~surrounded])))
+
+    images_projections = [(iv.image, iv.projection) for iv in image_views]
+    kept = phm_mvr.remove_surrounded_fully_visible(leaf_nodes,
+                                                   images_projections)
+    kept = set(leaf.position for leaf in kept)
+    assert set(map(tuple, positions[~surrounded])) <= kept
+
+    # Reference : all the pixels of the bounding boxes are positive
+    for position, is_surrender in zip(positions, surrounded):
+        if not is_surrender:
+            continue
+        fully_visible = True
+        for image, projection in images_projections:
+            x_min, y_min, x_max, y_max = (
+                phm_mvr.get_bounding_box_voxel_projected(
+                    position[None], voxels_size, projection)[0])
+            x_min, y_min = int(numpy.floor(x_min)), int(numpy.floor(y_min))
+            x_max, y_max = int(numpy.ceil(x_max)), int(numpy.ceil(y_max))
+            fully_visible &= bool(numpy.all(
+                image[y_min:y_max + 1, x_min:x_max + 1] > 0))
+        assert (tuple(position) in kept) == (not fully_visible)
+
+
+def test_voxel_node_is_surrender():
+    image_views = get_image_views_cube_projected(with_ref=False)
+
+    linear = phm_mvr.reconstruction_3d_octree(
+        image_views, voxels_size=16, linear=True)
+    leafs = linear.get_leafs_with_data_equal_to(True)
+    surrounded = linear.is_surrender(leafs)
+    neighbors = linear.get_neighbors_leaf(leafs)
+
+    octree = linear.to_voxel_octree()
+    root = octree.root
+    sample = numpy.concatenate((numpy.flatnonzero(surrounded)[:3],
+                                numpy.flatnonzero(~surrounded)[:3]))
+    for i in sample:
+        node = root.get_with_position(tuple(linear.nodes_position(
+            leafs[i:i + 1])[0]))
+        assert node.is_leaf and node.size == 16
+
+        assert node.is_surrender() == surrounded[i]
+        assert ([(n.position, n.size) for n in node.get_neighbors_leaf()] ==
+                [(tuple(p), s) for p, s in zip(
+                    linear.nodes_position(neighbors[i]),
+                    linear.nodes_size(neighbors[i]))])
+
+
+def test_voxel_is_visible_in_image():
+    image_views = get_image_views_cube_projected(with_ref=False)
+
+    random_state = numpy.random.RandomState(0)
+    voxels_position = random_state.uniform(-200, 200, (20, 3))
+
+    for image_view in image_views[:2]:
+        visible = phm_mvr.voxels_is_visible_in_image(
+            voxels_position, 16, image_view.image, image_view.projection,
+            image_view.inclusive)
+        assert 0 < numpy.count_nonzero(visible) < len(voxels_position)
+
+        for position, is_visible in zip(voxels_position, visible):
+            assert bool(is_visible) == phm_mvr.voxel_is_visible_in_image(
+                position, 16, image_view.image, image_view.projection,
+                image_view.inclusive)
+
+
+def test_voxels_is_fully_visible_in_image():
+    image_views = get_image_views_cube_projected(with_ref=False)
+
+    random_state = numpy.random.RandomState(0)
+    voxels_position = random_state.uniform(-300, 300, (200, 3))
+
+    for image_view in image_views:
+        image, projection = image_view.image, image_view.projection
+        image_int = phm_mvr.fully_visible_integral_image(image)
+
+        fully_visible = phm_mvr.voxels_is_fully_visible_in_image(
+            voxels_position, 16, image, projection)
+        assert numpy.array_equal(
+            fully_visible,
+            phm_mvr.voxels_is_fully_visible_in_image(
+                voxels_position, 16, image, projection, image_int=image_int))
+        assert 0 < numpy.count_nonzero(fully_visible) < len(voxels_position)
+
+        for position, is_fully_visible in zip(voxels_position, fully_visible):
+            assert is_fully_visible == phm_mvr.voxel_is_fully_visible_in_image(
+                position, 16, image, projection)
+
+
+
 if __name__ == "__main__":
     for func_name in dir():
         if func_name.startswith('test_'):
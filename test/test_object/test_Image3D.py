@@ -11,10 +11,45 @@
 # ==============================================================================
 from __future__ import division, print_function
 
+import os
+import numpy
+
 import openalea.phenomenal.data as phm_data
+import openalea.phenomenal.object as phm_obj
 # ==============================================================================
 
-# NOTHING
+
+def test_chunked_npz():
+
+    image = numpy.zeros((40, 30, 20), dtype=numpy.uint8)
+    image[2:5, 3:6, 1:4] = 1
+    image[35:40, 25:30, 15:20] = 1
+    image_3d = phm_obj.Image3D(image,
+                               voxels_size=4,
+                               world_coordinate=(-10, 0, 5))
+
+    filename = 'test_chunked.npz'
+    image_3d.write_to_chunked_npz(filename, chunk_shape=(16, 16, 16))
+
+    with phm_obj.Image3D.open_chunked_npz(filename) as chunked_image_3d:
+        assert chunked_image_3d.shape == (40, 30, 20)
+        assert chunked_image_3d.chunks == [(0, 0, 0), (2, 1, 0), (2, 1, 1)]
+        assert len(list(chunked_image_3d.iter_chunks())) == 3
+
+        assert numpy.array_equal(chunked_image_3d.to_image_3d(), image)
+        assert not chunked_image_3d.read_chunk((1, 1, 0)).any()
+
+        roi = chunked_image_3d.read_roi((3, 4, 2), (38, 28, 18))
+        assert numpy.array_equal(roi, image[3:38, 4:28, 2:18])
+        assert roi.voxels_size == 4
+        assert roi.world_coordinate == (2, 16, 13)
+
+    vg = phm_obj.VoxelGrid.read_from_chunked_npz(filename)
+    os.remove(filename)
+
+    ref = phm_obj.VoxelGrid.from_image_3d(image_3d)
+    assert (set(map(tuple, vg.voxels_position)) ==
+            set(map(tuple, ref.voxels_position)))
 
 # ==============================================================================
 
@@ -33,6 +33,58 @@ def test_read_write():
     assert (src_vg.voxels_position == dist_vg.voxels_position).all()
 
 
+def test_compact():
+
+    voxels_size = 16
+    voxels_position = numpy.array(list(numpy.ndindex((10, 15, 5)))) * 16
+    voxels_position = voxels_position + numpy.array([-40, 8, 200])
+    src_vg = phm_obj.VoxelGrid(voxels_position, voxels_size)
+
+    compact_vg = src_vg.to_compact()
+
+    assert compact_vg.is_compact()
+    assert compact_vg.voxels_indices.dtype == numpy.int16
+    assert compact_vg.world_coordinate == (-40.0, 8.0, 200.0)
+    assert len(compact_vg) == len(src_vg)
+    assert compact_vg.volume() == src_vg.volume()
+    assert compact_vg.bounding_box() == src_vg.bounding_box()
+    assert numpy.array_equal(compact_vg.voxels_position, voxels_position)
+    assert numpy.array_equal(compact_vg.to_image_3d(), src_vg.to_image_3d())
+
+    filename = 'test.npz'
+    src_vg.write_to_npz(filename)
+    dist_vg = phm_obj.VoxelGrid.read_from_npz(filename, compact=True)
+    os.remove(filename)
+
+    assert dist_vg.is_compact()
+    assert numpy.array_equal(dist_vg.voxels_position, voxels_position)
+
+    # The decoded positions are not a view of the grid
+    try:
+        dist_vg.voxels_position[0] = (0, 0, 0)
+    except ValueError:
+        pass
+    else:
+        assert False
+    assert numpy.array_equal(dist_vg.voxels_position, voxels_position)
+
+    dist_vg.voxels_position = voxels_position[:10]
+    assert not dist_vg.is_compact()
+    assert len(dist_vg) == 10
+
+
+def test_compact_set_voxels_size():
+
+    voxels_position = numpy.array([[10, 10, 10], [14, 10, 10]])
+    compact_vg = phm_obj.VoxelGrid(voxels_position, 4).to_compact()
+
+    compact_vg.voxels_size = 8
+
+    assert not compact_vg.is_compact()
+    assert compact_vg.voxels_size == 8
+    assert numpy.array_equal(compact_vg.voxels_position, voxels_position)
+
+
 if __name__ == "__main__":
     for func_name in dir():
         if func_name.startswith('test_'):
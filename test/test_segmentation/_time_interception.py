@@ -0,0 +1,67 @@
+# -*- python -*-
+#
+#       Copyright INRIA - CIRAD - INRA
+#
+#       Distributed under the Cecill-C License.
+#       See accompanying file LICENSE.txt or copy at
+#           http://www.cecill.info/licences/Licence_CeCILL-C_V1-en.html
+#
+#       OpenAlea WebSite : http://openalea.gforge.inria.fr
+#
+# ==============================================================================
+from __future__ import division, print_function
+
+import os
+import time
+import numpy
+import scipy.spatial
+
+import openalea.phenomenal.data as phm_data
+import openalea.phenomenal.segmentation as phm_seg
+# ==============================================================================
+
+data_dir = os.path.join(os.path.dirname(os.path.realpath(__file__)),
+                        "../data/")
+
+for voxels_size in [32, 16]:
+    voxel_grid = phm_data.voxel_grid(data_dir, 1, voxels_size)
+    graph = phm_seg.graph_from_voxel_grid(voxel_grid)
+    points = numpy.array(graph.nodes())
+    all_path = phm_seg.compute_all_shorted_path(graph, voxels_size)
+    polyline = max(all_path.values(), key=len)
+
+    print("voxels_size : {}, len(points) : {}, len(polyline) : {}".format(
+        voxels_size, len(points), len(polyline)))
+
+    planes = list()
+    for i in range(len(polyline)):
+        orientation_vector = phm_seg.orientation_vector_of_point_in_polyline(
+            polyline, i, 8)
+        planes.append(phm_seg.compute_plane_equation(orientation_vector,
+                                                     polyline[i]))
+
+    start = time.time()
+    ref = [phm_seg.intercept_points_from_src_point_with_plane_equation(
+        points, point, plane, voxels_size * 2, 150)
+        for point, plane in zip(polyline, planes)]
+    time_scan = time.time() - start
+    print("time processing , plane interception full scan : {}".format(
+        time_scan))
+
+    start = time.time()
+    points_tree = scipy.spatial.cKDTree(points)
+    res = [phm_seg.intercept_points_from_src_point_with_plane_equation(
+        points, point, plane, voxels_size * 2, 150, points_tree=points_tree)
+        for point, plane in zip(polyline, planes)]
+    time_tree = time.time() - start
+    print("time processing , plane interception kd-tree : {}".format(
+        time_tree))
+
+    assert all(numpy.array_equal(r, v) for r, v in zip(ref, res))
+    print("speedup : {:.1f}x".format(time_scan / max(time_tree, 1e-9)))
+
+    for mode in ["plane", "ball"]:
+        start = time.time()
+        phm_seg.skeletonize(voxel_grid, graph, mode=mode)
+        print("time processing , skeletonize ({}) : {}".format(
+            mode, time.time() - start))
@@ -70,6 +70,61 @@ def test_graph_1():
     assert l == ll
 
 
+def test_create_graph_neighbors():
+
+    voxel_grid = phm_data.random_voxel_grid(voxels_size=16)
+    voxels_position = list(map(tuple, voxel_grid.voxels_position))
+    voxels_size = voxel_grid.voxels_size
+
+    graph = phm_seg.create_graph(voxels_position, voxels_size)
+
+    nodes = set(voxels_position)
+    edges = set()
+    for x, y, z in voxels_position:
+        for dx, dy, dz in numpy.ndindex((3, 3, 3)):
+            pos = (x + (dx - 1) * voxels_size,
+                   y + (dy - 1) * voxels_size,
+                   z + (dz - 1) * voxels_size)
+            if pos != (x, y, z) and pos in nodes:
+                edges.add(frozenset(((x, y, z), pos)))
+
+    assert graph.number_of_nodes() == len(voxels_position)
+    assert set(map(frozenset, graph.edges())) == edges
+
+    for u, v, w in graph.edges(data="weight"):
+        assert numpy.isclose(w, numpy.linalg.norm(numpy.subtract(u, v)))
+
+    adjacency = phm_seg.create_adjacency_matrix(voxel_grid.voxels_position,
+                                                voxels_size)
+    ref = networkx.to_scipy_sparse_array(graph, nodelist=voxels_position)
+
+    assert adjacency.shape == (len(voxels_position), len(voxels_position))
+    assert numpy.allclose(adjacency.toarray(), ref.toarray())
+
+
+def test_adjacency_matrix_from_graph():
+
+    # Second voxel grid : 3 connected components, connected by 2 edges
+    # which are not 26-neighbors
+    for voxel_grid, nb_other_edges in [
+            (phm_data.random_voxel_grid(voxels_size=16), 0),
+            (phm_obj.VoxelGrid([(0, 0, 0), (0, 0, 1), (0, 1, 0), (1, 1, 1),
+                                (5, 5, 5), (5, 6, 5), (9, 5, 5)], 1), 2)]:
+        graph = phm_seg.graph_from_voxel_grid(voxel_grid)
+        nodes, adjacency = phm_seg.adjacency_matrix_from_graph(
+            graph, voxel_grid.voxels_size)
+
+        neighbors = phm_seg.create_adjacency_matrix(
+            numpy.array(nodes), voxel_grid.voxels_size)
+        assert (graph.number_of_edges() - neighbors.nnz // 2 ==
+                nb_other_edges)
+
+        ref = networkx.to_scipy_sparse_array(graph, nodelist=nodes)
+        assert nodes == list(graph.nodes())
+        assert adjacency.nnz == ref.nnz
+        assert numpy.allclose(adjacency.toarray(), ref.toarray())
+
+
 if __name__ == "__main__":
     for func_name in dir():
         if func_name.startswith('test_'):
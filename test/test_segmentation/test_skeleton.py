@@ -12,9 +12,13 @@
 from __future__ import division, print_function
 
 import os
+import networkx
+import numpy
+import scipy.spatial
 
 import openalea.phenomenal.data as phm_data
 import openalea.phenomenal.segmentation as phm_seg
+import openalea.phenomenal.segmentation.skeleton_phenomenal as phm_skel
 # ==============================================================================
 
 data_dir = os.path.join(os.path.dirname(os.path.realpath(__file__)),
@@ -50,6 +54,129 @@ def test_running():
         nb_min_pixel=100)
 
 
+def test_compute_all_shorted_path_scipy():
+
+    voxel_grid = phm_data.voxel_grid(data_dir, 1, 32)
+    graph = phm_seg.graph_from_voxel_grid(voxel_grid)
+
+    ref = phm_seg.compute_all_shorted_path(graph, voxel_grid.voxels_size)
+    tree = phm_seg.compute_all_shorted_path(graph, voxel_grid.voxels_size,
+                                            backend="scipy")
+
+    assert len(tree) == len(ref)
+    for node, ref_path in ref.items():
+        path = tree[node]
+        assert len(path) == tree.lengths[tree.index[node]]
+        assert path[0] == ref_path[0] and path[-1] == node
+
+        length = sum(graph[u][v]["weight"] for u, v in zip(path, path[1:]))
+        ref_length = sum(graph[u][v]["weight"]
+                         for u, v in zip(ref_path, ref_path[1:]))
+        assert numpy.isclose(length, ref_length)
+        assert numpy.isclose(length, tree.distances[tree.index[node]])
+
+    # Same distances, and each predecessor is one of the predecessors of the
+    # node on its shortest paths
+    source = tree.source
+    ref_predecessors, ref_distances = (
+        networkx.dijkstra_predecessor_and_distance(graph, source))
+    for node, i in tree.index.items():
+        assert numpy.isclose(tree.distances[i], ref_distances[node])
+        if node == source:
+            assert tree.predecessors[i] < 0
+        else:
+            assert tree.nodes[tree.predecessors[i]] in ref_predecessors[node]
+
+    voxel_skeleton = phm_seg.skeletonize(voxel_grid, graph, backend="scipy")
+    assert len(voxel_skeleton.segments) > 0
+
+
+def test_skeletonize_same_segments():
+
+    voxel_grid = phm_data.voxel_grid(data_dir, 1, 32)
+    graph = phm_seg.graph_from_voxel_grid(voxel_grid)
+    voxels_size = voxel_grid.voxels_size
+    array_voxels = numpy.array(graph.nodes())
+    points_tree = scipy.spatial.cKDTree(array_voxels)
+
+    for backend in ["networkx", "scipy"]:
+        voxel_skeleton = phm_seg.skeletonize(voxel_grid, graph,
+                                             backend=backend)
+
+        # Reference : search the longest path and the difference over all the
+        # remaining voxels at each step, kept in the graph order
+        paths = phm_seg.compute_all_shorted_path(graph, voxels_size,
+                                                 backend=backend)
+        remain = list(graph.nodes())
+        segments = list()
+        while len(remain) != 0:
+            polyline = phm_skel._get_longest_shortest_path_in_nodes(
+                remain, paths)
+            segment = phm_skel._intercept_polyline(
+                polyline, array_voxels, graph,
+                voxels_size=voxels_size,
+                plane_width=voxels_size * 2,
+                points_tree=points_tree)
+            remain = [node for node in remain
+                      if node not in segment.voxels_position]
+            segments.append(segment)
+
+        assert len(voxel_skeleton.segments) == len(segments)
+        for vs, ref in zip(voxel_skeleton.segments, segments):
+            assert vs.polyline == ref.polyline
+            assert vs.voxels_position == ref.voxels_position
+
+
+def test_intercept_points_with_tree():
+
+    voxel_grid = phm_data.voxel_grid(data_dir, 1, 32)
+    points = numpy.array(voxel_grid.voxels_position, dtype=float)
+    points_tree = scipy.spatial.cKDTree(points)
+
+    for src_point in points[::50]:
+        ref = phm_seg.intercept_points_with_ball(points, src_point, 100)
+        res = phm_seg.intercept_points_with_ball(
+            points, src_point, 100, points_tree=points_tree)
+        assert numpy.array_equal(ref, res)
+
+        plane_equation = phm_seg.compute_plane_equation((1, 2, 3), src_point)
+        ref = phm_seg.intercept_points_from_src_point_with_plane_equation(
+            points, src_point, plane_equation, 32, 150)
+        res = phm_seg.intercept_points_from_src_point_with_plane_equation(
+            points, src_point, plane_equation, 32, 150,
+            points_tree=points_tree)
+        assert numpy.array_equal(ref, res)
+
+
+def test_intercept_points_with_adjacency():
+
+    voxel_grid = phm_data.voxel_grid(data_dir, 1, 32)
+    graph = phm_seg.graph_from_voxel_grid(voxel_grid)
+    nodes, adjacency = phm_seg.adjacency_matrix_from_graph(
+        graph, voxel_grid.voxels_size)
+    points = numpy.array(nodes)
+    points_tree = scipy.spatial.cKDTree(points)
+
+    paths = phm_seg.compute_all_shorted_path(graph, voxel_grid.voxels_size)
+    polyline = max(paths.values(), key=len)
+
+    ref, ref_planes = phm_seg.intercept_points_along_path_with_planes(
+        points, polyline, distance_from_plane=64, points_graph=graph,
+        voxels_size=32, points_tree=points_tree)
+    res, res_planes = phm_seg.intercept_points_along_path_with_planes(
+        points, polyline, distance_from_plane=64, points_graph=graph,
+        voxels_size=32, points_tree=points_tree, points_adjacency=adjacency)
+    assert list(map(set, res)) == list(map(set, ref))
+    assert res_planes == ref_planes
+
+    ref = phm_seg.intercept_points_along_polyline_with_ball(
+        points, graph, polyline, ball_radius=128, points_tree=points_tree)
+    res = phm_seg.intercept_points_along_polyline_with_ball(
+        points, graph, polyline, ball_radius=128, points_tree=points_tree,
+        points_adjacency=adjacency)
+    assert list(map(set, res)) == list(map(set, ref))
+
+
 if __name__ == "__main__":
     for func_name in dir():
         if func_name.startswith('test_'):